@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from rate_limit import TokenBucket
+
+# Jumlah panggilan Gemini (generate) yang berjalan bersamaan dalam satu proses
+MAX_CONCURRENT_GENERATIONS = int(os.environ.get("EDA_MAX_CONCURRENT_GENERATIONS", "8"))
+
+# Kuota Gemini: permintaan per menit dan burst yang diizinkan
+GEMINI_RPM = float(os.environ.get("EDA_GEMINI_RPM", "1000"))
+GEMINI_BURST = float(os.environ.get("EDA_GEMINI_BURST", "10"))
+
+# Batas per notelp: pesan yang perlu dijawab LLM per menit dan burst-nya
+USER_RPM = float(os.environ.get("EDA_USER_RPM", "6"))
+USER_BURST = float(os.environ.get("EDA_USER_BURST", "3"))
+
+# Antrean tunggu: panjang maksimal dan lama menunggu (detik) sebelum permintaan dibuang
+ADMISSION_QUEUE_SIZE = int(os.environ.get("EDA_ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_TIMEOUT = float(os.environ.get("EDA_ADMISSION_TIMEOUT", "20"))
+
+# Jumlah notelp yang bucket-nya disimpan (LRU)
+MAX_TRACKED_USERS = int(os.environ.get("EDA_MAX_TRACKED_USERS", "10000"))
+
+# Interval pengecekan slot untuk pemanggil async
+ASYNC_POLL_INTERVAL = 0.02
+
+
+class AdmissionRejected(Exception):
+    """Permintaan ditolak sebelum memanggil Gemini.
+
+    reason: "user_rate_limited", "queue_full", "queue_timeout", atau "quota_timeout".
+    """
+
+    def __init__(self, reason):
+        super().__init__(f"admission rejected: {reason}")
+        self.reason = reason
+
+
+class AdmissionController:
+    """Gerbang sebelum panggilan Gemini: batas per pengguna, batas konkurensi, kuota, dan antrean.
+
+    Urutan pemeriksaan: (1) token bucket per notelp, ditolak langsung jika habis;
+    (2) slot konkurensi global, menunggu di antrean terbatas dan ditolak langsung jika
+    antrean penuh; (3) token bucket kuota Gemini. Total waktu tunggu dibatasi `timeout`
+    sehingga pengguna mendapat balasan "sibuk" yang cepat alih-alih menunggu error 429
+    dari Gemini.
+
+    Args:
+        max_concurrent (int): Jumlah generate yang boleh berjalan bersamaan.
+        rpm (float): Kuota Gemini per menit.
+        burst (float): Burst kuota Gemini.
+        user_rpm (float): Batas per notelp per menit.
+        user_burst (float): Burst per notelp.
+        max_queue (int): Jumlah permintaan yang boleh menunggu slot.
+        timeout (float): Lama menunggu slot dan kuota (detik).
+        max_users (int): Jumlah bucket notelp yang disimpan (LRU).
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_GENERATIONS, rpm=GEMINI_RPM, burst=GEMINI_BURST,
+                 user_rpm=USER_RPM, user_burst=USER_BURST, max_queue=ADMISSION_QUEUE_SIZE,
+                 timeout=ADMISSION_TIMEOUT, max_users=MAX_TRACKED_USERS):
+        self.max_concurrent = max_concurrent
+        self.quota = TokenBucket(rpm / 60, burst)
+        self.user_rate = user_rpm / 60
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_users = max_users
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.wait_seconds = 0.0
+        self.rejected = {}  # alasan -> jumlah
+        self._users = OrderedDict()  # notelp -> TokenBucket
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+
+    def _reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(reason)
+
+    def _check_user(self, user):
+        """Mengambil satu token dari bucket notelp; ditolak langsung jika habis."""
+        with self._lock:
+            bucket = self._users.get(user)
+            if bucket is None:
+                bucket = self._users[user] = TokenBucket(self.user_rate, self.user_burst)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user)
+        if not bucket.try_acquire():
+            with self._lock:
+                self._reject("user_rate_limited")
+
+    def _join(self):
+        """Mengambil slot langsung jika ada dan tidak ada yang mengantre; selain itu masuk antrean.
+
+        Returns:
+            bool: True jika slot sudah didapat.
+        """
+        with self._lock:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self._reject("queue_full")
+            self.waiting += 1
+            return False
+
+    def _take_slot(self, deadline):
+        """Mencoba mengambil slot untuk permintaan yang mengantre (dipanggil dengan lock)."""
+        if self.active < self.max_concurrent:
+            self.waiting -= 1
+            self.active += 1
+            return True
+        if time.monotonic() >= deadline:
+            self.waiting -= 1
+            self._reject("queue_timeout")
+        return False
+
+    def _release(self):
+        with self._slot_free:
+            self.active -= 1
+            self._slot_free.notify()
+
+    def _admitted(self, start):
+        with self._lock:
+            self.admitted += 1
+            self.wait_seconds += time.monotonic() - start
+
+    @contextmanager
+    def admit(self, user):
+        """Menahan satu slot Gemini selama blok berjalan; AdmissionRejected jika ditolak."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        self._check_user(user)
+        if not self._join():
+            with self._slot_free:
+                while not self._take_slot(deadline):
+                    self._slot_free.wait(max(0.0, deadline - time.monotonic()))
+        try:
+            if not self.quota.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                with self._lock:
+                    self._reject("quota_timeout")
+            self._admitted(start)
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aadmit(self, user):
+        """Varian async dari admit: menunggu tanpa memblokir event loop."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        self._check_user(user)
+        if not self._join():
+            while True:
+                with self._lock:
+                    if self._take_slot(deadline):
+                        break
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+        try:
+            while not self.quota.try_acquire():
+                if time.monotonic() >= deadline:
+                    with self._lock:
+                        self._reject("quota_timeout")
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+            self._admitted(start)
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        """Slot aktif, kedalaman antrean, jumlah diterima/ditolak per alasan, dan rata-rata waktu tunggu."""
+        with self._lock:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "tracked_users": len(self._users),
+                "avg_wait_seconds": self.wait_seconds / self.admitted if self.admitted else 0.0,
+            }
@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# Konfigurasi default cache jawaban
+ANSWER_CACHE_TTL = float(os.environ.get("EDA_ANSWER_CACHE_TTL", "3600"))  # detik
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("EDA_ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_MAX_BYTES = int(os.environ.get("EDA_ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def normalize_question(question):
+    """Menormalkan pertanyaan: huruf kecil, tanpa tanda baca, dan spasi tunggal.
+
+    Contoh: "Jumlah penduduk Kota Medan, 2023?" -> "jumlah penduduk kota medan 2023"
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def index_version(vector_store_path="faiss_index"):
+    """Versi indeks FAISS: isi penunjuk CURRENT untuk folder berversi, atau waktu modifikasi
+    file-file indeks untuk folder lama.
+
+    Nilainya berubah setiap kali versi baru diterbitkan atau save_local menulis ulang indeks.
+    """
+    try:
+        with open(os.path.join(vector_store_path, "CURRENT"), encoding="utf-8") as f:
+            return (f.read().strip(),)
+    except FileNotFoundError:
+        pass
+    version = []
+    for name in ("index.faiss", "index.pkl", "docstore.sqlite"):
+        try:
+            version.append(os.stat(os.path.join(vector_store_path, name)).st_mtime_ns)
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+class AnswerCache:
+    """Cache jawaban LRU dengan TTL, batas memori, dan invalidasi saat indeks dibangun ulang.
+
+    Kunci cache adalah pertanyaan yang sudah dinormalkan ditambah ID dokumen hasil
+    retrieval, sehingga jawaban hanya dipakai ulang jika konteks dokumennya sama.
+
+    Args:
+        ttl (float): Umur maksimal entri dalam detik.
+        max_entries (int): Jumlah entri maksimal.
+        max_bytes (int): Perkiraan ukuran memori maksimal seluruh entri.
+        version_fn (callable): Fungsi tanpa argumen yang mengembalikan versi indeks saat ini.
+    """
+
+    def __init__(self, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 max_bytes=ANSWER_CACHE_MAX_BYTES, version_fn=index_version):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # kunci -> (waktu kedaluwarsa, jawaban, ukuran)
+        self._bytes = 0
+        self._version = version_fn()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(question, doc_ids, first_turn=False):
+        """Membuat kunci cache dari pertanyaan dan ID dokumen hasil retrieval.
+
+        first_turn dipisahkan karena jawaban pertama dalam sesi memuat penafian pembuka.
+        """
+        return (normalize_question(question), tuple(doc_ids), first_turn)
+
+    def _check_version(self):
+        """Mengosongkan cache jika indeks FAISS telah dibangun ulang."""
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+            self.invalidations += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Mengembalikan jawaban yang tersimpan untuk key, atau None jika tidak ada/kedaluwarsa."""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, answer):
+        """Menyimpan jawaban, lalu menggusur entri LRU sampai batas jumlah dan memori terpenuhi."""
+        size = sys.getsizeof(answer) + sum(sys.getsizeof(part) for part in key[1]) + sys.getsizeof(key[0])
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, answer, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        """Mengembalikan statistik cache: hit, miss, penggusuran, invalidasi, dan ukuran."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
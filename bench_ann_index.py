@@ -0,0 +1,92 @@
+import time
+import argparse
+import faiss
+import numpy as np
+import vector_index
+from vector_index import build_index, set_search_params, reconstruct_all, current_index_path, INDEX_TYPES
+
+# Benchmark indeks ANN terhadap IndexFlatL2: recall@10, latensi p50/p99 per query, dan memori.
+# Berjalan offline dengan vektor sintetis atau vektor dari faiss_index yang sudah ada
+# (versi aktif menurut CURRENT, atau langsung folder sebuah versi).
+#   python bench_ann_index.py --n 200000 --dim 768
+#   python bench_ann_index.py --from-index faiss_index --nprobe 8 16 32 --ef-search 32 64 128
+
+
+def synthetic_vectors(n, dim, n_queries, seed=0):
+    """Vektor sintetis berkelompok (mirip embedding teks) dan query di sekitar kelompok yang sama."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 500), dim)).astype(np.float32)
+    base = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, len(centers), n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return np.ascontiguousarray(base), np.ascontiguousarray(queries)
+
+
+def index_vectors(path, n_queries, seed=0):
+    """Mengambil vektor dari versi aktif faiss_index; query adalah sampel vektor itu sendiri dengan sedikit noise."""
+    index = faiss.read_index(f"{current_index_path(path)}/index.faiss")
+    base = np.ascontiguousarray(reconstruct_all(index), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = base[rng.integers(0, len(base), n_queries)] + 0.01 * rng.standard_normal((n_queries, base.shape[1])).astype(np.float32)
+    return base, np.ascontiguousarray(queries)
+
+
+def measure(index, queries, k, truth):
+    """Menjalankan query satu per satu (seperti saat melayani pesan) lalu menghitung recall dan latensi."""
+    latencies = np.empty(len(queries))
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies[i] = time.perf_counter() - start
+        found[i] = ids[0]
+
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    return recall, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def report(name, params, recall, p50, p99, memory, build_seconds):
+    print(f"{name:<9} {params:<14} recall@10={recall:6.3f}  p50={p50:8.3f} ms  p99={p99:8.3f} ms  "
+          f"memori={memory / 2**20:9.1f} MiB  build={build_seconds:7.1f} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark indeks ANN FAISS')
+    parser.add_argument('--n', type=int, default=100000, help='jumlah vektor sintetis')
+    parser.add_argument('--dim', type=int, default=768, help='dimensi vektor sintetis (text-embedding-004: 768)')
+    parser.add_argument('--queries', type=int, default=500, help='jumlah query')
+    parser.add_argument('--from-index', help='gunakan vektor dari folder faiss_index ini')
+    parser.add_argument('--types', nargs='+', default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument('--nprobe', nargs='+', type=int, default=[vector_index.NPROBE])
+    parser.add_argument('--ef-search', nargs='+', type=int, default=[vector_index.EF_SEARCH])
+    args = parser.parse_args()
+
+    if args.from_index:
+        base, queries = index_vectors(args.from_index, args.queries)
+    else:
+        base, queries = synthetic_vectors(args.n, args.dim, args.queries)
+    k = 10
+    print(f"{len(base)} vektor berdimensi {base.shape[1]}, {len(queries)} query, k={k}")
+
+    # Ground truth dari pencarian brute-force
+    flat = faiss.IndexFlatL2(base.shape[1])
+    flat.add(base)
+    _, truth = flat.search(queries, k)
+
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_index(index_type, base.shape[1], base if index_type.startswith("ivf") else None)
+        index.add(base)
+        build_seconds = time.perf_counter() - start
+        memory = faiss.serialize_index(index).nbytes
+
+        if index_type.startswith("ivf"):
+            settings = [(f"nprobe={nprobe}", nprobe, vector_index.EF_SEARCH) for nprobe in args.nprobe]
+        elif index_type == "hnsw":
+            settings = [(f"efSearch={ef}", vector_index.NPROBE, ef) for ef in args.ef_search]
+        else:
+            settings = [("-", vector_index.NPROBE, vector_index.EF_SEARCH)]
+
+        for label, nprobe, ef_search in settings:
+            set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+            recall, p50, p99 = measure(index, queries, k, truth)
+            report(index_type, label, recall, p50, p99, memory, build_seconds)
@@ -0,0 +1,213 @@
+import re
+import sys
+import json
+import time
+import types
+import hashlib
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Pengganti lokal Gemini dan Web API BPS untuk benchmark tanpa kuota API (lihat bench_suite.py).
+# Semua keluaran deterministik: teks yang sama selalu menghasilkan vektor dan jawaban yang sama.
+
+# Dimensi text-embedding-004
+EMBEDDING_DIM = 768
+
+# Latensi default (detik), kira-kira seperti API aslinya
+EMBED_LATENCY = 0.05
+CHAT_LATENCY = 0.8
+CHUNK_LATENCY = 0.02
+
+# Jumlah potongan jawaban palsu saat streaming
+ANSWER_CHUNKS = 12
+
+
+class FakeEmbeddings(Embeddings):
+    """Embedding deterministik dari hash teks dengan latensi per panggilan yang dapat diatur.
+
+    Args:
+        dim (int): Dimensi vektor.
+        latency (float): Jeda per panggilan API (detik).
+        per_text_latency (float): Jeda tambahan per teks dalam satu batch (detik).
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, latency=EMBED_LATENCY, per_text_latency=0.0, model="models/fake-embedding", **kwargs):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.model = model  # nama model berbeda sehingga cache embedding asli tidak tercampur
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _wait(self, count):
+        self.calls += 1
+        self.texts += count
+        delay = self.latency + self.per_text_latency * count
+        if delay > 0:
+            time.sleep(delay)
+
+    def embed_documents(self, texts):
+        self._wait(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._wait(1)
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """Model chat palsu: menunggu `latency` detik lalu mengembalikan jawaban deterministik.
+
+    Saat streaming, jawaban dikirim dalam ANSWER_CHUNKS potongan dengan jeda `chunk_latency`
+    per potongan, sehingga time-to-first-chunk dan waktu total dapat dibedakan.
+    """
+
+    latency: float = CHAT_LATENCY
+    chunk_latency: float = CHUNK_LATENCY
+
+    def __init__(self, latency=CHAT_LATENCY, chunk_latency=CHUNK_LATENCY, **kwargs):
+        # Argumen ChatGoogleGenerativeAI (model, temperature, google_api_key, ...) diabaikan
+        super().__init__(latency=latency, chunk_latency=chunk_latency)
+
+    @property
+    def _llm_type(self):
+        return "fake-gemini"
+
+    def _chunks(self, messages):
+        question = str(messages[-1].content)
+        context_size = sum(len(str(message.content)) for message in messages)
+        words = (f"Berdasarkan data BPS Provinsi Sumatera Utara, jawaban untuk pertanyaan \"{question}\" "
+                 f"disusun dari {context_size} karakter konteks.").split(" ")
+        size = max(1, -(-len(words) // ANSWER_CHUNKS))
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = self._chunks(messages)
+        time.sleep(self.latency + self.chunk_latency * len(chunks))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(chunks).strip()))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            time.sleep(self.chunk_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+def install(embed_latency=EMBED_LATENCY, chat_latency=CHAT_LATENCY, chunk_latency=CHUNK_LATENCY, dim=EMBEDDING_DIM):
+    """Mengganti Gemini dengan pengganti lokal sebelum main_model/streamlit_read_csv diimpor.
+
+    Modul API_GEMINI dan vertexai dibuat palsu, dan kelas embedding/chat di
+    langchain_google_genai diganti sehingga tidak ada permintaan ke Google.
+    """
+    api = types.ModuleType("API_GEMINI")
+    api.GOOGLE_API_KEY = "offline-benchmark"
+    sys.modules["API_GEMINI"] = api
+
+    vertexai = types.ModuleType("vertexai")
+    vertexai.init = lambda **kwargs: None
+    sys.modules["vertexai"] = vertexai
+
+    import langchain_google_genai
+    langchain_google_genai.GoogleGenerativeAIEmbeddings = functools.partial(FakeEmbeddings, dim=dim, latency=embed_latency)
+    langchain_google_genai.ChatGoogleGenerativeAI = functools.partial(FakeChatModel, latency=chat_latency, chunk_latency=chunk_latency)
+
+
+def synthetic_bps_table(var_id, regions=33, years=5, turvars=3):
+    """JSON satu varID berformat Web API BPS (datacontent dengan key gabungan kode)."""
+    vervar = [{"val": 1200 + i, "label": f"Kabupaten Sintetis {i}"} for i in range(1, regions + 1)]
+    turvar = [{"val": i, "label": label} for i, label in enumerate(["Laki-laki", "Perempuan", "Jumlah"][:turvars], start=1)]
+    tahun = [{"val": 120 + i, "label": str(2020 + i)} for i in range(years)]
+    turtahun = [{"val": 0, "label": "Tahun"}]
+    rng = np.random.default_rng(var_id)
+    datacontent = {
+        f"{v['val']}{var_id}{t['val']}{y['val']}0": int(rng.integers(1000, 5_000_000))
+        for v in vervar for t in turvar for y in tahun
+    }
+    return {
+        "status": "OK",
+        "data-availability": "available",
+        "var": [{"val": var_id, "label": f"Tabel Sintetis {var_id}", "unit": "Jiwa"}],
+        "vervar": vervar,
+        "turvar": turvar,
+        "tahun": tahun,
+        "turtahun": turtahun,
+        "datacontent": datacontent,
+    }
+
+
+class StubBPSServer:
+    """Server HTTP lokal yang meniru endpoint data Web API BPS untuk scrap.py.
+
+    Setiap varID kelipatan `unavailable_every` dijawab "list-not-available" seperti
+    tabel yang tidak ada. Dipakai sebagai context manager:
+
+        with StubBPSServer(latency=0.05) as server:
+            scrape(range(1, 101), url_template=server.url_template)
+    """
+
+    VAR_PATTERN = re.compile(r"/var/(\d+)/")
+
+    def __init__(self, latency=0.0, unavailable_every=10, regions=33, years=5):
+        self.latency = latency
+        self.unavailable_every = unavailable_every
+        self.regions = regions
+        self.years = years
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                match = stub.VAR_PATTERN.search(self.path)
+                if match is None:
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                var_id = int(match.group(1))
+                if stub.unavailable_every and var_id % stub.unavailable_every == 0:
+                    data = {"status": "OK", "data-availability": "list-not-available"}
+                else:
+                    data = synthetic_bps_table(var_id, stub.regions, stub.years)
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = None
+
+    @property
+    def url_template(self):
+        return f"http://127.0.0.1:{self._server.server_port}/v1/api/list/model/data/domain/1200/var/{{}}/key/stub/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
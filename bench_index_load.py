@@ -0,0 +1,51 @@
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from vector_index import load_vector_store, resident_memory_mb, current_index_path
+
+# Benchmark pemuatan faiss_index untuk main_model: waktu muat dan memori resident (RSS)
+# sebelum/sesudah, untuk format pickle biasa dan format ringkas (mmap + docstore.sqlite).
+# Setiap path boleh berupa faiss_index (versi aktif menurut CURRENT) atau folder sebuah versi:
+#   python bench_index_load.py faiss_index                      # versi pickle yang aktif
+#   python vector_index.py export faiss_index sq8               # menerbitkan versi ringkas
+#   python bench_index_load.py faiss_index/versions/<versi_pickle> faiss_index
+
+
+def measure(path, mmap, queries, result_queue):
+    """Dijalankan di proses baru agar RSS tiap mode diukur dari kondisi awal yang sama."""
+    rss_before = resident_memory_mb()
+    start = time.perf_counter()
+    vector_store = load_vector_store(current_index_path(path), None, mmap=mmap)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = resident_memory_mb()
+
+    # Query acak seperti get_response: satu pencarian k=10 lalu ambil dokumennya
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(queries):
+        _, indices = vector_store.index.search(rng.standard_normal((1, vector_store.index.d)).astype(np.float32), 10)
+        for i in indices[0]:
+            if i != -1:
+                vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+    query_ms = (time.perf_counter() - start) / max(queries, 1) * 1000
+
+    result_queue.put((load_seconds, rss_loaded - rss_before, resident_memory_mb() - rss_before, query_ms))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark waktu muat dan RSS faiss_index')
+    parser.add_argument('paths', nargs='+', help='folder indeks (format save_local atau hasil export)')
+    parser.add_argument('--queries', type=int, default=200, help='jumlah query setelah dimuat')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    for path in args.paths:
+        for mmap in (False, True):
+            result_queue = ctx.Queue()
+            process = ctx.Process(target=measure, args=(path, mmap, args.queries, result_queue))
+            process.start()
+            load_seconds, rss_loaded, rss_queried, query_ms = result_queue.get()
+            process.join()
+            print(f"{path:<28} mmap={str(mmap):<5} muat={load_seconds:7.2f} s  RSS setelah muat={rss_loaded:8.1f} MiB  "
+                  f"RSS setelah {args.queries} query={rss_queried:8.1f} MiB  query={query_ms:6.2f} ms")
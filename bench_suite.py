@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import platform
+import tempfile
+import threading
+import subprocess
+import logging
+import contextlib
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Benchmark end-to-end dan ingestion tanpa kuota Gemini: semua panggilan API diganti
+# pengganti lokal dari bench_fakes.py. Hasil disimpan sebagai JSON agar dapat dibandingkan antar rilis.
+#   python bench_suite.py load --rps 20 --duration 60
+#   python bench_suite.py ingest --rows 10000 100000 1000000
+#   python bench_suite.py scrape --vars 200
+#   python bench_suite.py compare bench_results/lama.json bench_results/baru.json
+# Setiap suite berjalan di folder sementara sehingga faiss_index, cache, dan JSON di repo tidak tersentuh.
+
+RESULTS_DIR = "bench_results"
+
+
+def percentiles(values):
+    """p50/p95/p99 dan rata-rata dalam milidetik."""
+    if not len(values):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    values = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(values.mean())}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(suite, params, results, output=None):
+    """Menyimpan hasil beserta commit, parameter, dan info mesin ke file JSON."""
+    if output is None:
+        output = os.path.join(RESULTS_DIR, f"{suite}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "suite": suite,
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": params,
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+    return output
+
+
+@contextlib.contextmanager
+def scratch_workdir(keep=False):
+    """Menjalankan suite di folder sementara; cache embedding juga diarahkan ke sana."""
+    previous = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="eda-bench-")
+    os.environ.setdefault("EDA_EMBEDDING_CACHE_DIR", os.path.join(workdir, "embedding_cache"))
+    os.environ.setdefault("EDA_DATA_LOOKUP_PATH", os.path.join(workdir, "data_lookup.parquet"))
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(previous)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def quiet_streamlit():
+    """Membungkam peringatan "missing ScriptRunContext" saat fungsi Streamlit dipanggil di luar `streamlit run`."""
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+
+def synthetic_documents(rows):
+    """Dokumen dari CSV sintetis berformat BPS, dibaca dengan loader produksi."""
+    from bench_csv_loader import make_csv
+    from streamlit_read_csv import load_csv_files_with_metadata
+    return load_csv_files_with_metadata([make_csv(rows)])
+
+
+def build_vector_store(rows, index_root="faiss_index"):
+    """Mengindeks `rows` baris sintetis lewat create_or_update_vector_store; mengembalikan detik dan statistik."""
+    from streamlit_read_csv import create_or_update_vector_store
+    stats = {}
+    start = time.perf_counter()
+    vector_store = create_or_update_vector_store(synthetic_documents(rows), index_root, progress=stats.update)
+    elapsed = time.perf_counter() - start
+    if vector_store is None:
+        raise RuntimeError("create_or_update_vector_store gagal; lihat pesan di atas")
+    return elapsed, stats
+
+
+def serve(app):
+    """Menjalankan aplikasi Flask pada port bebas di thread latar; mengembalikan URL dasarnya."""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def stage_means(metrics_text, metric):
+    """Rata-rata per label dari pasangan _sum/_count histogram pada teks /metrics (milidetik)."""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{metric}_sum") or line.startswith(f"{metric}_count"):
+            name, value = line.rsplit(" ", 1)
+            labels = name[name.find("{"):] if "{" in name else ""
+            (sums if name.startswith(f"{metric}_sum") else counts)[labels] = float(value)
+    return {labels or "all": 1000 * sums[labels] / counts[labels] for labels in sums if counts.get(labels)}
+
+
+def metric_values(metrics_text, metric):
+    """Nilai counter/gauge per label dari teks /metrics, mis. {'{reason="queue_full"}': 3.0}."""
+    values = {}
+    for line in metrics_text.splitlines():
+        if line.startswith(metric) and line[len(metric):len(metric) + 1] in ("{", " "):
+            name, value = line.rsplit(" ", 1)
+            labels = name[name.find("{"):] if "{" in name else ""
+            values[labels or "all"] = float(value)
+    return values
+
+
+def run_load(args):
+    """Load generator open-loop: permintaan dijadwalkan pada laju tetap ke /get_response gateway.
+
+    Latensi diukur dari waktu jadwal (bukan waktu kirim), sehingga antrean di sisi klien saat
+    server melambat ikut terhitung dan p99 tidak tampak lebih baik dari kenyataannya.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    import bench_fakes
+    bench_fakes.install(embed_latency=args.embed_latency, chat_latency=args.chat_latency)
+
+    with scratch_workdir(args.keep) as workdir:
+        os.environ["EDA_INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+        index_seconds, _ = build_vector_store(args.index_rows, os.environ["EDA_INDEX_PATH"])
+        print(f"Indeks {args.index_rows:,} baris dibuat dalam {index_seconds:.1f} detik")
+
+        import main_model
+        import main_flask
+        model_url, model_server = serve(main_model.app)
+        gateway_url, gateway_server = serve(main_flask.app)
+        main_flask.MAIN_URL = f"{model_url}/process_text"
+
+        rng = np.random.default_rng(0)
+        questions = [f"Berapa jumlah penduduk Kabupaten {i % 33} tahun {2010 + i % 15}?" for i in range(args.questions)]
+        total = int(args.rps * args.duration)
+        plan = [(questions[rng.integers(len(questions))], f"bench-{rng.integers(args.users)}") for _ in range(total)]
+
+        client = requests.Session()
+        client.mount("http://", HTTPAdapter(pool_maxsize=args.concurrency))
+        latencies, failures = [], []
+        errors = Counter()
+        lock = threading.Lock()
+
+        def call(scheduled, question, user):
+            # Pesan "sibuk"/"tidak tersedia" juga dikirim dengan HTTP 200; hanya jawaban sungguhan yang dihitung berhasil
+            try:
+                response = client.post(f"{gateway_url}/get_response", json={"response_text": question, "id": user}, timeout=120)
+                body = response.json() if response.status_code == 200 else {}
+                ok = body.get("status") == "success" and body.get("response_text") is not None
+                error = None if ok else body.get("error") or f"http_{response.status_code}"
+            except (requests.RequestException, ValueError):
+                ok, error = False, "client_error"
+            elapsed = time.perf_counter() - scheduled
+            with lock:
+                (latencies if ok else failures).append(elapsed)
+                if error:
+                    errors[error] += 1
+
+        print(f"Mengirim {total} permintaan pada {args.rps} rps selama {args.duration} detik...")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for i, (question, user) in enumerate(plan):
+                scheduled = start + i / args.rps
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(call, scheduled, question, user)
+        elapsed = time.perf_counter() - start
+
+        metrics_text = requests.get(f"{model_url}/metrics", timeout=10).text
+        gateway_metrics = requests.get(f"{gateway_url}/metrics", timeout=10).text
+        gateway_server.shutdown()
+        model_server.shutdown()
+        main_model.index_manager.stop_watcher()
+
+    results = {
+        "requests": total,
+        "ok": len(latencies),
+        "failed": len(failures),
+        "errors": dict(errors),
+        "admission_rejected": metric_values(metrics_text, "eda_model_admission_rejected"),
+        "throughput_rps": len(latencies) / elapsed,
+        "latency": percentiles(latencies),
+        "model_stage_mean_ms": stage_means(metrics_text, "eda_model_stage_seconds"),
+        "gateway_round_trip_mean_ms": stage_means(gateway_metrics, "eda_gateway_round_trip_seconds"),
+    }
+    latency = results["latency"]
+    print(f"ok={results['ok']} gagal={results['failed']} throughput={results['throughput_rps']:.2f} rps  "
+          f"p50={latency['p50_ms']:.0f} ms  p95={latency['p95_ms']:.0f} ms  p99={latency['p99_ms']:.0f} ms")
+    if results["errors"]:
+        print("  gagal per kelas error: " + ", ".join(f"{error}={count}" for error, count in sorted(results["errors"].items())))
+    if results["admission_rejected"]:
+        print("  ditolak admission: " + ", ".join(f"{reason}={count:.0f}" for reason, count in sorted(results["admission_rejected"].items())))
+    for stage, mean in results["model_stage_mean_ms"].items():
+        print(f"  {stage:<24} rata-rata {mean:9.1f} ms")
+    return results
+
+
+def run_ingest(args):
+    """Micro-benchmark per ukuran: loader CSV, create_or_update_vector_store, dan pencarian FAISS.
+
+    Setiap ukuran diindeks ke folder indeks baru (semua dokumen di-embed, seperti upload pertama);
+    cache embedding dipakai bersama seperti di produksi.
+    """
+    import bench_fakes
+    bench_fakes.install(embed_latency=args.embed_latency, dim=args.dim)
+
+    results = {}
+    with scratch_workdir(args.keep):
+        from vector_index import load_vector_store, set_search_params, current_index_path, index_type_of
+        from hybrid_retriever import HybridRetriever
+        from streamlit_resources import get_embeddings
+
+        for rows in args.rows:
+            index_root = f"faiss_index_{rows}"
+            result = {}
+
+            start = time.perf_counter()
+            count = sum(1 for _ in synthetic_documents(rows))
+            elapsed = time.perf_counter() - start
+            result["csv_loader"] = {"rows": count, "seconds": elapsed, "rows_per_second": count / elapsed}
+
+            elapsed, stats = build_vector_store(rows, index_root)
+            result["vector_store"] = {"seconds": elapsed, "rows_per_second": rows / elapsed, "added": stats.get("added")}
+
+            vector_store = load_vector_store(current_index_path(index_root), get_embeddings())
+            set_search_params(vector_store.index)
+            queries = np.random.default_rng(1).standard_normal((args.queries, args.dim)).astype(np.float32)
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                vector_store.index.search(query[None, :], args.k)
+                timings.append(time.perf_counter() - start)
+            result["faiss_search"] = {"index_type": index_type_of(vector_store.index), "k": args.k, **percentiles(timings)}
+
+            start = time.perf_counter()
+            retriever = HybridRetriever(vector_store, current_index_path(index_root))
+            load_seconds = time.perf_counter() - start
+            timings = []
+            for i, query in enumerate(queries):
+                question = f"Jumlah Penduduk Kabupaten {i % 33} tahun {2010 + i % 15}"
+                start = time.perf_counter()
+                retriever.search(question, query, args.k)
+                timings.append(time.perf_counter() - start)
+            result["hybrid_search"] = {"load_seconds": load_seconds, "prebuilt": retriever.prebuilt, "k": args.k, **percentiles(timings)}
+
+            results[str(rows)] = result
+            del retriever, vector_store
+            shutil.rmtree(index_root, ignore_errors=True)
+            print(f"{rows:>9,} baris  loader {result['csv_loader']['rows_per_second']:>10,.0f} baris/s  "
+                  f"indeks {result['vector_store']['rows_per_second']:>8,.0f} baris/s  "
+                  f"FAISS p99 {result['faiss_search']['p99_ms']:7.2f} ms  hybrid p99 {result['hybrid_search']['p99_ms']:7.2f} ms")
+    return results
+
+
+def run_scrape(args):
+    """scrap.py terhadap server stub Web API BPS, lalu decoding JSON menjadi Document."""
+    import bench_fakes
+    with scratch_workdir(args.keep):
+        from scrap import scrape
+        from bps_ingest import iter_json_documents
+
+        with bench_fakes.StubBPSServer(latency=args.api_latency) as server:
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                summary = scrape(range(1, args.vars + 1), url_template=server.url_template, folder="JSON",
+                                 workers=args.workers, rate=args.rate, resume=False)
+
+        start = time.perf_counter()
+        documents = sum(len(batch) for batch in iter_json_documents("JSON"))
+        elapsed = time.perf_counter() - start
+
+    results = {
+        "scrape": {"vars": args.vars, "done": summary["done"], "failed": len(summary["failed"]),
+                   "seconds": summary["seconds"], "vars_per_second": summary["vars_per_second"]},
+        "json_decode": {"documents": documents, "seconds": elapsed, "documents_per_second": documents / elapsed},
+    }
+    print(f"scrape {results['scrape']['vars_per_second']:.1f} varID/s, decode {results['json_decode']['documents_per_second']:,.0f} dokumen/s")
+    return results
+
+
+def flatten(value, prefix=""):
+    """Mengubah dict bersarang menjadi {"a.b.c": angka} untuk perbandingan."""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return items
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(old_path, new_path):
+    """Mencetak perubahan setiap metrik numerik antara dua file hasil."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['suite']}: {old.get('commit')} -> {new.get('commit')}")
+    old_values, new_values = flatten(old["results"]), flatten(new["results"])
+    for key in sorted(old_values.keys() & new_values.keys()):
+        before, after = old_values[key], new_values[key]
+        change = f"{(after - before) / before * 100:+7.1f}%" if before else "      -"
+        print(f"{key:<60} {before:>14.3f} {after:>14.3f} {change}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark offline EDA dengan Gemini palsu')
+    subparsers = parser.add_subparsers(dest='suite', required=True)
+
+    load = subparsers.add_parser('load', help='gateway -> main_model pada laju permintaan tetap')
+    load.add_argument('--rps', type=float, default=10, help='laju permintaan per detik')
+    load.add_argument('--duration', type=float, default=30, help='lama pengujian (detik)')
+    load.add_argument('--concurrency', type=int, default=64, help='permintaan bersamaan maksimal dari klien')
+    load.add_argument('--users', type=int, default=200, help='jumlah notelp berbeda')
+    load.add_argument('--questions', type=int, default=500, help='jumlah pertanyaan berbeda (pengulangan mengenai cache)')
+    load.add_argument('--index-rows', type=int, default=20000, help='ukuran indeks yang dilayani')
+    load.add_argument('--embed-latency', type=float, default=0.05)
+    load.add_argument('--chat-latency', type=float, default=0.8)
+
+    ingest = subparsers.add_parser('ingest', help='loader CSV, pembuatan indeks, dan pencarian per ukuran')
+    ingest.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    ingest.add_argument('--dim', type=int, default=768)
+    ingest.add_argument('--queries', type=int, default=200)
+    ingest.add_argument('--k', type=int, default=20)
+    ingest.add_argument('--embed-latency', type=float, default=0.0, help='jeda per batch embedding (detik)')
+
+    scrape_parser = subparsers.add_parser('scrape', help='scrap.py terhadap server stub Web API BPS')
+    scrape_parser.add_argument('--vars', type=int, default=200)
+    scrape_parser.add_argument('--workers', type=int, default=8)
+    scrape_parser.add_argument('--rate', type=float, default=50)
+    scrape_parser.add_argument('--api-latency', type=float, default=0.05)
+
+    for sub in (load, ingest, scrape_parser):
+        sub.add_argument('--output', help=f'file JSON hasil (default: {RESULTS_DIR}/<suite>-<waktu>.json)')
+        sub.add_argument('--keep', action='store_true', help='jangan hapus folder kerja sementara')
+
+    compare_parser = subparsers.add_parser('compare', help='bandingkan dua file hasil')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+
+    args = parser.parse_args()
+    if args.suite == 'compare':
+        compare(args.old, args.new)
+        sys.exit(0)
+
+    output = os.path.abspath(args.output) if args.output else None
+    quiet_streamlit()
+    runners = {'load': run_load, 'ingest': run_ingest, 'scrape': run_scrape}
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'keep')}
+    save_results(args.suite, params, runners[args.suite](args), output)
@@ -0,0 +1,158 @@
+import os
+import json
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+# File status scraper (scrap.py) yang ikut tersimpan di folder JSON tetapi bukan tabel data
+SCRAPER_STATE_FILES = {'manifest.json', 'changed.json', 'checkpoint.json'}
+
+# Label turvar/turtahun yang berarti "tidak ada rincian"
+EMPTY_TURVAR_LABELS = {'', 'tidak ada', 'tidak ada turunan variabel'}
+ANNUAL_TURTAHUN_LABELS = {'', 'tahun', 'tahunan'}
+
+
+def _code_frame(entries, prefix):
+    """Mengubah daftar {val, label} dari Web API BPS menjadi DataFrame berkolom <prefix>_val dan <prefix>."""
+    if not entries:
+        entries = [{'val': 0, 'label': ''}]
+    frame = pd.DataFrame(entries)[['val', 'label']]
+    return pd.DataFrame({
+        f'{prefix}_val': frame['val'].astype(str),
+        prefix: frame['label'].fillna('').astype(str).str.strip(),
+    })
+
+
+def decode_bps_table(data):
+    """Mendekode `datacontent` satu tabel Web API BPS menjadi DataFrame baris per nilai.
+
+    Key datacontent adalah gabungan kode vervar + var + turvar + tahun + turtahun. Semua
+    kombinasi kode dibentuk sekaligus (cross join) lalu dicocokkan dengan datacontent
+    secara tervektorisasi, tanpa perulangan per baris.
+
+    Args:
+        data (dict): Isi JSON satu varID dari Web API BPS.
+
+    Returns:
+        pandas.DataFrame: Kolom var_id, vervar, turvar, tahun, turtahun (beserta kodenya) dan datacontent.
+    """
+    datacontent = data.get('datacontent') or {}
+    if not datacontent:
+        return pd.DataFrame()
+
+    var_id = str(data['var'][0]['val'])
+    frame = _code_frame(data.get('vervar'), 'vervar')
+    for entries, prefix in ((data.get('turvar'), 'turvar'), (data.get('tahun'), 'tahun'), (data.get('turtahun'), 'turtahun')):
+        frame = frame.merge(_code_frame(entries, prefix), how='cross')
+
+    keys = frame['vervar_val'] + var_id + frame['turvar_val'] + frame['tahun_val'] + frame['turtahun_val']
+    values = pd.Series(datacontent, dtype=object).reindex(keys.to_numpy())
+    frame['datacontent'] = values.to_numpy()
+    frame = frame[values.notna().to_numpy()].reset_index(drop=True)
+    frame.insert(0, 'var_id', var_id)
+    return frame
+
+
+def build_contents(frame, file_name):
+    """Membentuk teks dokumen dengan format yang sama seperti load_csv_files_with_metadata (tervektorisasi).
+
+    Format: "{file_name}, {tahun}, {turvar} untuk {vervar}, {datacontent}." atau tanpa turvar
+    jika tabel tidak memiliki turunan variabel.
+    """
+    has_turvar = ~frame['turvar'].str.lower().isin(EMPTY_TURVAR_LABELS)
+    is_annual = frame['turtahun'].str.lower().isin(ANNUAL_TURTAHUN_LABELS)
+    tahun = frame['tahun'].where(is_annual, frame['tahun'] + ' ' + frame['turtahun'])
+    value = frame['datacontent'].astype(str)
+
+    prefix = file_name + ', ' + tahun + ', '
+    with_turvar = prefix + frame['turvar'] + ' untuk ' + frame['vervar'] + ', ' + value + '.'
+    without_turvar = prefix + frame['vervar'] + ', ' + value + '.'
+    return pd.Series(np.where(has_turvar, with_turvar, without_turvar), index=frame.index)
+
+
+def table_documents(data, file_name):
+    """Mengubah satu tabel JSON BPS menjadi daftar Document beserta metadata lengkap."""
+    frame = decode_bps_table(data)
+    if frame.empty:
+        return []
+
+    contents = build_contents(frame, file_name)
+    unit = data['var'][0].get('unit', '')
+    metadata = frame[['var_id', 'vervar', 'turvar', 'tahun', 'turtahun']].assign(source=file_name, unit=unit)
+    return [
+        Document(page_content=content, metadata=meta)
+        for content, meta in zip(contents.tolist(), metadata.to_dict('records'))
+    ]
+
+
+def load_changed_var_ids(folder='JSON'):
+    """Membaca daftar varID yang berubah pada run scraper terakhir (JSON/changed.json)."""
+    with open(os.path.join(folder, 'changed.json'), encoding='utf-8') as f:
+        return set(json.load(f)['changed'])
+
+
+def json_table_files(folder='JSON', var_ids=None):
+    """Daftar file tabel di folder JSON; jika var_ids diberikan, hanya file varID tersebut (via manifest)."""
+    if var_ids is not None:
+        with open(os.path.join(folder, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        return sorted(os.path.join(folder, manifest[str(var_id)]['file']) for var_id in var_ids if str(var_id) in manifest)
+
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.endswith('.json') and name not in SCRAPER_STATE_FILES
+    )
+
+
+def iter_json_documents(folder='JSON', batch_size=1000, var_ids=None):
+    """Membaca folder JSON hasil scrap.py dan menghasilkan Document dalam batch.
+
+    Hanya satu tabel dan satu batch yang berada di memori pada satu waktu, sehingga katalog
+    besar dapat dialirkan ke create_or_update_vector_store dengan memori terbatas.
+
+    Args:
+        folder (str): Folder JSON hasil scraper.
+        batch_size (int): Jumlah Document per batch.
+        var_ids (iterable): Hanya proses varID ini (mis. hasil load_changed_var_ids).
+
+    Yields:
+        list: Batch berisi maksimal batch_size Document.
+    """
+    batch = []
+    for path in json_table_files(folder, var_ids):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Gagal membaca {path}: {e}")
+            continue
+
+        file_name = os.path.splitext(os.path.basename(path))[0]
+        for document in table_documents(data, file_name):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+if __name__ == '__main__':
+    from streamlit_read_csv import create_or_update_vector_store
+    from ingest_pipeline import upload_fingerprint
+
+    parser = argparse.ArgumentParser(description='Ingestion langsung dari folder JSON Web API BPS ke faiss_index')
+    parser.add_argument('--folder', default='JSON', help='folder JSON hasil scrap.py')
+    parser.add_argument('--changed-only', action='store_true', help='hanya proses varID di JSON/changed.json')
+    parser.add_argument('--batch-size', type=int, default=1000, help='jumlah dokumen per batch')
+    args = parser.parse_args()
+
+    var_ids = load_changed_var_ids(args.folder) if args.changed_only else None
+    batches = iter_json_documents(args.folder, batch_size=args.batch_size, var_ids=var_ids)
+    create_or_update_vector_store(
+        itertools.chain.from_iterable(batches), batch_size=args.batch_size,
+        fingerprint=upload_fingerprint(json_table_files(args.folder, var_ids)),
+        progress=lambda stats: print(f"\r{stats['rows']:,} baris dibaca, {stats['added']:,} di-embed, "
+                                     f"{stats['rows_per_second']:,.0f} baris/detik", end="", flush=True))
@@ -0,0 +1,163 @@
+import os
+import threading
+from langchain_core.documents import Document
+from session_store import estimate_tokens
+from hybrid_retriever import parse_content_fields, tokenize
+
+# Batas perkiraan token untuk seluruh konteks dokumen dalam prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("EDA_CONTEXT_TOKEN_BUDGET", "1200"))
+
+# Bobot relevansi vs keragaman pada MMR (1.0 = hanya relevansi)
+MMR_LAMBDA = float(os.environ.get("EDA_MMR_LAMBDA", "0.7"))
+
+# Dokumen non-tabel dengan kemiripan token setinggi ini dianggap duplikat dan dibuang
+DUPLICATE_SIMILARITY = 0.9
+
+
+def similarity(tokens_a, tokens_b):
+    """Kemiripan Jaccard dua himpunan token."""
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def mmr_order(token_sets, lambda_mult=MMR_LAMBDA):
+    """Mengurutkan kandidat dengan maximal marginal relevance.
+
+    Relevansi diambil dari peringkat retrieval (kandidat pertama paling relevan) dan
+    kemiripan antar kandidat dari token teksnya; near-duplicate dibuang. Kandidat dengan
+    himpunan token kosong tidak pernah dianggap mirip dengan kandidat lain.
+
+    Returns:
+        list: Posisi kandidat dalam urutan MMR.
+    """
+    count = len(token_sets)
+    relevance = [1.0 - rank / count for rank in range(count)]
+    remaining = list(range(count))
+    selected = []
+    max_similarity = [0.0] * count
+    while remaining:
+        best = max(remaining, key=lambda i: lambda_mult * relevance[i] - (1 - lambda_mult) * max_similarity[i])
+        remaining.remove(best)
+        if max_similarity[best] >= DUPLICATE_SIMILARITY:
+            continue
+        selected.append(best)
+        for i in remaining:
+            max_similarity[i] = max(max_similarity[i], similarity(token_sets[i], token_sets[best]))
+    return selected
+
+
+def format_table(source, rows):
+    """Blok tabel ringkas: satu judul dan header, lalu satu baris per nilai."""
+    with_turvar = any(row["turvar"] for row in rows)
+    header = "tahun | wilayah | rincian | nilai" if with_turvar else "tahun | wilayah | nilai"
+    unit = rows[0]["unit"]
+    lines = [f"Tabel: {source}" + (f" ({unit})" if unit else ""), header]
+    for row in sorted(rows, key=lambda row: (row["period"], row["vervar"], row["turvar"])):
+        cells = [row["period"], row["vervar"]] + ([row["turvar"] or "-"] if with_turvar else []) + [row["value"]]
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+class ContextBuilder:
+    """Menyusun konteks prompt dari dokumen hasil retrieval dalam batas token.
+
+    Baris tabel hanya dianggap duplikat jika (source, period, vervar, turvar)-nya sama, karena
+    baris dari tabel yang sama berbagi judul dan wilayah walaupun nilainya berbeda (mis. tahun
+    2021, 2022, dan 2023). Dokumen non-tabel diurutkan dengan MMR (near-duplicate dibuang).
+    Kandidat lalu diambil selama anggaran token mencukupi. Baris dari tabel yang sama digabung
+    menjadi satu blok tabel sehingga judul tabel tidak diulang di setiap baris. Dokumen non-tabel
+    (mis. potongan PDF) tetap dipakai apa adanya.
+
+    Args:
+        token_budget (int): Batas perkiraan token konteks.
+        max_documents (int): Jumlah dokumen hasil retrieval maksimal yang dipakai.
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, max_documents=None):
+        self.token_budget = token_budget
+        self.max_documents = max_documents
+        self.requests = 0
+        self.context_tokens = 0
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+
+    def build(self, doc_ids, docs):
+        """Memilih dan memadatkan dokumen.
+
+        Returns:
+            tuple: (ID dokumen yang dipakai, list Document konteks, perkiraan token konteks).
+        """
+        # docstore.search mengembalikan string "ID ... not found." untuk ID yang tidak ada
+        # (mis. docstore dan indeks tidak sinkron); entri seperti itu dilewati
+        kept = [(doc_id, doc) for doc_id, doc in zip(doc_ids, docs) if isinstance(doc, Document)]
+        doc_ids, docs = [doc_id for doc_id, _ in kept], [doc for _, doc in kept]
+
+        rows = []
+        for doc in docs:
+            content = doc.page_content
+            # Potongan PDF (metadata page) tidak pernah diperlakukan sebagai baris tabel
+            fields = parse_content_fields(content) if "page" not in doc.metadata else {}
+            if fields:
+                fields["source"] = doc.metadata.get("source", fields["source"])
+                fields["unit"] = str(doc.metadata.get("unit", "") or "").strip()
+            rows.append(fields)
+
+        # Baris tabel: duplikat persis dibuang dan tidak ikut perhitungan kemiripan MMR
+        seen_rows, duplicates = set(), set()
+        token_sets = []
+        for position, (doc, fields) in enumerate(zip(docs, rows)):
+            if fields:
+                key = (fields["source"], fields["period"], fields["vervar"], fields["turvar"])
+                if key in seen_rows:
+                    duplicates.add(position)
+                seen_rows.add(key)
+                token_sets.append(set())
+            else:
+                token_sets.append(set(tokenize(doc.page_content)))
+
+        used_ids, tables, texts = [], {}, []
+        tokens = 0
+        for position in mmr_order(token_sets):
+            if position in duplicates:
+                continue
+            if self.max_documents is not None and len(used_ids) >= self.max_documents:
+                break
+            fields = rows[position]
+            if fields:
+                key = fields["source"]
+                cost = estimate_tokens(" | ".join((fields["period"], fields["vervar"], fields["turvar"], fields["value"])))
+                if key not in tables:
+                    cost += estimate_tokens(f"Tabel: {key}\ntahun | wilayah | rincian | nilai")
+            else:
+                cost = estimate_tokens(docs[position].page_content)
+            if tokens + cost > self.token_budget and used_ids:
+                continue
+
+            tokens += cost
+            used_ids.append(doc_ids[position])
+            if fields:
+                tables.setdefault(fields["source"], []).append(fields)
+            else:
+                texts.append(docs[position])
+
+        context = [Document(page_content=format_table(source, table_rows), metadata={"source": source})
+                   for source, table_rows in tables.items()] + texts
+        return used_ids, context, tokens
+
+    def record(self, context_tokens, prompt_tokens):
+        """Mencatat perkiraan token konteks dan token prompt satu permintaan."""
+        with self._lock:
+            self.requests += 1
+            self.context_tokens += context_tokens
+            self.prompt_tokens += prompt_tokens
+            return self.prompt_tokens / self.requests
+
+    def stats(self):
+        """Rata-rata perkiraan token konteks dan token prompt per permintaan."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "avg_context_tokens": self.context_tokens / self.requests if self.requests else 0.0,
+                "avg_prompt_tokens": self.prompt_tokens / self.requests if self.requests else 0.0,
+            }
@@ -0,0 +1,255 @@
+import os
+import re
+import sys
+import json
+import threading
+import pandas as pd
+from answer_cache import normalize_question
+from bps_ingest import decode_bps_table, json_table_files
+
+# Tabel kolumnar hasil build dari folder JSON Web API BPS
+DATA_LOOKUP_PATH = os.environ.get("EDA_DATA_LOOKUP_PATH", "data_lookup.parquet")
+
+# Batas baris jawaban langsung; permintaan yang lebih luas diteruskan ke RAG
+MAX_ANSWER_ROWS = 12
+
+# Kata yang tidak menentukan variabel saat mencocokkan pertanyaan dengan judul tabel
+STOPWORDS = {
+    "menurut", "dan", "di", "ke", "dari", "yang", "per", "atau", "dengan", "pada", "untuk",
+    "kabupaten", "kab", "kota", "provinsi", "sumatera", "utara", "tahun", "berapa", "data",
+    "jumlah", "minta", "tolong", "saya", "ingin", "mohon", "berapakah", "brp", "apa", "adalah",
+    "tampilkan", "sebutkan", "bps",
+}
+
+# Kata pertanyaan yang tidak ada di judul tabel yang masih ditoleransi (hanya untuk judul 3+ token)
+MAX_EXTRA_TOKENS = 1
+
+YEAR_PATTERN = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+def build_table(folder="JSON"):
+    """Menggabungkan semua tabel JSON BPS menjadi satu DataFrame kolumnar.
+
+    Returns:
+        pandas.DataFrame: Kolom var_id, variable, unit, vervar, turvar, tahun, turtahun, value.
+    """
+    frames = []
+    for path in json_table_files(folder):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        frame = decode_bps_table(data)
+        if frame.empty:
+            continue
+        frames.append(pd.DataFrame({
+            "var_id": frame["var_id"],
+            "variable": os.path.splitext(os.path.basename(path))[0],
+            "unit": data["var"][0].get("unit", ""),
+            "vervar": frame["vervar"],
+            "turvar": frame["turvar"],
+            "tahun": frame["tahun"],
+            "turtahun": frame["turtahun"],
+            "value": frame["datacontent"].astype(str),
+        }))
+
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["var_id", "variable", "unit", "vervar", "turvar", "tahun", "turtahun", "value"])
+    for column in ("var_id", "variable", "unit", "vervar", "turvar", "tahun", "turtahun"):
+        table[column] = table[column].astype("category")
+    return table
+
+
+def region_variants(label):
+    """Variasi penulisan nama wilayah, mis. "Kota Medan" -> ["kota medan", "medan"] dan
+    "Deli Serdang" -> ["deli serdang", "kabupaten deli serdang", "kab deli serdang"]."""
+    name = normalize_question(label)
+    if name.startswith("kota "):
+        return [name, name[len("kota "):]]
+    for prefix in ("kabupaten ", "kab "):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return [name, f"kabupaten {name}", f"kab {name}"]
+
+
+class RegionMatcher:
+    """Mencari nama wilayah (vervar) yang disebut dalam pertanyaan yang sudah dinormalkan.
+
+    Variasi yang cocok ke lebih dari satu wilayah (mis. "bekasi" untuk Kota dan Kabupaten
+    Bekasi) dikembalikan sebagai beberapa label; kecocokan terpanjang diutamakan.
+    """
+
+    def __init__(self, labels):
+        self._regions = {}
+        for label in labels:
+            for variant in region_variants(label):
+                if variant:
+                    self._regions.setdefault(variant, set()).add(label)
+        self._pattern = re.compile(
+            r"\b(" + "|".join(re.escape(v) for v in sorted(self._regions, key=len, reverse=True)) + r")\b"
+        ) if self._regions else None
+
+    def match(self, normalized_question):
+        """Mengembalikan set label wilayah yang disebut (kosong jika tidak ada)."""
+        labels = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(normalized_question):
+                labels |= self._regions[match.group(1)]
+        return labels
+
+    def remove(self, normalized_question):
+        """Pertanyaan tanpa nama wilayah yang disebut di dalamnya."""
+        if self._pattern is None:
+            return normalized_question
+        return self._pattern.sub(" ", normalized_question)
+
+
+def format_value(value):
+    """Memformat angka gaya Indonesia: titik pemisah ribuan dan koma desimal."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if number.is_integer():
+        text = f"{int(number):,}"
+    else:
+        text = f"{number:,.2f}".rstrip("0").rstrip(".")
+    return text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+class DataLookup:
+    """Mesin pencarian langsung data BPS berdasarkan variabel, wilayah (vervar), turvar, dan tahun.
+
+    Pertanyaan seperti "jumlah penduduk Kota Medan 2023" dijawab langsung dari tabel dalam
+    hitungan milidetik. Jika variabel, wilayah, atau tahun tidak dapat ditentukan dengan pasti,
+    answer() mengembalikan None dan pertanyaan diteruskan ke RAG.
+
+    Args:
+        table (pandas.DataFrame): Hasil build_table.
+    """
+
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+        # (var_id, vervar) -> posisi baris
+        self._groups = self.table.groupby(["var_id", "vervar"], observed=True).indices
+
+        self._regions = RegionMatcher(self.table["vervar"].cat.categories)
+
+        # Token penting tiap judul variabel
+        variables = self.table[["var_id", "variable"]].drop_duplicates()
+        self._variables = {
+            var_id: (variable, set(normalize_question(variable).split()) - STOPWORDS)
+            for var_id, variable in zip(variables["var_id"], variables["variable"])
+        }
+
+        # Token rincian (turvar) tiap variabel; boleh disebut di pertanyaan tanpa dianggap kata asing
+        turvars = self.table[["var_id", "turvar"]].drop_duplicates()
+        self._turvar_tokens = {var_id: set() for var_id in self._variables}
+        for var_id, turvar in zip(turvars["var_id"], turvars["turvar"]):
+            self._turvar_tokens[var_id] |= set(normalize_question(str(turvar)).split())
+
+    @classmethod
+    def load(cls, path=DATA_LOOKUP_PATH):
+        """Memuat tabel Parquet hasil build; None jika file belum ada."""
+        if not os.path.exists(path):
+            return None
+        return cls(pd.read_parquet(path))
+
+    def _match_region(self, question):
+        """Wilayah yang disebut di pertanyaan (kecocokan terpanjang), atau None jika tidak ada/ambigu."""
+        labels = self._regions.match(question)
+        return labels.pop() if len(labels) == 1 else None
+
+    def _match_variable(self, tokens):
+        """varID dengan porsi token judul terbanyak yang muncul di pertanyaan, atau None jika lemah/seri.
+
+        tokens adalah token pertanyaan tanpa wilayah, tahun, dan stopword. Token yang tidak ada
+        di judul maupun rincian tabel menandakan variabel lain (mis. "persentase penduduk miskin"
+        bukan "Jumlah Penduduk"), sehingga judul hanya cocok jika token asing tersebut paling
+        banyak MAX_EXTRA_TOKENS, dan nol untuk judul pendek.
+        """
+        scored = []
+        for var_id, (_, var_tokens) in self._variables.items():
+            if not var_tokens:
+                continue
+            extra = tokens - var_tokens - self._turvar_tokens[var_id]
+            if len(extra) > (MAX_EXTRA_TOKENS if len(var_tokens) >= 3 else 0):
+                continue
+            matched = len(var_tokens & tokens)
+            scored.append((matched / len(var_tokens), matched, var_id))
+        scored.sort(reverse=True)
+        if not scored or scored[0][0] < 0.75 or scored[0][1] < min(2, len(self._variables[scored[0][2]][1])):
+            return None
+        if len(scored) > 1 and scored[1][:2] == scored[0][:2]:
+            return None
+        return scored[0][2]
+
+    def answer(self, question):
+        """Menjawab pertanyaan data langsung dari tabel.
+
+        Returns:
+            str: Jawaban, atau None jika pertanyaan tidak dapat dijawab dengan pasti.
+        """
+        with self._lock:
+            self.lookups += 1
+
+        normalized = normalize_question(question)
+        years = YEAR_PATTERN.findall(normalized)
+        region = self._match_region(normalized)
+        if not years or region is None:
+            return None
+
+        remaining = YEAR_PATTERN.sub(" ", self._regions.remove(normalized))
+        var_id = self._match_variable(set(remaining.split()) - STOPWORDS)
+        if var_id is None:
+            return None
+
+        positions = self._groups.get((var_id, region))
+        if positions is None:
+            return None
+        rows = self.table.iloc[positions]
+        rows = rows[rows["tahun"].astype(str).isin(years)]
+
+        # Jika pertanyaan menyebut rincian turvar tertentu (mis. "laki-laki"), batasi ke rincian tersebut
+        turvars = rows["turvar"].astype(str)
+        mentioned = turvars.map(lambda label: normalize_question(label) in normalized)
+        if mentioned.any():
+            rows = rows[mentioned.to_numpy()]
+        if rows.empty or len(rows) > MAX_ANSWER_ROWS:
+            return None
+
+        variable, _ = self._variables[var_id]
+        unit = str(rows["unit"].iloc[0]).strip()
+        lines = []
+        for row in rows.sort_values(["tahun", "turtahun", "turvar"]).itertuples(index=False):
+            detail = "" if normalize_question(str(row.turvar)) in ("", "tidak ada") else f" ({row.turvar})"
+            period = str(row.tahun) if normalize_question(str(row.turtahun)) in ("", "tahun", "tahunan") else f"{row.tahun} {row.turtahun}"
+            lines.append(f"- {period}{detail}: {format_value(row.value)}{' ' + unit if unit else ''}")
+
+        with self._lock:
+            self.hits += 1
+        return (f"{variable} untuk {region}:\n" + "\n".join(lines) +
+                "\n\nSumber: BPS Provinsi Sumatera Utara (https://sumut.bps.go.id)")
+
+    def stats(self):
+        """Jumlah pertanyaan yang dicoba, terjawab langsung, dan rasio hit (porsi trafik yang tidak ke LLM)."""
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            }
+
+
+if __name__ == "__main__":
+    # Penggunaan: python data_lookup.py build [JSON] [data_lookup.parquet]
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Penggunaan: python data_lookup.py build [JSON] [data_lookup.parquet]")
+        sys.exit(1)
+    folder = sys.argv[2] if len(sys.argv) > 2 else "JSON"
+    output = sys.argv[3] if len(sys.argv) > 3 else DATA_LOOKUP_PATH
+    table = build_table(folder)
+    table.to_parquet(output, index=False)
+    print(f"Tabel lookup ditulis ke {output}: {len(table)} baris, {table['var_id'].nunique()} variabel")
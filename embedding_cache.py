@@ -0,0 +1,257 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Lokasi dan kapasitas default cache embedding di disk
+EMBEDDING_CACHE_DIR = os.environ.get("EDA_EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EDA_EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+def _sanitize_model_name(model_name):
+    """Mengubah nama model (mis. "models/text-embedding-004") menjadi nama folder yang valid."""
+    return model_name.replace('/', '-').replace('\\', '-').replace(':', '-')
+
+
+class CachedEmbeddings(Embeddings):
+    """Pembungkus objek embedding dengan cache di disk berbasis isi teks.
+
+    Setiap vektor disimpan pada slot di file vektor yang di-mmap (float32), sedangkan
+    indeks (model, hash teks) -> slot disimpan di SQLite. Jika cache penuh, slot yang
+    paling lama tidak dipakai (LRU) digunakan ulang. Cache hit tidak pernah memanggil
+    API embedding.
+
+    File vektor tidak ikut transaksi SQLite, jadi setiap entri menyimpan checksum isi
+    slotnya. Slot yang isinya tidak cocok (ditimpa proses lain yang belum commit, atau
+    transaksi yang gagal/terputus) dianggap miss dan entrinya dihapus.
+
+    Kapasitas disimpan di tabel meta dan dipakai bersama semua proses: max_entries yang
+    berbeda dari nilai tersimpan memperbesar file vektor atau membuang entri di slot yang
+    berada di luar kapasitas baru.
+
+    Args:
+        embeddings (Embeddings): Objek embedding asli, mis. GoogleGenerativeAIEmbeddings.
+        cache_dir (str): Folder induk cache (default: EMBEDDING_CACHE_DIR).
+        max_entries (int): Jumlah maksimal vektor yang disimpan per model.
+    """
+
+    def __init__(self, embeddings, cache_dir=EMBEDDING_CACHE_DIR, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # Satu folder per model sehingga kunci cache efektif adalah (model, hash teks)
+        self.path = os.path.join(cache_dir, _sanitize_model_name(self.model_name))
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._pid = os.getpid()
+        self._db = self._connect()
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used REAL NOT NULL, checksum BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(entries)")]
+        if "checksum" not in columns:
+            # Cache lama tanpa checksum: entrinya tidak dapat diverifikasi dan dibuang saat dibaca
+            self._db.execute("ALTER TABLE entries ADD COLUMN checksum BLOB")
+        self._set_capacity(max_entries)
+
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=30,
+                             check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _reopen_after_fork(self):
+        """Di proses anak hasil fork (gunicorn --preload), koneksi SQLite dan kunci milik induk tidak dipakai ulang."""
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._db = self._connect()
+            self._pid = os.getpid()
+
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_capacity(self, max_entries):
+        """Menyimpan kapasitas ke meta; entri di slot di luar kapasitas baru dibuang."""
+        vectors_path = os.path.join(self.path, "vectors.f32")
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            stored = self._meta("max_entries")
+            dim = self._meta("dim")
+            if stored is None and dim and os.path.exists(vectors_path):
+                # Cache lama tanpa max_entries di meta: kapasitasnya diturunkan dari ukuran file
+                stored = os.path.getsize(vectors_path) // (4 * dim)
+            if stored is not None and max_entries < stored:
+                self._db.execute("DELETE FROM entries WHERE slot >= ?", (max_entries,))
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('max_entries', ?)", (max_entries,))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        if dim:
+            self._open_vectors(dim, max_entries)
+
+    def _sync_capacity(self):
+        """Memetakan ulang file vektor jika proses lain mengubah kapasitas (dipanggil di dalam transaksi)."""
+        max_entries = self._meta("max_entries")
+        if max_entries is not None and max_entries != self.max_entries and self._vectors is not None:
+            self._open_vectors(self.dim, max_entries)
+
+    def _open_vectors(self, dim, max_entries):
+        """Membuka (atau membuat) file vektor mmap berukuran max_entries x dim.
+
+        File hanya pernah diperbesar, sehingga pemetaan lama di proses lain tetap valid.
+        """
+        vectors_path = os.path.join(self.path, "vectors.f32")
+        with open(vectors_path, "ab") as f:
+            if f.tell() < max_entries * dim * 4:
+                f.truncate(max_entries * dim * 4)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(max_entries, dim))
+        self.dim = dim
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _checksum(vector):
+        """Checksum isi satu slot vektor."""
+        return hashlib.blake2b(np.ascontiguousarray(vector, dtype=np.float32).tobytes(), digest_size=8).digest()
+
+    @staticmethod
+    def _key(kind, text):
+        """Kunci cache: jenis embedding (dokumen/query) dan hash SHA-256 dari teks."""
+        return f"{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, keys):
+        """Mengambil vektor yang sudah ada di cache untuk daftar kunci.
+
+        Entri dan slotnya dibaca dalam satu transaksi baca; vektor yang checksum-nya tidak
+        cocok tidak dikembalikan dan entrinya dihapus.
+        """
+        if not keys:
+            return {}
+
+        found = {}
+        invalid = []
+        self._db.execute("BEGIN")
+        try:
+            if self._vectors is None:
+                dim = self._meta("dim")
+                if not dim:
+                    return {}
+                self._open_vectors(dim, self._meta("max_entries") or self.max_entries)
+            self._sync_capacity()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, slot, checksum FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, slot, checksum in rows:
+                    vector = np.array(self._vectors[slot]) if slot < self.max_entries else None
+                    if vector is not None and checksum == self._checksum(vector):
+                        found[key] = vector.tolist()
+                    else:
+                        invalid.append((key, slot, checksum))
+        finally:
+            self._db.execute("COMMIT")
+
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        if invalid:
+            # Hanya dihapus jika entrinya belum diganti proses lain sejak dibaca
+            self._db.executemany("DELETE FROM entries WHERE key = ? AND slot = ? AND checksum IS ?", invalid)
+        return found
+
+    def _store(self, items):
+        """Menyimpan pasangan (kunci, vektor) baru, menggusur entri LRU jika cache penuh."""
+        if not items:
+            return
+
+        # BEGIN IMMEDIATE agar alokasi slot aman walaupun cache dipakai beberapa proses
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if self._vectors is None:
+                self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (len(items[0][1]),))
+                self._open_vectors(self._meta("dim"), self._meta("max_entries") or self.max_entries)
+            self._sync_capacity()
+            now = time.time()
+            used = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            for key, vector in items:
+                if self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                    continue
+                if used < self.max_entries:
+                    slot = self._db.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+                    if slot >= self.max_entries:
+                        # Ada slot kosong di tengah (entri tidak valid atau kapasitas diperkecil)
+                        slot = self._db.execute(
+                            "SELECT MIN(free) FROM (SELECT 0 AS free UNION ALL SELECT slot + 1 FROM entries) "
+                            "WHERE free NOT IN (SELECT slot FROM entries)"
+                        ).fetchone()[0]
+                    used += 1
+                else:
+                    victim, slot = self._db.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                    ).fetchone()
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (victim,))
+                # Jika transaksi ini gagal, checksum entri lama di slot ini tidak lagi cocok
+                # sehingga pembaca menganggapnya miss alih-alih mengembalikan vektor yang salah
+                vector = np.asarray(vector, dtype=np.float32)
+                self._vectors[slot] = vector
+                self._db.execute("INSERT INTO entries (key, slot, last_used, checksum) VALUES (?, ?, ?, ?)",
+                                 (key, slot, now, self._checksum(vector)))
+            # Vektor ditulis ke disk sebelum commit sehingga proses lain tidak membaca slot kosong
+            self._vectors.flush()
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _embed(self, kind, texts, embed_fn):
+        """Mengembalikan embedding untuk texts, hanya memanggil embed_fn untuk teks yang belum ada di cache."""
+        self._reopen_after_fork()
+        keys = [self._key(kind, text) for text in texts]
+        with self._lock:
+            found = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = embed_fn(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_vectors))
+            with self._lock:
+                self._store(new_items)
+            found.update(new_items)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_documents(self, texts):
+        """Embedding dokumen dengan cache."""
+        return self._embed("doc", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        """Embedding query dengan cache (dipisahkan dari dokumen karena task type-nya berbeda)."""
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        """Mengembalikan statistik cache: jumlah hit, miss, dan entri yang tersimpan."""
+        self._reopen_after_fork()
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "max_entries": self.max_entries}
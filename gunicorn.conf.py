@@ -0,0 +1,55 @@
+import os
+import gc
+
+# Menjalankan main_model dengan beberapa proses worker:
+#   gunicorn -c gunicorn.conf.py main_model:app
+#
+# preload_app memuat indeks FAISS, docstore, dan model sekali di proses master sebelum fork,
+# sehingga worker berbagi halaman memori tersebut (copy-on-write) alih-alih memuat salinan
+# masing-masing. Riwayat sesi disimpan di SQLite (atau Redis) agar pesan berikutnya dari
+# notelp yang sama boleh dijawab worker mana pun.
+#
+# Klien Gemini (embedding dan chat) membuka channel gRPC yang tidak aman di-fork, jadi tidak
+# dibuat di master (EDA_DEFER_CLIENTS=1); setiap worker membuatnya sendiri di post_fork.
+#
+# Berbagi copy-on-write hanya berlaku untuk versi indeks yang dimuat master. Setelah hot swap,
+# setiap worker memuat versi baru sendiri: index.pkl hasil ingestion di-unpickle per worker
+# (docstore lengkap di memori tiap proses). Terbitkan versi dengan `python vector_index.py export`
+# agar worker membaca docstore.sqlite dan index.faiss lewat mmap, yang dibagi lewat page cache.
+#
+# Batas admission (EDA_MAX_CONCURRENT_GENERATIONS, EDA_GEMINI_RPM, EDA_USER_RPM) berlaku per
+# worker: bagi kuota Gemini dengan jumlah worker.
+
+bind = os.environ.get("EDA_BIND", "0.0.0.0:5002")
+workers = int(os.environ.get("EDA_WORKERS", str(os.cpu_count() or 2)))
+
+# Permintaan sebagian besar menunggu Gemini (I/O), jadi tiap worker melayani beberapa thread
+worker_class = "gthread"
+threads = int(os.environ.get("EDA_WORKER_THREADS", "8"))
+
+# Di atas EDA_READ_TIMEOUT gateway agar worker tidak dibunuh di tengah jawaban yang lambat
+timeout = int(os.environ.get("EDA_WORKER_TIMEOUT", "90"))
+graceful_timeout = 30
+
+preload_app = True
+
+# Riwayat sesi di memori proses tidak terlihat oleh worker lain
+os.environ.setdefault("EDA_SESSION_BACKEND", "sqlite")
+os.environ.setdefault("EDA_DEFER_CLIENTS", "1")
+
+
+def when_ready(server):
+    """Dijalankan di master setelah aplikasi dimuat, sebelum worker di-fork."""
+    import main_model
+    # Master tidak melayani permintaan; hanya worker yang memantau dan memuat versi indeks baru
+    main_model.index_manager.stop_watcher()
+    # Objek yang sudah dimuat dipindah ke generasi permanen agar GC di worker tidak menulis
+    # ke halamannya (menulis header objek akan menyalin halaman copy-on-write)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Thread dan channel gRPC tidak ikut ter-fork: watcher indeks dan klien Gemini dibuat di setiap worker."""
+    import main_model
+    main_model.create_clients()
+    main_model.index_manager.start_watcher()
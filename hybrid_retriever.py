@@ -0,0 +1,336 @@
+import os
+import json
+import shutil
+import threading
+from collections import Counter
+import numpy as np
+import faiss
+from answer_cache import normalize_question
+from data_lookup import RegionMatcher, YEAR_PATTERN
+
+# Retriever hybrid BM25 + FAISS dengan pre-filter metadata; EDA_HYBRID_RETRIEVAL=0 untuk k-NN biasa
+HYBRID_RETRIEVAL = os.environ.get("EDA_HYBRID_RETRIEVAL", "1") == "1"
+
+# Parameter BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Konstanta reciprocal rank fusion: skor = sum(1 / (RRF_K + peringkat))
+RRF_K = 60
+
+# Jumlah kandidat tiap metode (leksikal dan vektor) sebelum difusikan
+FETCH_K = int(os.environ.get("EDA_HYBRID_FETCH_K", "50"))
+
+# Jika kandidat hasil filter sebanyak ini atau kurang, jarak dihitung langsung dari vektornya
+EXACT_SEARCH_LIMIT = int(os.environ.get("EDA_EXACT_SEARCH_LIMIT", "20000"))
+
+# Field metadata yang dapat dipakai untuk pre-filter
+FILTER_FIELDS = ("source", "tahun", "vervar")
+
+# Indeks terbalik BM25 dan kode metadata yang dibangun saat ingestion, di dalam folder versi indeks
+LEXICAL_INDEX_DIR = "lexical"
+LEXICAL_META_FILE = "meta.json"
+
+
+def tokenize(text):
+    """Memecah teks menjadi token yang sudah dinormalkan (huruf kecil, tanpa tanda baca)."""
+    return normalize_question(text).split()
+
+
+def parse_content_fields(content):
+    """Mengurai teks dokumen baris tabel BPS/CSV menjadi field-fieldnya.
+
+    Format: "{file}, {tahun}[ {turtahun}], [{turvar} untuk ]{vervar}, {nilai}."
+
+    Returns:
+        dict: source, tahun (tahun saja), period (tahun beserta turtahun), turvar, vervar,
+        dan value; kosong jika teks bukan baris tabel.
+    """
+    parts = content.rstrip(".").rsplit(", ", 3)
+    if len(parts) < 4:
+        return {}
+    period = parts[1].strip()
+    year = YEAR_PATTERN.match(period)
+    if year is None:
+        return {}
+    turvar, _, vervar = parts[2].rpartition(" untuk ")
+    return {"source": parts[0].strip(), "tahun": year.group(1), "period": period,
+            "turvar": turvar.strip(), "vervar": vervar.strip(), "value": parts[3].strip()}
+
+
+def build_lexical_index(vector_store):
+    """Membangun indeks terbalik BM25 dan kode metadata dari seluruh dokumen vector store.
+
+    Postings disimpan dalam format CSR: posting term ke-i ada di positions/counts
+    [offsets[i]:offsets[i + 1]], terurut menurut posisi dokumen.
+
+    Returns:
+        tuple: (meta, arrays). meta berisi jumlah dokumen, daftar term, dan label tiap field
+        filter; arrays berisi array numpy doc_ids, offsets, positions, counts, lengths, dan
+        codes_<field>.
+    """
+    size = vector_store.index.ntotal
+    doc_ids = [vector_store.index_to_docstore_id[i] for i in range(size)]
+
+    terms = {}  # term -> nomor term
+    term_ids, positions, counts = [], [], []
+    lengths = np.zeros(size, dtype=np.float32)
+    values = {field: [] for field in FILTER_FIELDS}
+    for position, doc_id in enumerate(doc_ids):
+        doc = vector_store.docstore.search(doc_id)
+        content = getattr(doc, "page_content", "")
+        tokens = tokenize(content)
+        lengths[position] = len(tokens)
+        for term, count in Counter(tokens).items():
+            term_ids.append(terms.setdefault(term, len(terms)))
+            positions.append(position)
+            counts.append(count)
+
+        metadata = dict(getattr(doc, "metadata", {}) or {})
+        if "page" not in metadata and ("tahun" not in metadata or "vervar" not in metadata):
+            metadata = {**parse_content_fields(content), **metadata}
+        for field in FILTER_FIELDS:
+            values[field].append(str(metadata.get(field, "")))
+
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(terms)))
+    arrays = {
+        "doc_ids": np.asarray([doc_id.encode("utf-8") for doc_id in doc_ids], dtype=bytes) if doc_ids else np.zeros(0, dtype="S1"),
+        "offsets": offsets,
+        "positions": np.asarray(positions, dtype=np.int32)[order],
+        "counts": np.asarray(counts, dtype=np.float32)[order],
+        "lengths": lengths,
+    }
+
+    # Metadata disimpan sebagai kode kategori: label terurut dan array kode per posisi
+    labels = {}
+    for field, field_values in values.items():
+        field_labels, codes = np.unique(np.asarray(field_values, dtype=object).astype(str), return_inverse=True)
+        labels[field] = [str(label) for label in field_labels]
+        arrays[f"codes_{field}"] = codes.astype(np.int32)
+
+    meta = {"documents": size, "terms": list(terms), "labels": labels}
+    return meta, arrays
+
+
+def save_lexical_index(vector_store, vector_store_path):
+    """Membangun indeks leksikal dan menulisnya ke folder lexical/ di samping index.faiss.
+
+    Dipanggil oleh ingestion dan kompaksi sebelum versi indeks diterbitkan, sehingga server
+    cukup memetakan file-file ini alih-alih membangun ulang BM25 di setiap worker.
+    """
+    meta, arrays = build_lexical_index(vector_store)
+    path = os.path.join(vector_store_path, LEXICAL_INDEX_DIR)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, LEXICAL_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_lexical_index(vector_store_path, size):
+    """Memuat indeks leksikal yang ditulis save_lexical_index; array dipetakan ke memori.
+
+    Returns:
+        tuple: (meta, arrays) seperti build_lexical_index, atau None jika belum ada atau
+        jumlah dokumennya tidak sama dengan indeks vektor (indeks leksikal usang).
+    """
+    path = os.path.join(vector_store_path, LEXICAL_INDEX_DIR)
+    try:
+        with open(os.path.join(path, LEXICAL_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta.get("documents") != size:
+        return None
+    names = ("doc_ids", "offsets", "positions", "counts", "lengths") + tuple(f"codes_{field}" for field in FILTER_FIELDS)
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+    return meta, arrays
+
+
+class HybridRetriever:
+    """Retriever gabungan indeks terbalik BM25 dan vektor FAISS.
+
+    Tahun, wilayah (vervar), dan judul tabel (source) yang disebut dalam pertanyaan dipakai
+    sebagai pre-filter, sehingga BM25 dan pencarian vektor hanya menilai dokumen yang cocok.
+    Kedua peringkat digabung dengan reciprocal rank fusion (RRF).
+
+    Indeks terbalik dimuat dari folder lexical/ yang ditulis saat ingestion (dipetakan ke
+    memori dan dibagi antar-worker); jika belum ada, misalnya untuk indeks lama, indeks
+    dibangun dari seluruh docstore.
+
+    Args:
+        vector_store (FAISS): Vector store yang sudah dimuat (posisi vektor = posisi dokumen).
+        vector_store_path (str): Folder versi indeks tempat lexical/ dicari, atau None.
+    """
+
+    def __init__(self, vector_store, vector_store_path=None):
+        self.vector_store = vector_store
+        self.queries = 0
+        self.filtered = 0
+        self.candidates = 0
+        self._lock = threading.Lock()
+
+        self._size = vector_store.index.ntotal
+        lexical = load_lexical_index(vector_store_path, self._size) if vector_store_path else None
+        self.prebuilt = lexical is not None
+        meta, arrays = lexical if lexical is not None else build_lexical_index(vector_store)
+
+        self._doc_ids = arrays["doc_ids"]
+        self._terms = {term: number for number, term in enumerate(meta["terms"])}
+        self._offsets = arrays["offsets"]
+        self._positions = arrays["positions"]
+        self._counts = arrays["counts"]
+        self._lengths = arrays["lengths"]
+        frequencies = np.diff(self._offsets)
+        self._idf = np.log(1 + (self._size - frequencies + 0.5) / (frequencies + 0.5))
+        self._avg_length = float(self._lengths.mean()) if self._size else 0.0
+
+        # field -> (label -> kode, array kode per posisi)
+        self._fields = {
+            field: ({label: code for code, label in enumerate(meta["labels"][field]) if label}, arrays[f"codes_{field}"])
+            for field in FILTER_FIELDS
+        }
+
+        self._regions = RegionMatcher(self._fields["vervar"][0])
+        self._sources = {normalize_question(label): label for label in self._fields["source"][0]}
+
+    def infer_filters(self, question):
+        """Menentukan filter metadata dari tahun, wilayah, dan judul tabel yang disebut pertanyaan.
+
+        Returns:
+            dict: field -> set nilai; hanya nilai yang ada di indeks yang dipakai.
+        """
+        normalized = normalize_question(question)
+        filters = {}
+
+        years = set(YEAR_PATTERN.findall(normalized)) & self._fields["tahun"][0].keys()
+        if years:
+            filters["tahun"] = years
+
+        regions = self._regions.match(normalized)
+        if regions:
+            filters["vervar"] = regions
+
+        padded = f" {normalized} "
+        sources = {label for name, label in self._sources.items() if name and f" {name} " in padded}
+        if sources:
+            filters["source"] = sources
+        return filters
+
+    def _candidate_mask(self, filters):
+        """Mask boolean posisi dokumen yang lolos semua filter, atau None jika tanpa filter."""
+        mask = None
+        for field, allowed in filters.items():
+            if field not in self._fields or not allowed:
+                continue
+            label_codes, codes = self._fields[field]
+            allowed_codes = [label_codes[value] for value in allowed if value in label_codes]
+            field_mask = np.isin(codes, allowed_codes)
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def _bm25_search(self, question, mask, fetch_k):
+        """Peringkat posisi dokumen menurut skor BM25 (hanya dokumen dalam mask)."""
+        scores = np.zeros(self._size, dtype=np.float32)
+        for term in set(tokenize(question)):
+            number = self._terms.get(term)
+            if number is None:
+                continue
+            start, end = self._offsets[number], self._offsets[number + 1]
+            positions, counts = self._positions[start:end], self._counts[start:end]
+            norm = counts + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[positions] / self._avg_length)
+            scores[positions] += self._idf[number] * counts * (BM25_K1 + 1) / norm
+        if mask is not None:
+            scores[~mask] = 0
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > fetch_k:
+            matched = matched[np.argpartition(-scores[matched], fetch_k)[:fetch_k]]
+        return matched[np.argsort(-scores[matched], kind="stable")]
+
+    def _search_params(self, selector):
+        """SearchParameters FAISS dengan IDSelector, mempertahankan nprobe/efSearch indeks."""
+        index = self.vector_store.index
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+
+    def _vector_search(self, query_embedding, mask, fetch_k):
+        """Peringkat posisi dokumen menurut jarak L2 ke query (hanya dokumen dalam mask)."""
+        index = self.vector_store.index
+        query = np.asarray([query_embedding], dtype=np.float32)
+        if mask is None:
+            _, ids = index.search(query, fetch_k)
+            return ids[0][ids[0] >= 0]
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) <= EXACT_SEARCH_LIMIT:
+            # Subset kecil: rekonstruksi vektor kandidat dan hitung jaraknya langsung (eksak)
+            try:
+                vectors = index.reconstruct_batch(candidates)
+            except RuntimeError:
+                vectors = None  # IVF tanpa direct map
+            if vectors is not None:
+                distances = ((vectors - query) ** 2).sum(axis=1)
+                return candidates[np.argsort(distances, kind="stable")[:fetch_k]]
+
+        selector = faiss.IDSelectorBatch(candidates)
+        _, ids = index.search(query, fetch_k, params=self._search_params(selector))
+        return ids[0][ids[0] >= 0]
+
+    def search(self, question, query_embedding, k, filters=None, fetch_k=FETCH_K):
+        """Mencari k dokumen paling relevan dengan BM25 + vektor yang difusikan RRF.
+
+        Args:
+            question (str): Pertanyaan pengguna (untuk BM25 dan inferensi filter).
+            query_embedding (list): Embedding pertanyaan.
+            k (int): Jumlah dokumen yang dikembalikan.
+            filters (dict): field -> nilai yang diizinkan; None untuk inferensi dari pertanyaan.
+            fetch_k (int): Jumlah kandidat tiap metode sebelum fusi.
+
+        Returns:
+            tuple: (list ID docstore, list Document) terurut menurut skor RRF.
+        """
+        if filters is None:
+            filters = self.infer_filters(question)
+        mask = self._candidate_mask(filters)
+        if mask is not None and not mask.any():
+            mask = None  # filter terlalu sempit (mis. tahun yang belum ada): cari di seluruh indeks
+        fetch_k = max(fetch_k, k)
+
+        fused = Counter()
+        for ranking in (self._vector_search(query_embedding, mask, fetch_k),
+                        self._bm25_search(question, mask, fetch_k)):
+            for rank, position in enumerate(ranking.tolist()):
+                fused[position] += 1.0 / (RRF_K + rank + 1)
+
+        with self._lock:
+            self.queries += 1
+            if mask is not None:
+                self.filtered += 1
+                self.candidates += int(mask.sum())
+
+        doc_ids = [self._doc_ids[position].decode("utf-8") for position, _ in fused.most_common(k)]
+        return doc_ids, [self.vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+
+    def stats(self):
+        """Jumlah pencarian, porsi yang memakai pre-filter, dan rata-rata ukuran kandidat."""
+        with self._lock:
+            return {
+                "documents": self._size,
+                "terms": len(self._terms),
+                "prebuilt": self.prebuilt,
+                "queries": self.queries,
+                "filtered": self.filtered,
+                "avg_candidates": self.candidates / self.filtered if self.filtered else 0.0,
+            }
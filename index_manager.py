@@ -0,0 +1,124 @@
+import os
+import gc
+import time
+import logging
+import threading
+from vector_index import (load_vector_store, set_search_params, current_index_version, index_version_path,
+                          is_immutable_version, resident_memory_mb, INDEX_MMAP)
+
+# Folder indeks berversi yang dilayani (berisi CURRENT dan versions/)
+INDEX_PATH = os.environ.get("EDA_INDEX_PATH", "faiss_index")
+
+# Selang waktu pemeriksaan penunjuk CURRENT oleh watcher (detik)
+INDEX_POLL_INTERVAL = float(os.environ.get("EDA_INDEX_POLL_INTERVAL", "5"))
+
+
+class IndexBundle:
+    """Satu versi indeks yang sudah dimuat beserta retriever yang dibangun di atasnya.
+
+    Setiap permintaan mengambil satu bundle di awal dan memakainya sampai selesai, sehingga
+    pergantian versi di tengah permintaan tidak mencampur dua indeks.
+    """
+
+    def __init__(self, version, path, vector_store, retriever=None):
+        self.version = version
+        self.path = path
+        self.vector_store = vector_store
+        self.retriever = retriever
+
+
+class IndexManager:
+    """Memuat indeks versi aktif dan menggantinya tanpa downtime ketika CURRENT berubah.
+
+    Watcher di thread latar memeriksa CURRENT setiap poll_interval detik. Versi baru dimuat
+    (termasuk build_retriever) sepenuhnya di thread tersebut, lalu ditukar dengan satu
+    assignment atribut; permintaan yang sedang berjalan tetap memakai bundle lamanya. Bundle
+    lama dibebaskan setelah permintaan terakhir yang memakainya selesai.
+
+    Args:
+        index_root (str): Folder indeks berversi.
+        embeddings (Embeddings): Model embedding untuk vektor store.
+        build_retriever (callable): Membuat retriever dari vektor store dan folder versinya, atau None.
+        poll_interval (float): Selang pemeriksaan CURRENT dalam detik.
+    """
+
+    def __init__(self, index_root=INDEX_PATH, embeddings=None, build_retriever=None, poll_interval=INDEX_POLL_INTERVAL):
+        self.index_root = index_root
+        self.embeddings = embeddings
+        self.build_retriever = build_retriever
+        self.poll_interval = poll_interval
+        self.swaps = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._watcher_pid = None
+        self.current = self._load(current_index_version(index_root))
+
+    def _load(self, version):
+        """Memuat satu versi indeks menjadi IndexBundle."""
+        start = time.perf_counter()
+        path = index_version_path(self.index_root, version)
+        # Published versions are never rewritten, so they are memory-mapped (unless EDA_INDEX_MMAP=0);
+        # a legacy folder may still be overwritten in place and is read fully
+        mmap = INDEX_MMAP and is_immutable_version(version)
+        vector_store = load_vector_store(path, self.embeddings, mmap=mmap)
+        set_search_params(vector_store.index)  # nprobe / efSearch for IVF and HNSW indexes
+        retriever = self.build_retriever(vector_store, path) if self.build_retriever is not None else None
+        logging.info("Loaded index version %s (%d vectors) in %.2fs, RSS %.1f MiB", version,
+                     vector_store.index.ntotal, time.perf_counter() - start, resident_memory_mb())
+        return IndexBundle(version, path, vector_store, retriever)
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def check(self):
+        """Memuat dan menukar versi baru jika CURRENT berubah. Mengembalikan True jika ditukar."""
+        with self._lock:
+            version = current_index_version(self.index_root)
+            if version is None or version == self.current.version:
+                return False
+            bundle = self._load(version)
+            old_version, self.current = self.current.version, bundle
+            self.swaps += 1
+        # Bundle lama hanya masih dirujuk oleh permintaan yang sedang berjalan
+        gc.collect()
+        logging.info("Swapped index version %s -> %s, RSS %.1f MiB", old_version, version, resident_memory_mb())
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                # Versi yang gagal dimuat dicoba lagi pada pemeriksaan berikutnya; versi lama tetap dilayani
+                self.failures += 1
+                logging.exception("Failed to load index version from %s", self.index_root)
+
+    def start_watcher(self):
+        """Menjalankan watcher; aman dipanggil berulang dan setelah fork (thread tidak ikut ter-fork)."""
+        if self._watcher_pid is not None and self._watcher_pid != os.getpid():
+            # Di proses anak hasil fork, kunci bisa tertinggal terkunci oleh watcher induk
+            self._lock = threading.Lock()
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive() and self._watcher_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+            self._watcher_pid = os.getpid()
+            self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def stats(self):
+        """Versi aktif, jumlah vektor, dan jumlah penukaran/kegagalan muat."""
+        bundle = self.current
+        return {
+            "version": bundle.version,
+            "vectors": bundle.vector_store.index.ntotal,
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "watcher_alive": self._watcher is not None and self._watcher.is_alive() and self._watcher_pid == os.getpid(),
+        }
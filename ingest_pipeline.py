@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from rate_limit import TokenBucket
+from vector_index import document_id, compact_vector_store, current_index_version, can_train, TRAIN_SAMPLE_SIZE, VERSIONS_DIR
+
+# Jumlah batch yang di-embed bersamaan
+EMBED_WORKERS = int(os.environ.get("EDA_EMBED_WORKERS", "4"))
+
+# Batas permintaan embedding (batch) per detik ke API embedding
+EMBED_RATE = float(os.environ.get("EDA_EMBED_RATE", "5"))
+
+# Indeks parsial disimpan setiap sekian batch yang sudah ditulis, dan hanya jika jumlah dokumen
+# yang ditambahkan upload ini sudah tumbuh sebesar faktor ini sejak checkpoint terakhir: setiap
+# checkpoint menulis ulang seluruh indeks, jadi jarak yang tumbuh geometris membuat total tulisan
+# linear (bukan kuadratik) terhadap ukuran upload
+CHECKPOINT_EVERY = int(os.environ.get("EDA_CHECKPOINT_EVERY", "20"))
+CHECKPOINT_GROWTH = float(os.environ.get("EDA_CHECKPOINT_GROWTH", "1.5"))
+
+# File checkpoint di dalam folder vector store; ada selama ingestion belum selesai
+CHECKPOINT_FILE = "ingest_checkpoint.json"
+
+
+def load_checkpoint(vector_store_path):
+    """Membaca checkpoint ingestion yang belum selesai, atau None jika tidak ada."""
+    try:
+        with open(os.path.join(vector_store_path, CHECKPOINT_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def clear_checkpoint(vector_store_path):
+    """Menghapus checkpoint setelah ingestion selesai."""
+    try:
+        os.remove(os.path.join(vector_store_path, CHECKPOINT_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def upload_fingerprint(files):
+    """Sidik sebuah upload: hash dari nama dan ukuran tiap file.
+
+    Args:
+        files (iterable): Objek unggahan Streamlit (name, size) atau path file.
+    """
+    entries = []
+    for file in files:
+        if isinstance(file, str):
+            entries.append((os.path.basename(file), os.path.getsize(file)))
+        else:
+            size = getattr(file, "size", None)
+            entries.append((file.name, size if size is not None else len(file.getvalue())))
+    return hashlib.sha1(json.dumps(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+def find_resumable_version(index_root, fingerprint=None):
+    """Folder versi yang belum diterbitkan dengan checkpoint dari upload yang sama, atau None.
+
+    Hanya upload terputus yang sidiknya (upload_fingerprint) sama yang dilanjutkan; tanpa
+    fingerprint, upload selalu dimulai dari versi aktif.
+    """
+    versions_path = os.path.join(index_root, VERSIONS_DIR)
+    if fingerprint is None or not os.path.isdir(versions_path):
+        return None
+    current = current_index_version(index_root) or ""
+    for name in sorted(os.listdir(versions_path), reverse=True):
+        if name <= current:
+            break
+        checkpoint = load_checkpoint(os.path.join(versions_path, name))
+        if checkpoint is not None and checkpoint.get("fingerprint") == fingerprint:
+            return os.path.join(versions_path, name)
+    return None
+
+
+class IngestPipeline:
+    """Ingestion dokumen ke vector store dengan embedding paralel dan satu penulis berurutan.
+
+    Thread utama membaca dokumen, membuang dokumen yang ID-nya sudah terindeks, lalu
+    mengirim batch ke thread pool untuk di-embed (dibatasi TokenBucket). Hasil embedding
+    ditulis ke indeks sesuai urutan batch oleh thread utama saja, sehingga FAISS dan
+    docstore tidak pernah diubah bersamaan. Jumlah batch yang menunggu dibatasi agar
+    memori tetap kecil untuk upload besar.
+
+    Setiap CHECKPOINT_EVERY batch (dan setelah dokumen yang ditambahkan tumbuh CHECKPOINT_GROWTH
+    kali sejak checkpoint sebelumnya), indeks parsial disimpan bersama file checkpoint berisi sidik
+    upload. Karena ID dokumen deterministik, menjalankan ulang upload yang gagal cukup
+    memuat indeks parsial itu: dokumen yang sudah tersimpan dilewati tanpa di-embed ulang.
+
+    Args:
+        vector_store (FAISS): Vector store tujuan.
+        embeddings (Embeddings): Model embedding untuk isi dokumen.
+        vector_store_path (str): Folder vector store untuk checkpoint.
+        pending_index_type (str): Jenis indeks IVF yang menunggu training, atau None.
+        batch_size (int): Jumlah dokumen baru per permintaan embedding.
+        workers (int): Jumlah batch yang di-embed bersamaan.
+        rate (float): Permintaan embedding per detik.
+        checkpoint_every (int): Jumlah batch minimal di antara checkpoint; 0 untuk menonaktifkan.
+        checkpoint_growth (float): Pertumbuhan minimal dokumen yang ditambahkan di antara checkpoint.
+        progress (callable): Dipanggil dengan dict statistik setelah setiap batch ditulis.
+        fingerprint (str): Sidik upload yang dicatat di checkpoint (lihat find_resumable_version).
+    """
+
+    def __init__(self, vector_store, embeddings, vector_store_path, pending_index_type=None, batch_size=1000,
+                 workers=EMBED_WORKERS, rate=EMBED_RATE, checkpoint_every=CHECKPOINT_EVERY,
+                 checkpoint_growth=CHECKPOINT_GROWTH, progress=None, fingerprint=None):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.vector_store_path = vector_store_path
+        self.pending_index_type = pending_index_type
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = TokenBucket(rate)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_growth = checkpoint_growth
+        self.progress = progress
+        self.fingerprint = fingerprint
+        self.checkpoints = 0
+        self._checkpoint_batch = 0
+        self._checkpoint_added = 0
+        self.seen_ids = {}  # source -> ID dokumen yang ada di upload ini
+        self.rows = self.added = self.skipped = self.batches = 0
+        self._start = None
+
+    def _new_documents(self, documents, indexed_ids):
+        """Menghasilkan dokumen yang belum terindeks beserta ID-nya, sambil mencatat seen_ids."""
+        for doc in documents:
+            self.rows += 1
+            doc_id = document_id(doc)
+            self.seen_ids.setdefault(doc.metadata.get("source", ""), set()).add(doc_id)
+            if doc_id in indexed_ids:
+                self.skipped += 1
+                continue
+            indexed_ids.add(doc_id)
+            yield doc, doc_id
+
+    def _embed(self, texts):
+        """Dijalankan di thread pool: menunggu kuota lalu meng-embed satu batch."""
+        self.limiter.acquire()
+        return self.embeddings.embed_documents(texts)
+
+    def _write(self, batch, vectors):
+        """Menambahkan satu batch yang sudah di-embed ke indeks (hanya dari thread utama)."""
+        docs, ids = zip(*batch)
+        self.vector_store.add_embeddings(
+            text_embeddings=list(zip([doc.page_content for doc in docs], vectors)),
+            metadatas=[doc.metadata for doc in docs],
+            ids=list(ids),
+        )
+        self.added += len(batch)
+        self.batches += 1
+
+        # Indeks IVF dilatih sekali setelah sampel training terkumpul di indeks flat sementara
+        if (self.pending_index_type and self.vector_store.index.ntotal >= TRAIN_SAMPLE_SIZE
+                and can_train(self.pending_index_type, self.vector_store.index.ntotal)):
+            self.vector_store = compact_vector_store(self.vector_store, index_type=self.pending_index_type)
+            self.pending_index_type = None
+
+        if (self.checkpoint_every and self.batches - self._checkpoint_batch >= self.checkpoint_every
+                and self.added >= self._checkpoint_added * self.checkpoint_growth):
+            self.checkpoint()
+        if self.progress is not None:
+            self.progress(self.stats())
+
+    def checkpoint(self):
+        """Menyimpan indeks parsial dan file checkpoint agar upload yang gagal dapat dilanjutkan."""
+        self.vector_store.save_local(self.vector_store_path)
+        with open(os.path.join(self.vector_store_path, CHECKPOINT_FILE), "w", encoding="utf-8") as f:
+            json.dump({"pending_index_type": self.pending_index_type, "fingerprint": self.fingerprint, **self.stats()}, f)
+        self.checkpoints += 1
+        self._checkpoint_batch = self.batches
+        self._checkpoint_added = self.added
+
+    def run(self, documents):
+        """Meng-embed dan menulis semua dokumen.
+
+        Returns:
+            FAISS: Vector store hasil (objek baru jika indeks IVF dilatih selama ingestion).
+        """
+        self._start = time.perf_counter()
+        indexed_ids = set(self.vector_store.index_to_docstore_id.values())
+        new_documents = self._new_documents(iter(documents), indexed_ids)
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    batch = list(islice(new_documents, self.batch_size))
+                    if batch:
+                        pending.append((batch, executor.submit(self._embed, [doc.page_content for doc, _ in batch])))
+                    # Penulis berurutan: batch tertua ditulis dulu; antrean dibatasi 2x jumlah worker
+                    while pending and (not batch or len(pending) >= 2 * self.workers):
+                        done_batch, future = pending.popleft()
+                        self._write(done_batch, future.result())
+                    if not batch:
+                        break
+            except BaseException:
+                # Batch yang sudah ditulis disimpan agar run berikutnya melanjutkan dari sini
+                for _, future in pending:
+                    future.cancel()
+                if self.checkpoint_every and self.added:
+                    self.checkpoint()
+                raise
+
+        # Terlalu sedikit vektor untuk training (mis. PQ < 256): indeks tetap flat dan dikonversi
+        # pada upload berikutnya yang membuatnya cukup besar
+        if self.pending_index_type and can_train(self.pending_index_type, self.vector_store.index.ntotal):
+            self.vector_store = compact_vector_store(self.vector_store, index_type=self.pending_index_type)
+            self.pending_index_type = None
+        return self.vector_store
+
+    def stats(self):
+        """Baris dibaca, dokumen ditambahkan/dilewati, dan throughput baris per detik."""
+        elapsed = time.perf_counter() - self._start if self._start else 0.0
+        return {
+            "rows": self.rows,
+            "added": self.added,
+            "skipped": self.skipped,
+            "batches": self.batches,
+            "rows_per_second": self.rows / elapsed if elapsed else 0.0,
+        }
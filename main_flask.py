@@ -1,40 +1,173 @@
-from flask import Flask, request, jsonify  # Mengimpor Flask untuk membuat aplikasi web, dan request, jsonify untuk menangani dan merespons permintaan HTTP
+from flask import Flask, Response, request, jsonify, stream_with_context  # Mengimpor Flask untuk membuat aplikasi web, dan request, jsonify untuk menangani dan merespons permintaan HTTP
 import requests  # Mengimpor modul requests untuk melakukan permintaan HTTP ke server lain
 import logging  # Mengimpor modul logging untuk mencatat log aplikasi
+import os  # Mengimpor modul os untuk membaca konfigurasi dari environment variable
+import time  # Mengimpor modul time untuk mengukur latensi
+import uuid  # Mengimpor modul uuid untuk membuat trace ID per permintaan
+import metrics  # Metrik format Prometheus untuk endpoint /metrics
+from requests.adapters import HTTPAdapter  # Adapter untuk connection pool keep-alive
+from urllib3.util.retry import Retry  # Kebijakan retry dengan backoff
 
 app = Flask(__name__)  # Membuat instans aplikasi Flask
 
 # Konfigurasi Logging
-logging.basicConfig(level=logging.DEBUG)  # Mengatur logging untuk mencatat semua pesan debug dan pesan yang lebih serius
+logging.basicConfig(level=logging.INFO)  # Mengatur logging; payload tidak lagi dicatat pada setiap panggilan
 
-def send_to_main(response_text, session_id):
+# Konfigurasi koneksi ke server utama (main_model.py)
+MAIN_URL = os.environ.get('EDA_MAIN_URL', 'http://localhost:5002/process_text')  # URL server utama, sesuaikan dengan URL server Anda
+MAIN_STREAM_URL = os.environ.get('EDA_MAIN_STREAM_URL', 'http://localhost:5002/process_text_stream')  # Endpoint streaming (server-sent events) server utama
+CONNECT_TIMEOUT = float(os.environ.get('EDA_CONNECT_TIMEOUT', '3'))  # Batas waktu membuka koneksi (detik)
+READ_TIMEOUT = float(os.environ.get('EDA_READ_TIMEOUT', '60'))  # Batas waktu menunggu jawaban (detik)
+MAX_RETRIES = int(os.environ.get('EDA_MAX_RETRIES', '2'))  # Jumlah retry maksimal
+RETRY_BACKOFF = float(os.environ.get('EDA_RETRY_BACKOFF', '0.5'))  # Faktor backoff eksponensial (detik)
+POOL_SIZE = int(os.environ.get('EDA_POOL_SIZE', '20'))  # Jumlah koneksi keep-alive ke server utama
+IN_PROCESS = os.environ.get('EDA_IN_PROCESS', '0') == '1'  # Panggil main_model langsung jika kedua layanan berjalan dalam satu proses
+
+def create_session():
+    """
+    Membuat requests.Session dengan connection pool keep-alive dan retry terbatas.
+
+    Retry hanya dilakukan untuk kegagalan koneksi, saat pesan pasti belum sampai ke server utama.
+    Read timeout dan status error (mis. 503 saat Gemini tidak tersedia) tidak di-retry karena
+    server utama mungkin sudah memproses pesan, dan mengirim ulang hanya menambah beban pada
+    layanan yang sedang bermasalah.
+
+    Returns:
+        requests.Session: Session yang dipakai ulang untuk semua panggilan ke server utama.
+    """
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=0,
+        status=0,
+        allowed_methods=frozenset(['POST']),
+        backoff_factor=RETRY_BACKOFF,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+main_session = create_session()  # Session bersama untuk semua thread gateway
+
+# Metrik gateway: latensi round-trip ke server utama, status upstream, dan time-to-first-chunk streaming
+ROUND_TRIP_SECONDS = metrics.Histogram('eda_gateway_round_trip_seconds', 'Round-trip time from the gateway to the model server', ('endpoint', 'outcome'))
+UPSTREAM_RESPONSES = metrics.Counter('eda_gateway_upstream_responses_total', 'Model server responses by HTTP status', ('status',))
+FIRST_CHUNK_SECONDS = metrics.Histogram('eda_gateway_first_chunk_seconds', 'Time to the first streamed chunk at the gateway')
+
+if IN_PROCESS:
+    import main_model  # Memuat model dan indeks di proses ini; send_to_main tidak lagi melalui HTTP
+
+def send_to_main(response_text, session_id, trace_id=None, info=None):
     """
     Mengirim response_text dan session_id ke server utama (main.py) untuk diproses.
     
     Args:
         response_text (str): Teks respons yang akan diproses.
         session_id (str): ID sesi untuk identifikasi sesi pengguna.
+        trace_id (str): ID permintaan yang diteruskan sebagai header X-Request-ID untuk mencocokkan log.
+        info (dict): Jika diberikan, diisi 'status' (status HTTP server utama, None jika tidak
+            terhubung) dan 'error_class' (kelas error server utama, None jika berhasil).
 
     Returns:
         str: Teks yang telah diproses oleh server utama, atau None jika terjadi kesalahan.
     """
-    main_url = 'http://localhost:5002/process_text'  # URL server utama (main.py), sesuaikan dengan URL server Anda
+    start = time.perf_counter()  # Mulai mengukur latensi panggilan
+    info = {} if info is None else info
+    info.update(status=None, error_class=None)
+
+    if IN_PROCESS:
+        # Jalur cepat: memanggil fungsi model secara langsung tanpa HTTP
+        info['trace_id'] = trace_id
+        processed_text = main_model.get_response(response_text, session_id, info=info)
+        ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response', outcome=info['error_class'] or 'success')
+        logging.info(f"[{trace_id}] In-process call to main_model took {time.perf_counter() - start:.3f}s")
+        return processed_text
+
     payload = {'response_text': response_text, 'notelp': session_id}  # Data yang akan dikirim ke server utama
+    headers = {'X-Request-ID': trace_id} if trace_id else None  # Trace ID ikut dicatat di log server utama
 
     try:
-        logging.debug(f"Sending to main.py. Payload: {payload}")  # Mencatat payload sebelum dikirim
-        response = requests.post(main_url, json=payload)  # Mengirim permintaan POST ke server utama dengan payload JSON
-        logging.debug(f"Main.py response status: {response.status_code}, Response: {response.text}")  # Mencatat status dan respons dari server utama
+        logging.debug(f"Sending to main.py. Text length: {len(response_text)}")  # Mencatat ukuran payload, bukan isinya
+        response = main_session.post(MAIN_URL, json=payload, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))  # Mengirim permintaan POST melalui connection pool
+        elapsed = time.perf_counter() - start
+        UPSTREAM_RESPONSES.inc(status=response.status_code)
+        ROUND_TRIP_SECONDS.observe(elapsed, endpoint='get_response', outcome='success' if response.status_code == 200 else f'http_{response.status_code}')
+        logging.info(f"[{trace_id}] Main.py responded with status {response.status_code} in {elapsed:.3f}s")  # Mencatat status dan latensi panggilan
+        info['status'] = response.status_code
         
         if response.status_code == 200:  # Memeriksa apakah permintaan berhasil
             return response.json().get('processed_text', '')  # Mengembalikan teks yang telah diproses dari respons JSON
         else:
             logging.error(f"Failed to get processed response from main.py. Status code: {response.status_code}, Response: {response.text}")
-            return None  # Mengembalikan None jika terjadi kesalahan pada server utama
+            try:
+                # Kuota Gemini habis (429) atau layanan tidak tersedia (503): server utama tetap mengirim pesan untuk pengguna
+                body = response.json()
+                info['error_class'] = body.get('error') or 'internal'
+                return body.get('processed_text')
+            except ValueError:
+                info['error_class'] = 'internal'
+                return None  # Mengembalikan None jika terjadi kesalahan pada server utama
     except Exception as e:
-        logging.error(f"Error sending data to main.py: {str(e)}")  # Mencatat kesalahan jika terjadi masalah saat mengirim data ke server utama
+        info['error_class'] = 'connection_error'
+        ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response', outcome='connection_error')
+        logging.error(f"[{trace_id}] Error sending data to main.py after {time.perf_counter() - start:.3f}s: {str(e)}")  # Mencatat kesalahan jika terjadi masalah saat mengirim data ke server utama
         return None  # Mengembalikan None jika terjadi kesalahan
 
+def stream_from_main(response_text, session_id, trace_id=None):
+    """
+    Meneruskan jawaban server utama potong demi potong (server-sent events) tanpa menunggu jawaban lengkap.
+
+    Args:
+        response_text (str): Teks pertanyaan pengguna.
+        session_id (str): ID sesi untuk identifikasi sesi pengguna.
+        trace_id (str): ID permintaan yang diteruskan sebagai header X-Request-ID.
+
+    Yields:
+        bytes/str: Event SSE "chunk" untuk setiap potongan jawaban dan event "done" di akhir.
+    """
+    start = time.perf_counter()  # Mulai mengukur time-to-first-chunk dan latensi total
+    first_chunk = None
+
+    if IN_PROCESS:
+        for event in main_model.sse_response_events(response_text, session_id, trace_id):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+                FIRST_CHUNK_SECONDS.observe(first_chunk)
+            yield event
+        ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response_stream', outcome='success')
+        logging.info(f"[{trace_id}] In-process stream: first chunk after {first_chunk:.3f}s, total {time.perf_counter() - start:.3f}s")
+        return
+
+    payload = {'response_text': response_text, 'notelp': session_id}
+    headers = {'X-Request-ID': trace_id} if trace_id else None
+    try:
+        # stream=True: body dibaca bertahap sehingga potongan dapat diteruskan segera setelah diterima
+        with main_session.post(MAIN_STREAM_URL, json=payload, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            UPSTREAM_RESPONSES.inc(status=response.status_code)
+            if response.status_code != 200:
+                ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response_stream', outcome=f'http_{response.status_code}')
+                logging.error(f"[{trace_id}] Failed to stream from main.py. Status code: {response.status_code}")
+                yield 'event: error\ndata: {"status": "error", "message": "Failed to process text"}\n\n'
+                return
+            for chunk in response.iter_content(chunk_size=None):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                    FIRST_CHUNK_SECONDS.observe(first_chunk)
+                yield chunk
+        ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response_stream', outcome='success')
+        logging.info(f"[{trace_id}] Main.py stream: first chunk after {first_chunk or 0:.3f}s, total {time.perf_counter() - start:.3f}s")
+    except Exception as e:
+        ROUND_TRIP_SECONDS.observe(time.perf_counter() - start, endpoint='get_response_stream', outcome='connection_error')
+        logging.error(f"[{trace_id}] Error streaming from main.py after {time.perf_counter() - start:.3f}s: {str(e)}")
+        yield 'event: error\ndata: {"status": "error", "message": "Failed to process text"}\n\n'
+
+def request_trace_id():
+    """Memakai X-Request-ID dari pemanggil jika ada, atau membuat trace ID baru."""
+    return request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
 @app.route('/get_response', methods=['POST'])
 def get_response():
     """
@@ -49,16 +182,51 @@ def get_response():
     session_id = data.get('id')  # Mendapatkan session_id dari data JSON
     
     if response_text and session_id:  # Memeriksa apakah teks respons dan session_id tersedia
-        logging.debug(f"Received response text: {response_text} with notelp: {session_id}")  # Mencatat teks respons dan session_id yang diterima
+        logging.debug(f"Received response text of length {len(response_text)} with notelp: {session_id}")  # Mencatat panjang teks respons dan session_id yang diterima
 
         # Mengirim teks respons dan session_id ke server utama untuk diproses
-        processed_text = send_to_main(response_text, session_id)
+        trace_id = request_trace_id()
+        info = {}
+        processed_text = send_to_main(response_text, session_id, trace_id, info)
         
-        # Mengembalikan teks yang telah diproses sebagai respons
-        return jsonify({"status": "success", "response_text": processed_text}), 200
+        # Status HTTP tetap 200 agar bot WhatsApp/Telegram tetap meneruskan pesan "sibuk" ke pengguna;
+        # status dan kelas error server utama diteruskan di body dan header untuk pemantauan
+        headers = {'X-Request-ID': trace_id, 'X-Upstream-Status': str(info['status'] or 0)}
+        if info['error_class']:
+            headers['X-Upstream-Error'] = info['error_class']
+            return jsonify({"status": "error", "error": info['error_class'], "upstream_status": info['status'],
+                            "response_text": processed_text}), 200, headers
+        return jsonify({"status": "success", "upstream_status": info['status'], "response_text": processed_text}), 200, headers
 
     logging.error("No response text or session_id provided")  # Mencatat kesalahan jika teks respons atau session_id tidak tersedia
     return jsonify({"status": "error", "message": "No response text or session_id provided"}), 400  # Mengembalikan pesan kesalahan jika input tidak lengkap
 
+@app.route('/get_response_stream', methods=['POST'])
+def get_response_stream():
+    """
+    Versi streaming /get_response: jawaban dikirim sebagai server-sent events agar frontend chat
+    dapat menampilkan atau menyunting pesan parsial selama jawaban dibuat.
+
+    Returns:
+        Response: text/event-stream berisi event "chunk" ({"chunk": ...}) lalu event "done"
+        ({"processed_text": ...}), atau JSON kesalahan jika input tidak lengkap.
+    """
+    data = request.get_json()
+    response_text = data.get('response_text')
+    session_id = data.get('id')
+
+    if response_text and session_id:
+        trace_id = request_trace_id()
+        return Response(stream_with_context(stream_from_main(response_text, session_id, trace_id)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Request-ID': trace_id})
+
+    logging.error("No response text or session_id provided")
+    return jsonify({"status": "error", "message": "No response text or session_id provided"}), 400
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrik gateway (dan server utama jika IN_PROCESS) dalam format teks Prometheus."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     app.run(port=5001)  # Menjalankan server Flask pada port 5001, sesuaikan jika diperlukan
@@ -1,21 +1,37 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import google.generativeai as genai
 from API_GEMINI import GOOGLE_API_KEY
 import vertexai
-from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
+from embedding_cache import CachedEmbeddings
+from answer_cache import AnswerCache
+from session_store import create_session_store, estimate_tokens
+from data_lookup import DataLookup
+from hybrid_retriever import HybridRetriever, HYBRID_RETRIEVAL
+from context_builder import ContextBuilder
+from index_manager import IndexManager, INDEX_PATH
+from admission import AdmissionController, AdmissionRejected
+import metrics
+from google.api_core import exceptions as google_exceptions
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain.memory import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 import re
+import json
+import time
+import os
+import asyncio
+import contextvars
+import logging
+import numpy as np
 import uuid  # Import UUID for generating unique session IDs
 
 app = Flask(__name__)
 
+logging.basicConfig(level=logging.INFO)
+
 # Configure the Generative AI
 genai.configure(api_key=GOOGLE_API_KEY)
 
@@ -31,21 +47,63 @@ generation_config = {
     "response_mime_type": "text/plain",
 }
 
-# Load FAISS index
-embedding_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
-vector_store = FAISS.load_local("faiss_index", embedding_model, allow_dangerous_deserialization=True)
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-exp-0827", temperature = 0.1, max_tokens = None, google_api_key=GOOGLE_API_KEY)
-
-# Store session data
-store = {}
-
-def remove_emojis(text):
-    """Remove emojis from text."""
-    return re.sub(r'[^\x00-\x7F]+', '', text)
-
-def get_conversational_chain():
-    """Create and return a QA chain."""
-    prompt_template = """
+# Load the current FAISS index version; the watcher swaps in newly published versions
+# (with their BM25 + vector retriever, EDA_HYBRID_RETRIEVAL=0 for plain k-NN) without a restart
+# The Gemini clients are attached by create_clients() below
+embedding_model = CachedEmbeddings(None)
+index_manager = IndexManager(INDEX_PATH, embedding_model, build_retriever=HybridRetriever if HYBRID_RETRIEVAL else None)
+index_manager.start_watcher()
+model = None
+
+# The Gemini clients open gRPC channels, which do not survive a fork. gunicorn.conf.py sets
+# EDA_DEFER_CLIENTS=1 so the preloaded master skips them and every worker creates its own in post_fork
+DEFER_CLIENTS = os.environ.get("EDA_DEFER_CLIENTS", "0") == "1"
+
+# Number of documents placed in the context for every question; the filtered hybrid ranking needs fewer
+RETRIEVAL_K = 5 if HYBRID_RETRIEVAL else 10
+
+# Number of candidates retrieved before deduplication, MMR and the context token budget
+RETRIEVAL_FETCH_K = 4 * RETRIEVAL_K
+
+# Compacts retrieved rows into per-table blocks within EDA_CONTEXT_TOKEN_BUDGET
+context_builder = ContextBuilder(max_documents=RETRIEVAL_K)
+
+# Store session data; histories expire after an hour of inactivity and are windowed.
+# EDA_SESSION_BACKEND=sqlite or redis shares them between worker processes (see gunicorn.conf.py)
+store = create_session_store()
+
+# Cache of final answers, invalidated whenever a new index version is swapped in
+answer_cache = AnswerCache(version_fn=lambda: index_manager.version)
+
+# Admission control in front of the chain: per-user rate limit, Gemini concurrency cap and quota,
+# and a bounded wait queue; lookup and cached answers never pass through it
+admission = AdmissionController()
+
+# Structured table for direct region/year lookups (built with `python data_lookup.py build`)
+data_lookup = DataLookup.load()
+
+# Prometheus metrics served on /metrics
+STAGE_SECONDS = metrics.Histogram("eda_model_stage_seconds", "Time spent in each stage of a request", ("stage",))
+REQUESTS = metrics.Counter("eda_model_requests_total", "Answered requests by answer source", ("source",))
+ERRORS = metrics.Counter("eda_model_errors_total", "Failed requests by error class", ("error_class",))
+PROMPT_TOKENS = metrics.Histogram("eda_model_prompt_tokens", "Estimated prompt tokens per LLM call", buckets=metrics.TOKEN_BUCKETS)
+CACHE_EVENTS = metrics.Counter("eda_model_cache_events_total", "Answer cache and lookup table hits and misses", ("cache", "result"))
+metrics.Gauge("eda_model_embedding_cache", "Embedding cache hits, misses and entries",
+              lambda: {(key,): value for key, value in embedding_model.stats().items() if key != "max_entries"}, ("kind",))
+metrics.Gauge("eda_model_live_sessions", "Sessions with a live chat history", lambda: store.stats()["live_sessions"])
+metrics.Gauge("eda_model_index_vectors", "Vectors in the current index version", lambda: index_manager.stats()["vectors"])
+metrics.Gauge("eda_model_index_swaps", "Index versions swapped in since startup", lambda: index_manager.stats()["swaps"])
+metrics.Gauge("eda_model_admission_active", "Gemini calls currently admitted", lambda: admission.stats()["active"])
+metrics.Gauge("eda_model_admission_queue_depth", "Requests waiting for a Gemini slot", lambda: admission.stats()["waiting"])
+metrics.Gauge("eda_model_admission_rejected", "Requests shed before calling Gemini, by reason",
+              lambda: {(reason,): count for reason, count in admission.stats()["rejected"].items()}, ("reason",))
+
+# Friendly replies for errors the user can simply retry later
+BUSY_MESSAGE = "Maaf, EDA sedang menerima banyak permintaan. Silakan kirim ulang pertanyaan Anda dalam beberapa saat."
+UNAVAILABLE_MESSAGE = "Maaf, layanan EDA sedang tidak tersedia. Silakan coba lagi dalam beberapa menit."
+USER_RATE_MESSAGE = "Anda mengirim terlalu banyak pesan dalam waktu singkat. Mohon tunggu sebentar sebelum mengirim pertanyaan berikutnya."
+
+PROMPT_TEMPLATE = """
     Anda adalah EDA (Electronic Data Assistance) pada aplikasi WhatsApp yang membantu pengguna berkonsultasi dengan pertanyaan statistik dan melayani permintaan data khususnya dari BPS Provinsi Sumatera Utara. Sebagai kaki tangan BPS Provinsi Sumatera Utara, Anda tidak boleh mendiskreditkan BPS Provinsi Sumatera Utara. Anda juga meyakinkan pengguna bahwa data yang Anda peroleh benar adanya.
     
     Informasi yang perlu Anda ketahui jika ada pengguna yang bertanya adalah Kepala BPS Provinsi Sumatera Utara adalah Asim Saputra, SST, M.Ec.Dev. Kantor BPS Provinsi Sumatera Utara berlokasi di Jalan Asrama No. 179, Dwikora, Medan Helvetia, Medan, Sumatera Utara 20123. Visi BPS pada tahun 2024 adalah menjadi penyedia data statistik berkualitas untuk Indonesia Maju. Misi BPS pada tahun 2024 meliputi: 1) Menyediakan statistik berkualitas yang berstandar
@@ -62,13 +120,20 @@ def get_conversational_chain():
     Jawaban yang relevan (berdasarkan dokumen):\n
     """
 
-    # retriever = vector_store.as_retriever(search_type="similarity_score_threshold", search_kwargs={"score_threshold": 0.1})
-    retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 10})
-    
+def remove_emojis(text):
+    """Remove emojis from text."""
+    return re.sub(r'[^\x00-\x7F]+', '', text)
+
+def get_conversational_chain():
+    """Create and return the QA chain wrapped with session history.
+
+    Retrieval is not part of the chain; get_response passes the documents it
+    already retrieved as the context.
+    """
 
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", prompt_template),
+            ("system", PROMPT_TEMPLATE),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}")
         ]
@@ -76,60 +141,334 @@ def get_conversational_chain():
 
     question_answer_chain = create_stuff_documents_chain(model, prompt)
 
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+    return RunnableWithMessageHistory(
+        question_answer_chain,
+        get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+    )
 
-    return rag_chain
+def classify_error(e):
+    """Map an exception to (error class, HTTP status, reply text).
+
+    Gemini quota and availability errors get their own status so callers can back off
+    instead of treating them like a bug. Requests shed by admission control are reported
+    as 429 too, which the gateway does not retry.
+    """
+    if isinstance(e, AdmissionRejected):
+        return e.reason, 429, USER_RATE_MESSAGE if e.reason == "user_rate_limited" else BUSY_MESSAGE
+    if isinstance(e, google_exceptions.ResourceExhausted):
+        return "rate_limited", 429, BUSY_MESSAGE
+    if isinstance(e, (google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded)):
+        return "unavailable", 503, UNAVAILABLE_MESSAGE
+    if isinstance(e, TimeoutError):
+        return "timeout", 504, UNAVAILABLE_MESSAGE
+    return "internal", 500, f"Error: {str(e)}"
+
+def record_request(name, timings, info):
+    """Log the stage timings of one request and add them to the metrics."""
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    if info.get("error_class"):
+        ERRORS.inc(error_class=info["error_class"])
+    else:
+        REQUESTS.inc(source=info["source"])
+    logging.info("%s [%s] %s timings (s): %s", name, info.get("trace_id") or "-", info.get("source") or info.get("error_class"),
+                 {stage: round(t, 3) for stage, t in timings.items()})
+
+def answer_source(timings, lookup_text):
+    """Where an answer came from: the lookup table, the answer cache or the LLM."""
+    if lookup_text is not None:
+        return "lookup"
+    return "llm" if "generation" in timings else "cache"
+
+# (session_id, history) fetched off the event loop by arag_response; the history wrapper
+# calls get_session_history synchronously while the chain is being set up
+prefetched_history = contextvars.ContextVar("prefetched_history", default=None)
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    """Retrieve the session history for a given session_id. Create a new one if it does not exist."""
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+    """Retrieve the session history for a given session_id. Create a new one if it does not exist or has expired."""
+    prefetched = prefetched_history.get()
+    if prefetched is not None and prefetched[0] == session_id:
+        return prefetched[1]
+    return store.get(session_id)
 
-def get_response(user_question, session_id):
-    """Get response from the model using RAG."""
-    try:
-        # Perform similarity search using FAISS
-        docs = vector_store.similarity_search(user_question)
+def retrieve_documents(user_question, query_embedding, bundle, k=RETRIEVAL_FETCH_K):
+    """Return the docstore IDs and documents for a question from one index version.
 
-        # Use the QA chain to get a detailed answer
-        rag_chain = get_conversational_chain()
+    Uses the hybrid retriever when it is enabled, otherwise a single k-NN search.
+    """
+    if bundle.retriever is not None:
+        return bundle.retriever.search(user_question, query_embedding, k)
+
+    vector_store = bundle.vector_store
+    _, indices = vector_store.index.search(np.array([query_embedding], dtype=np.float32), k)
+
+    doc_ids, docs = [], []
+    for i in indices[0]:
+        if i == -1:
+            continue
+        doc_id = vector_store.index_to_docstore_id[i]
+        doc_ids.append(doc_id)
+        docs.append(vector_store.docstore.search(doc_id))
+    return doc_ids, docs
+
+def build_context(user_question, session_id, doc_ids, docs):
+    """Select and compact the retrieved documents within the token budget.
+
+    Returns the IDs of the documents actually used and the context documents, and logs
+    the estimated prompt size (system prompt, history, question and context).
+    """
+    used_ids, context, context_tokens = context_builder.build(doc_ids, docs)
+    history = get_session_history(session_id)
+    prompt_tokens = (estimate_tokens(PROMPT_TEMPLATE) + context_tokens + 2 * estimate_tokens(user_question)
+                     + sum(estimate_tokens(str(message.content)) for message in history.messages))
+    average = context_builder.record(context_tokens, prompt_tokens)
+    PROMPT_TOKENS.observe(prompt_tokens)
+    logging.info("Context: %d of %d documents, ~%d context tokens, ~%d prompt tokens (average %.0f)",
+                 len(used_ids), len(doc_ids), context_tokens, prompt_tokens, average)
+    return used_ids, context
+
+def lookup_cached_answer(user_question, session_id, doc_ids):
+    """Return (cache_key, cached answer or None); a hit is also appended to the session history."""
+    history = get_session_history(session_id)
+    cache_key = answer_cache.make_key(user_question, doc_ids, first_turn=not history.messages)
+    cached_text = answer_cache.get(cache_key)
+    CACHE_EVENTS.inc(cache="answer", result="miss" if cached_text is None else "hit")
+    if cached_text is not None:
+        history.add_user_message(user_question)
+        history.add_ai_message(cached_text)
+    return cache_key, cached_text
+
+def answer_from_lookup(user_question, session_id, timings):
+    """Answer direct region/year data requests from the structured table without the LLM.
+
+    Returns None when the lookup table is not built or the question is not an exact lookup.
+    """
+    if data_lookup is None:
+        return None
+
+    start = time.perf_counter()
+    response_text = data_lookup.answer(user_question)
+    timings["lookup"] = time.perf_counter() - start
+    CACHE_EVENTS.inc(cache="lookup", result="miss" if response_text is None else "hit")
+
+    if response_text is not None:
+        history = get_session_history(session_id)
+        history.add_user_message(user_question)
+        history.add_ai_message(response_text)
+    return response_text
 
-        conversational_rag_chain = RunnableWithMessageHistory(
-            rag_chain,
-            get_session_history,
-            input_messages_key="input",
-            history_messages_key="chat_history",
-            output_messages_key="answer",
-        )
+def prepare_rag(user_question, session_id, timings, bundle):
+    """Embed the question once, retrieve and compact the context, then check the answer cache.
 
+    Returns (cache_key, context documents, cached answer or None).
+    """
+    # Embed the question once; the same vector is used for the only FAISS search
+    start = time.perf_counter()
+    query_embedding = embedding_model.embed_query(user_question)
+    timings["embedding"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_ids, docs = retrieve_documents(user_question, query_embedding, bundle)
+    doc_ids, docs = build_context(user_question, session_id, doc_ids, docs)
+    timings["retrieval"] = time.perf_counter() - start
+
+    # Serve repeated questions over the same documents from the answer cache
+    cache_key, cached_text = lookup_cached_answer(user_question, session_id, doc_ids)
+    return cache_key, docs, cached_text
+
+def rag_response(user_question, session_id, timings, bundle):
+    """Answer with RAG: one query embedding, one retrieval, then the answer cache or the chain."""
+    cache_key, docs, response_text = prepare_rag(user_question, session_id, timings, bundle)
+    if response_text is None:
         # Set configuration with the given session_id
         config = {"configurable": {"session_id": session_id}}
 
-        # Invoke the chain and get the response
-        response = conversational_rag_chain.invoke(
-            {"input": user_question},
-            config=config
-        )
+        # Invoke the prebuilt chain with the retrieved documents as context once admitted
+        start = time.perf_counter()
+        with admission.admit(session_id):
+            timings["admission"] = time.perf_counter() - start
+            start = time.perf_counter()
+            response_text = conversational_rag_chain.invoke(
+                {"input": user_question, "context": docs},
+                config=config
+            )
+        timings["generation"] = time.perf_counter() - start
 
-        # Extract the answer text
-        response_text = response.get("answer", "")
+        # Remove emojis from the response
+        start = time.perf_counter()
+        response_text = remove_emojis(response_text)
+        answer_cache.put(cache_key, response_text)
+        timings["postprocess"] = time.perf_counter() - start
+    return response_text
 
-        # Check for specific response codes
-        response_code = response.get("response_code", 200)
-        if response_code == 429:
-            return "Maaf, layanan saat ini sedang sibuk. Silakan coba lagi nanti."
-        elif response_code == 503:
-            return "Layanan saat ini tidak tersedia. Silakan coba lagi nanti."
+async def arag_response(user_question, session_id, timings, bundle):
+    """Async variant of rag_response."""
+    start = time.perf_counter()
+    query_embedding = await embedding_model.aembed_query(user_question)
+    timings["embedding"] = time.perf_counter() - start
 
-        # Remove emojis from the response
+    start = time.perf_counter()
+    doc_ids, docs = await asyncio.to_thread(retrieve_documents, user_question, query_embedding, bundle)
+    # Session history and the answer cache may live in SQLite or Redis, so they are read off the event loop too
+    doc_ids, docs = await asyncio.to_thread(build_context, user_question, session_id, doc_ids, docs)
+    timings["retrieval"] = time.perf_counter() - start
+
+    cache_key, response_text = await asyncio.to_thread(lookup_cached_answer, user_question, session_id, doc_ids)
+    if response_text is None:
+        config = {"configurable": {"session_id": session_id}}
+        history = await asyncio.to_thread(store.get, session_id)
+        token = prefetched_history.set((session_id, history))
+
+        start = time.perf_counter()
+        try:
+            async with admission.aadmit(session_id):
+                timings["admission"] = time.perf_counter() - start
+                start = time.perf_counter()
+                response_text = await conversational_rag_chain.ainvoke(
+                    {"input": user_question, "context": docs},
+                    config=config
+                )
+        finally:
+            prefetched_history.reset(token)
+        timings["generation"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         response_text = remove_emojis(response_text)
+        answer_cache.put(cache_key, response_text)
+        timings["postprocess"] = time.perf_counter() - start
+    return response_text
+
+def get_response(user_question, session_id, bundle=None, info=None):
+    """Get response from the structured lookup, falling back to the model using RAG.
+
+    bundle is the index version to answer from; by default the current one. When given,
+    info is filled with the HTTP status, the answer source or error class, and is read
+    for the trace_id used in the logs.
+    """
+    bundle = bundle or index_manager.current
+    info = {} if info is None else info
+    info.update(status=200, error_class=None)
+    timings = {}
+    start = time.perf_counter()
+    try:
+        lookup_text = answer_from_lookup(user_question, session_id, timings)
+        response_text = lookup_text
+        if response_text is None:
+            response_text = rag_response(user_question, session_id, timings, bundle)
+        info["source"] = answer_source(timings, lookup_text)
+
+    except Exception as e:
+        info["error_class"], info["status"], response_text = classify_error(e)
+
+    timings["total"] = time.perf_counter() - start
+    record_request("get_response", timings, info)
+    return response_text
+
+async def aget_response(user_question, session_id, bundle=None, info=None):
+    """Async variant of get_response used by the ASGI server in main_model_async.py."""
+    bundle = bundle or index_manager.current
+    info = {} if info is None else info
+    info.update(status=200, error_class=None)
+    timings = {}
+    start = time.perf_counter()
+    try:
+        lookup_text = await asyncio.to_thread(answer_from_lookup, user_question, session_id, timings)
+        response_text = lookup_text
+        if response_text is None:
+            response_text = await arag_response(user_question, session_id, timings, bundle)
+        info["source"] = answer_source(timings, lookup_text)
 
     except Exception as e:
-        response_text = f"Error: {str(e)}"
+        info["error_class"], info["status"], response_text = classify_error(e)
 
+    timings["total"] = time.perf_counter() - start
+    record_request("aget_response", timings, info)
     return response_text
 
+def stream_response(user_question, session_id, bundle=None, info=None):
+    """Yield the answer in chunks as the model produces them, with emojis removed per chunk.
+
+    Lookup and cached answers are yielded as a single chunk. Time to the first chunk is
+    logged separately from the total time. info is filled as in get_response once the
+    stream has finished.
+    """
+    bundle = bundle or index_manager.current
+    info = {} if info is None else info
+    info.update(status=200, error_class=None)
+    timings = {}
+    request_start = time.perf_counter()
+    try:
+        lookup_text = answer_from_lookup(user_question, session_id, timings)
+        response_text = lookup_text
+        if response_text is None:
+            cache_key, docs, response_text = prepare_rag(user_question, session_id, timings, bundle)
+
+        if response_text is not None:
+            timings["first_chunk"] = time.perf_counter() - request_start
+            yield response_text
+        else:
+            config = {"configurable": {"session_id": session_id}}
+            chunks = []
+            start = time.perf_counter()
+            with admission.admit(session_id):
+                timings["admission"] = time.perf_counter() - start
+                start = time.perf_counter()
+                # The history wrapper saves the exchange once the stream has finished
+                for chunk in conversational_rag_chain.stream({"input": user_question, "context": docs}, config=config):
+                    chunk_start = time.perf_counter()
+                    chunk = remove_emojis(chunk)
+                    timings["postprocess"] = timings.get("postprocess", 0.0) + time.perf_counter() - chunk_start
+                    if not chunk:
+                        continue
+                    if not chunks:
+                        timings["first_chunk"] = time.perf_counter() - request_start
+                    chunks.append(chunk)
+                    yield chunk
+            timings["generation"] = time.perf_counter() - start
+            answer_cache.put(cache_key, "".join(chunks))
+        info["source"] = answer_source(timings, lookup_text)
+
+    except Exception as e:
+        info["error_class"], info["status"], response_text = classify_error(e)
+        yield response_text
+
+    timings["total"] = time.perf_counter() - request_start
+    record_request("stream_response", timings, info)
+
+def format_sse(data, event=None):
+    """Format one server-sent event; the payload is JSON so newlines in chunks are safe."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response_events(user_question, session_id, trace_id=None):
+    """Yield server-sent events: one "chunk" event per answer chunk, then a "done" event
+    carrying the full answer, the index version it was answered from and, on failure,
+    the error class and HTTP status it would have had."""
+    bundle = index_manager.current
+    info = {"trace_id": trace_id}
+    chunks = []
+    for chunk in stream_response(user_question, session_id, bundle, info):
+        chunks.append(chunk)
+        yield format_sse({"chunk": chunk}, event="chunk")
+    done = {"status": "success", "processed_text": "".join(chunks), "notelp": session_id, "index_version": bundle.version}
+    if info["error_class"]:
+        done.update(status="error", error=info["error_class"], code=info["status"])
+    yield format_sse(done, event="done")
+
+# Build the chain and history wrapper once at startup
+def create_clients():
+    """Create the Gemini embedding and chat clients and the chain that uses them."""
+    global model, conversational_rag_chain
+    embedding_model.embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
+    model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-exp-0827", temperature = 0.1, max_tokens = None, google_api_key=GOOGLE_API_KEY)
+    conversational_rag_chain = get_conversational_chain()
+
+conversational_rag_chain = None
+if not DEFER_CLIENTS:
+    create_clients()
+
 @app.route('/process_text', methods=['POST'])
 def process_text():
     data = request.get_json()
@@ -141,15 +480,63 @@ def process_text():
         if not notelp:
             notelp = str(uuid.uuid4())
 
-        # Process the input text and get the response
-        processed_text = get_response(response_text, notelp)
+        # Process the input text and get the response from one index version
+        bundle = index_manager.current
+        info = {"trace_id": request.headers.get('X-Request-ID')}
+        processed_text = get_response(response_text, notelp, bundle, info)
+
+        # Quota and availability errors keep their status; the reply text is still returned for the user
+        if info["error_class"]:
+            return jsonify({"status": "error", "error": info["error_class"], "processed_text": processed_text,
+                            "notelp": notelp}), info["status"]
 
         # Ensure processed_text is not empty
         if processed_text:
-            return jsonify({"status": "success", "processed_text": processed_text, "notelp": notelp}), 200
+            return jsonify({"status": "success", "processed_text": processed_text, "notelp": notelp,
+                            "index_version": bundle.version}), 200
         else:
             return jsonify({"status": "error", "message": "Failed to process text"}), 500
     return jsonify({"status": "error", "message": "No response text provided"}), 400
 
+@app.route('/process_text_stream', methods=['POST'])
+def process_text_stream():
+    """Streaming variant of /process_text as server-sent events (text/event-stream)."""
+    data = request.get_json()
+    response_text = data.get('response_text')
+    notelp = data.get('notelp') or str(uuid.uuid4())
+
+    if not response_text:
+        return jsonify({"status": "error", "message": "No response text provided"}), 400
+    return Response(stream_with_context(sse_response_events(response_text, notelp, request.headers.get('X-Request-ID'))),
+                    mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def collect_stats():
+    """Collect index, cache, session and retrieval counters for the /stats endpoint."""
+    return {
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embedding_model.stats(),
+        "sessions": store.stats(),
+        "data_lookup": data_lookup.stats() if data_lookup is not None else None,
+        "index": index_manager.stats(),
+        "retriever": index_manager.current.retriever.stats() if index_manager.current.retriever is not None else None,
+        "context": context_builder.stats(),
+        "admission": admission.stats(),
+    }
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(collect_stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.after_request
+def echo_request_id(response):
+    """Echo the gateway's trace ID so both sides of a slow request can be matched in the logs."""
+    if request.headers.get('X-Request-ID'):
+        response.headers['X-Request-ID'] = request.headers['X-Request-ID']
+    return response
+
 if __name__ == '__main__':
     app.run(port=5002)  # Change port if needed
@@ -0,0 +1,85 @@
+import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from quart import Quart, Response, request, jsonify
+import metrics
+import main_model  # Memuat indeks FAISS, model, dan chain sekali saat startup
+
+# Server ASGI untuk /process_text. Jalankan dengan:
+#   hypercorn main_model_async:app --bind 0.0.0.0:5002
+app = Quart(__name__)
+
+# Batas jumlah permintaan yang diproses bersamaan (embedding + Gemini)
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("EDA_MAX_CONCURRENT_REQUESTS", "32"))
+
+request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Kunci per notelp agar pesan dalam satu sesi diproses berurutan dan riwayatnya tetap rapi
+session_locks = {}  # notelp -> [asyncio.Lock, jumlah permintaan yang memakai kunci]
+
+
+@asynccontextmanager
+async def session_lock(notelp):
+    """Menserialkan permintaan dengan notelp yang sama; kunci dihapus jika tidak dipakai lagi."""
+    entry = session_locks.setdefault(notelp, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del session_locks[notelp]
+
+
+@app.route('/process_text', methods=['POST'])
+async def process_text():
+    data = await request.get_json()
+    response_text = data.get('response_text')
+    notelp = data.get('notelp')
+
+    if response_text:
+        if not notelp:
+            notelp = str(uuid.uuid4())
+
+        # Urutan per sesi dijaga lebih dulu agar pesan yang menunggu giliran tidak memakai slot konkurensi
+        async with session_lock(notelp):
+            async with request_semaphore:
+                bundle = main_model.index_manager.current
+                info = {"trace_id": request.headers.get('X-Request-ID')}
+                processed_text = await main_model.aget_response(response_text, notelp, bundle, info)
+
+        # Kuota/ketersediaan Gemini: status dipertahankan, pesan untuk pengguna tetap dikirim
+        if info["error_class"]:
+            return jsonify({"status": "error", "error": info["error_class"], "processed_text": processed_text,
+                            "notelp": notelp}), info["status"]
+
+        if processed_text:
+            return jsonify({"status": "success", "processed_text": processed_text, "notelp": notelp,
+                            "index_version": bundle.version}), 200
+        else:
+            return jsonify({"status": "error", "message": "Failed to process text"}), 500
+    return jsonify({"status": "error", "message": "No response text provided"}), 400
+
+
+@app.route('/stats', methods=['GET'])
+async def stats():
+    return jsonify(main_model.collect_stats()), 200
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.after_request
+async def echo_request_id(response):
+    """Mengembalikan X-Request-ID dari gateway agar log kedua sisi dapat dicocokkan."""
+    if request.headers.get('X-Request-ID'):
+        response.headers['X-Request-ID'] = request.headers['X-Request-ID']
+    return response
+
+
+if __name__ == '__main__':
+    app.run(port=5002)
@@ -0,0 +1,58 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """Token bucket yang aman dipakai banyak thread.
+
+    Token terisi ulang sebanyak `rate` per detik hingga maksimal `capacity`. Setiap
+    permintaan mengambil satu token; jika token habis, pemanggil menunggu.
+
+    Args:
+        rate (float): Jumlah token yang terisi per detik.
+        capacity (float): Jumlah token maksimal (burst). Default sama dengan rate (minimal 1).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Mengambil token tanpa menunggu. Mengembalikan True jika berhasil."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """Menunggu sampai token tersedia.
+
+        Args:
+            tokens (float): Jumlah token yang diambil.
+            timeout (float): Batas waktu menunggu dalam detik; None berarti menunggu terus.
+
+        Returns:
+            bool: True jika token didapat, False jika batas waktu habis.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
@@ -1,10 +1,17 @@
 import requests
 import os
 import json
+import time
+import hashlib
+from datetime import datetime, timezone
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from rate_limit import TokenBucket
 
 # Folder tempat menyimpan file JSON
 output_folder = 'JSON'
-os.makedirs(output_folder, exist_ok=True)
 
 # Domain dan Key sebagai variabel
 domain = '<<isi sesuai domain kantor BPS masing-masing>>'
@@ -13,43 +20,248 @@ key = '<<isi sesuai key yang digenerate dari Web API BPS>>'
 # Base URL tanpa varID
 base_url = f'https://webapi.bps.go.id/v1/api/list/model/data/domain/{domain}/var/{{}}/key/{key}/'
 
+# Pengaturan scraper: jumlah worker, batas permintaan per detik ke Web API BPS, dan retry
+max_workers = 8
+requests_per_second = 5
+max_retries = 5
+retry_backoff = 1.0  # detik, dikalikan 2 setiap percobaan ulang
+
+# File checkpoint agar proses yang terhenti bisa dilanjutkan
+checkpoint_file = os.path.join(output_folder, 'checkpoint.json')
+
+# Manifest (varID -> hash isi, label, file, waktu pengambilan) dan daftar varID yang berubah
+manifest_file = os.path.join(output_folder, 'manifest.json')
+changed_file = os.path.join(output_folder, 'changed.json')
+
 # Fungsi untuk membersihkan nama file dari karakter yang tidak valid
 def sanitize_filename(filename):
     # Gantikan karakter tidak valid dengan underscore atau karakter lain yang valid
     return filename.replace('/', '-').replace('\\', '-').replace(':', '-')
 
-# Loop untuk varID dari 1 hingga 50 (dapat diubah sesuai kebutuhan)
-for var_id in range(1, 700): # isi sesuai banyaknya varID (ID tabel) dari Web API BPS, contohnya sampai varID 700 
-    # Buat URL dengan varID saat ini
-    url = base_url.format(var_id)
-    
-    # Ambil respons dari API
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        
-        # Cek jika data tersedia
-        if data.get('data-availability') == 'available' and 'var' in data:
-            # Ambil nama file dari label varID
-            label = data['var'][0]['label']
-            
-            # Membersihkan nama file
-            sanitized_label = sanitize_filename(label)
-            filename = f"{sanitized_label}.json"
-            
-            # Path lengkap untuk menyimpan file
-            file_path = os.path.join(output_folder, filename)
-            
+def create_session(workers):
+    """Membuat requests.Session dengan connection pool seukuran jumlah worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_var(session, url, bucket, retries=max_retries, backoff=retry_backoff):
+    """Mengambil satu varID dengan rate limit dan retry untuk status 429/5xx atau gangguan koneksi.
+
+    Returns:
+        requests.Response: Respons terakhir, atau None jika semua percobaan gagal karena koneksi.
+    """
+    response = None
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            response = session.get(url, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            response = None
+        else:
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+
+        if attempt < retries:
+            # Hormati header Retry-After jika dikirim server, selain itu backoff eksponensial
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+            time.sleep(delay)
+    return response
+
+def content_hash(data):
+    """Hash SHA-256 dari isi JSON yang dinormalkan (urutan key tidak berpengaruh)."""
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def write_json_atomic(data, file_path, compact=False):
+    """Menyimpan data sebagai file JSON secara atomik (tulis ke file sementara lalu ganti).
+
+    Args:
+        data (dict): Data JSON.
+        file_path (str): Lokasi file tujuan.
+        compact (bool): Simpan tanpa indentasi agar file lebih kecil.
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, file_path)
+
+def process_var(session, var_id, url_template, folder, bucket, previous=None, incremental=False, compact=False):
+    """Mengambil dan menyimpan satu varID.
+
+    Args:
+        previous (dict): Entri manifest varID ini dari run sebelumnya, jika ada.
+        incremental (bool): Hanya tulis file jika isinya berubah dibanding manifest.
+        compact (bool): Simpan JSON tanpa indentasi.
+
+    Returns:
+        dict: Hasil dengan key 'ok' (False jika perlu dicoba lagi pada run berikutnya),
+        'entry' (entri manifest baru atau None jika data tidak tersedia), dan 'changed'.
+    """
+    result = {'ok': False, 'entry': None, 'changed': False}
+    response = fetch_var(session, url_template.format(var_id), bucket)
+
+    if response is None:
+        print(f"Gagal mengambil data untuk varID {var_id}: koneksi gagal")
+        return result
+    if response.status_code != 200:
+        print(f"Gagal mengambil data untuk varID {var_id}, status code: {response.status_code}")
+        return result
+
+    data = response.json()
+
+    # Cek jika data tersedia
+    if data.get('data-availability') == 'available' and 'var' in data:
+        # Ambil nama file dari label varID lalu bersihkan
+        label = data['var'][0]['label']
+        filename = f"{sanitize_filename(label)}.json"
+        file_path = os.path.join(folder, filename)
+        entry = {
+            'hash': content_hash(data),
+            'label': label,
+            'file': filename,
+            'fetched_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        changed = (previous is None or previous.get('hash') != entry['hash']
+                   or previous.get('file') != filename or not os.path.exists(file_path))
+
+        if changed or not incremental:
             try:
-                # Simpan data sebagai file JSON
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
-                
+                write_json_atomic(data, file_path, compact=compact)
                 print(f"Data untuk varID {var_id} disimpan di {file_path}")
             except FileNotFoundError as e:
                 print(f"Gagal menyimpan file untuk varID {var_id}: {e}")
+                return result
+            # Hapus file lama jika label tabel berganti
+            if previous and previous.get('file') not in (None, filename):
+                old_path = os.path.join(folder, previous['file'])
+                if os.path.exists(old_path):
+                    os.remove(old_path)
         else:
-            print(f"Data untuk varID {var_id} tidak tersedia, melewati...")
+            print(f"Data untuk varID {var_id} tidak berubah, melewati penulisan...")
+        result.update(entry=entry, changed=changed)
     else:
-        print(f"Gagal mengambil data untuk varID {var_id}, status code: {response.status_code}")
+        print(f"Data untuk varID {var_id} tidak tersedia, melewati...")
+    result['ok'] = True
+    return result
+
+def load_checkpoint(path):
+    """Membaca varID yang sudah selesai dan varID yang berubah dari file checkpoint.
+
+    Returns:
+        tuple: (set varID selesai, set varID berubah sejak run dimulai).
+    """
+    if not os.path.exists(path):
+        return set(), set()
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    return set(checkpoint.get('done', [])), set(checkpoint.get('changed', []))
+
+def save_checkpoint(path, done, changed=()):
+    """Menyimpan checkpoint secara atomik, termasuk varID yang sudah tercatat berubah."""
+    write_json_atomic({'done': sorted(done), 'changed': sorted(changed)}, path, compact=True)
+
+def load_manifest(path):
+    """Membaca manifest varID (key berupa string varID); kosong jika belum ada."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def scrape(var_ids, url_template=base_url, folder=output_folder, workers=max_workers,
+           rate=requests_per_second, checkpoint_path=checkpoint_file, resume=True,
+           incremental=False, compact=False, manifest_path=manifest_file, changed_path=changed_file):
+    """Mengambil banyak varID secara paralel dengan rate limit dan checkpoint.
+
+    Args:
+        var_ids (iterable): varID yang akan diambil.
+        url_template (str): URL dengan placeholder {} untuk varID (bisa diarahkan ke server stub lokal).
+        folder (str): Folder output file JSON.
+        workers (int): Jumlah worker thread.
+        rate (float): Batas permintaan per detik ke Web API.
+        checkpoint_path (str): Lokasi file checkpoint.
+        resume (bool): Lewati varID yang sudah tercatat selesai di checkpoint.
+        incremental (bool): Hanya tulis tabel yang isinya berubah menurut manifest.
+        compact (bool): Simpan JSON tanpa indentasi.
+        manifest_path (str): Lokasi manifest varID.
+        changed_path (str): Lokasi file daftar varID yang berubah, untuk dipakai tahap ingestion.
+
+    Returns:
+        dict: Ringkasan jumlah varID selesai, gagal, berubah, durasi, dan throughput (varID per detik).
+    """
+    os.makedirs(folder, exist_ok=True)
+    # varID yang berubah sebelum run terhenti ikut dipulihkan, agar tetap masuk changed.json
+    done, changed = load_checkpoint(checkpoint_path) if resume else (set(), set())
+    todo = [var_id for var_id in var_ids if var_id not in done]
+    if done:
+        print(f"Melanjutkan dari checkpoint: {len(done)} varID sudah selesai, {len(todo)} tersisa")
+
+    manifest = load_manifest(manifest_path)
+    session = create_session(workers)
+    bucket = TokenBucket(rate)
+    lock = threading.Lock()
+    failed = []
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_var, session, var_id, url_template, folder, bucket,
+                            manifest.get(str(var_id)), incremental, compact): var_id
+            for var_id in todo
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            var_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Gagal memproses varID {var_id}: {e}")
+                result = {'ok': False}
+
+            with lock:
+                if result['ok']:
+                    done.add(var_id)
+                    if result['entry'] is not None:
+                        manifest[str(var_id)] = result['entry']
+                    if result['changed']:
+                        changed.add(var_id)
+                else:
+                    failed.append(var_id)
+                # Checkpoint dan manifest disimpan berkala agar run yang terhenti tidak mulai dari awal
+                if completed % 20 == 0:
+                    save_checkpoint(checkpoint_path, done, changed)
+                    write_json_atomic(manifest, manifest_path)
+
+    write_json_atomic(manifest, manifest_path)
+    write_json_atomic({'changed': sorted(changed)}, changed_path)
+    if failed:
+        save_checkpoint(checkpoint_path, done, changed)
+    elif os.path.exists(checkpoint_path):
+        # Run lengkap tanpa kegagalan; checkpoint dihapus agar refresh berikutnya mengambil ulang semua varID
+        os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - start
+    throughput = len(todo) / elapsed if elapsed > 0 else 0.0
+    print(f"Selesai: {len(todo) - len(failed)} varID dalam {elapsed:.1f} detik ({throughput:.2f} varID/detik), "
+          f"berubah: {len(changed)}, gagal: {len(failed)}")
+    return {'done': len(todo) - len(failed), 'failed': sorted(failed), 'changed': sorted(changed),
+            'seconds': elapsed, 'vars_per_second': throughput}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scraper Web API BPS')
+    parser.add_argument('--start', type=int, default=1, help='varID awal')
+    parser.add_argument('--end', type=int, default=700, help='varID akhir (tidak termasuk), isi sesuai banyaknya varID (ID tabel) dari Web API BPS')
+    parser.add_argument('--workers', type=int, default=max_workers, help='jumlah worker thread')
+    parser.add_argument('--rate', type=float, default=requests_per_second, help='batas permintaan per detik')
+    parser.add_argument('--base-url', default=base_url, help='URL dengan {} sebagai varID, mis. server stub lokal')
+    parser.add_argument('--no-resume', action='store_true', help='abaikan checkpoint dan mulai dari awal')
+    parser.add_argument('--incremental', action='store_true', help='hanya tulis tabel yang isinya berubah (berdasarkan manifest)')
+    parser.add_argument('--compact', action='store_true', help='simpan JSON tanpa indentasi')
+    args = parser.parse_args()
+
+    scrape(range(args.start, args.end), url_template=args.base_url, workers=args.workers,
+           rate=args.rate, resume=not args.no_resume, incremental=args.incremental, compact=args.compact)
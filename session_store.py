@@ -0,0 +1,390 @@
+import os
+import asyncio
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import HumanMessage, messages_from_dict, messages_to_dict
+
+# Riwayat chat dihapus setelah satu jam tidak aktif, sesuai penafian di prompt sistem
+SESSION_TTL = float(os.environ.get("EDA_SESSION_TTL", "3600"))
+SESSION_MAX_SESSIONS = int(os.environ.get("EDA_SESSION_MAX_SESSIONS", "10000"))
+# Batas riwayat yang dimasukkan ke prompt: jumlah pesan dan perkiraan token
+HISTORY_MAX_MESSAGES = int(os.environ.get("EDA_HISTORY_MAX_MESSAGES", "10"))
+HISTORY_MAX_TOKENS = int(os.environ.get("EDA_HISTORY_MAX_TOKENS", "2000"))
+
+# Penyimpanan riwayat: "memory" (satu proses), "sqlite" atau "redis" (dibagi antar worker)
+SESSION_BACKEND = os.environ.get("EDA_SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("EDA_SESSION_DB_PATH", "sessions.sqlite")
+SESSION_REDIS_URL = os.environ.get("EDA_SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+
+def estimate_tokens(text):
+    """Perkiraan kasar jumlah token (sekitar 4 karakter per token)."""
+    return len(text) // 4 + 1
+
+
+def trim_messages(messages, max_messages=HISTORY_MAX_MESSAGES, max_tokens=HISTORY_MAX_TOKENS):
+    """Memotong riwayat dari depan sampai memenuhi batas jumlah pesan dan token.
+
+    Riwayat hasil potongan selalu diawali pesan pengguna agar pasangan tanya-jawab tetap utuh.
+    """
+    messages = list(messages)
+    total_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+    while messages and (len(messages) > max_messages or total_tokens > max_tokens):
+        total_tokens -= estimate_tokens(str(messages.pop(0).content))
+    while messages and not isinstance(messages[0], HumanMessage):
+        messages.pop(0)
+    return messages
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """Riwayat chat dalam memori yang hanya menyimpan jendela pesan terakhir.
+
+    Args:
+        max_messages (int): Jumlah pesan maksimal yang disimpan.
+        max_tokens (int): Perkiraan jumlah token maksimal seluruh pesan.
+    """
+
+    def __init__(self, max_messages=HISTORY_MAX_MESSAGES, max_tokens=HISTORY_MAX_TOKENS):
+        self.messages = []
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+
+    def add_messages(self, messages):
+        self.messages = trim_messages(self.messages + list(messages), self.max_messages, self.max_tokens)
+
+    def clear(self):
+        self.messages = []
+
+
+class SessionStore:
+    """Penyimpanan riwayat chat per sesi dengan kedaluwarsa (TTL) dan batas jumlah sesi (LRU).
+
+    Args:
+        ttl (float): Lama sesi tidak aktif (detik) sebelum riwayatnya dihapus.
+        max_sessions (int): Jumlah sesi maksimal di memori; sesi yang paling lama tidak
+            aktif digusur jika batas terlampaui.
+        max_messages (int): Jendela pesan per sesi.
+        max_tokens (int): Perkiraan batas token riwayat per sesi.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX_SESSIONS,
+                 max_messages=HISTORY_MAX_MESSAGES, max_tokens=HISTORY_MAX_TOKENS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()  # session_id -> (waktu akses terakhir, riwayat)
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now):
+        """Menghapus sesi kedaluwarsa; sesi terurut dari akses terlama sehingga cukup dicek dari depan."""
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def get(self, session_id):
+        """Mengambil riwayat untuk session_id, membuat riwayat baru jika belum ada atau sudah kedaluwarsa."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                history = WindowedChatMessageHistory(self.max_messages, self.max_tokens)
+                self.created += 1
+            else:
+                history = entry[1]
+            self._sessions[session_id] = (now, history)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            return history
+
+    def __contains__(self, session_id):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return session_id in self._sessions
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._sessions)
+
+    def stats(self):
+        """Mengembalikan jumlah sesi aktif, sesi yang dibuat, kedaluwarsa, dan digusur."""
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return {
+                "live_sessions": len(self._sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+class StoredChatMessageHistory(BaseChatMessageHistory):
+    """Riwayat satu sesi yang dibaca dan ditulis langsung ke penyimpanan bersama.
+
+    Setiap akses `messages` membaca isi terbaru sehingga worker lain yang menjawab pesan
+    berikutnya dari notelp yang sama melihat riwayat yang sama.
+    """
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self):
+        return self.store._load(self.session_id)
+
+    def add_messages(self, messages):
+        self.store._append(self.session_id, list(messages))
+
+    def clear(self):
+        self.store._clear(self.session_id)
+
+    # Versi async dipakai RunnableWithMessageHistory di server ASGI; I/O SQLite/Redis
+    # dijalankan di thread agar event loop tidak tertahan
+    async def aget_messages(self):
+        return await asyncio.to_thread(self.store._load, self.session_id)
+
+    async def aadd_messages(self, messages):
+        await asyncio.to_thread(self.store._append, self.session_id, list(messages))
+
+    async def aclear(self):
+        await asyncio.to_thread(self.store._clear, self.session_id)
+
+
+def _dump_messages(messages):
+    return json.dumps(messages_to_dict(messages), ensure_ascii=False)
+
+
+def _load_messages(data):
+    return messages_from_dict(json.loads(data)) if data else []
+
+
+class SqliteSessionStore:
+    """Riwayat chat di SQLite (mode WAL) yang dipakai bersama oleh beberapa proses worker.
+
+    Perilakunya sama dengan SessionStore: sesi kedaluwarsa setelah `ttl` detik tidak aktif,
+    sesi paling lama tidak aktif digusur jika jumlahnya melebihi `max_sessions`, dan riwayat
+    dipotong ke jendela pesan/token. Setiap thread dan proses memakai koneksinya sendiri,
+    sehingga store aman dibuat sebelum fork (gunicorn --preload).
+
+    Args:
+        path (str): Lokasi file database.
+        ttl (float): Lama sesi tidak aktif (detik) sebelum riwayatnya dihapus.
+        max_sessions (int): Jumlah sesi maksimal yang disimpan.
+        max_messages (int): Jendela pesan per sesi.
+        max_tokens (int): Perkiraan batas token riwayat per sesi.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, max_sessions=SESSION_MAX_SESSIONS,
+                 max_messages=HISTORY_MAX_MESSAGES, max_tokens=HISTORY_MAX_TOKENS):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        # Penghitung per proses; jumlah sesi aktif dihitung dari database
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def _db(self):
+        """Koneksi milik thread dan proses ini (koneksi SQLite tidak boleh melewati fork)."""
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _purge(self, db, now):
+        """Menghapus sesi kedaluwarsa lalu menggusur sesi terlama di atas max_sessions."""
+        expired = db.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl,)).rowcount
+        excess = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        evicted = 0
+        if excess > 0:
+            evicted = db.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_access LIMIT ?)", (excess,)
+            ).rowcount
+        self._count("expired", expired)
+        self._count("evicted", evicted)
+
+    def get(self, session_id):
+        """Mengambil riwayat untuk session_id, membuat riwayat baru jika belum ada atau sudah kedaluwarsa."""
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is not None and now - row[0] <= self.ttl:
+                db.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            else:
+                if row is not None:
+                    self._count("expired")
+                db.execute("INSERT OR REPLACE INTO sessions (session_id, messages, last_access) VALUES (?, '[]', ?)",
+                           (session_id, now))
+                self._count("created")
+                self._purge(db, now)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return StoredChatMessageHistory(self, session_id)
+
+    def _load(self, session_id):
+        row = self._db().execute("SELECT messages FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return _load_messages(row[0]) if row else []
+
+    def _append(self, session_id, messages):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT messages FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            history = trim_messages((_load_messages(row[0]) if row else []) + messages, self.max_messages, self.max_tokens)
+            db.execute("INSERT OR REPLACE INTO sessions (session_id, messages, last_access) VALUES (?, ?, ?)",
+                       (session_id, _dump_messages(history), time.time()))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _clear(self, session_id):
+        self._db().execute("UPDATE sessions SET messages = '[]' WHERE session_id = ?", (session_id,))
+
+    def __contains__(self, session_id):
+        row = self._db().execute("SELECT 1 FROM sessions WHERE session_id = ? AND last_access >= ?",
+                                 (session_id, time.time() - self.ttl)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM sessions WHERE last_access >= ?",
+                                  (time.time() - self.ttl,)).fetchone()[0]
+
+    def stats(self):
+        """Jumlah sesi aktif (semua worker) serta sesi yang dibuat, kedaluwarsa, dan digusur oleh proses ini."""
+        return {
+            "live_sessions": len(self),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+class RedisSessionStore:
+    """Riwayat chat di Redis (atau server yang kompatibel dengan protokol Redis).
+
+    Kedaluwarsa memakai TTL key Redis; batas jumlah sesi diserahkan ke kebijakan maxmemory
+    server. Pembaruan riwayat memakai WATCH/MULTI sehingga dua worker tidak saling menimpa.
+    Waktu akses terakhir tiap sesi juga dicatat di sorted set, sehingga jumlah sesi aktif
+    dihitung dengan ZCOUNT alih-alih SCAN atas seluruh keyspace.
+
+    Args:
+        url (str): URL server Redis.
+        client: Klien redis.Redis yang sudah ada (mis. pengganti lokal untuk pengujian);
+            jika None, klien dibuat dari url.
+        ttl (float): Lama sesi tidak aktif (detik) sebelum key-nya kedaluwarsa.
+        max_messages (int): Jendela pesan per sesi.
+        max_tokens (int): Perkiraan batas token riwayat per sesi.
+        prefix (str): Awalan key sesi.
+    """
+
+    def __init__(self, url=SESSION_REDIS_URL, client=None, ttl=SESSION_TTL,
+                 max_messages=HISTORY_MAX_MESSAGES, max_tokens=HISTORY_MAX_TOKENS, prefix="eda:session:"):
+        if client is None:
+            import redis  # dependensi opsional, hanya diperlukan untuk EDA_SESSION_BACKEND=redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = int(ttl)
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.prefix = prefix
+        self.live_key = prefix.rstrip(":") + "s:live"  # sorted set session_id -> waktu akses terakhir
+        self.created = 0
+        self._counter_lock = threading.Lock()
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    def _touch(self, session_id):
+        self.client.zadd(self.live_key, {session_id: time.time()})
+
+    def get(self, session_id):
+        """Mengambil riwayat untuk session_id; key baru dibuat jika belum ada atau sudah kedaluwarsa."""
+        key = self._key(session_id)
+        if self.client.set(key, "[]", ex=self.ttl, nx=True):
+            with self._counter_lock:
+                self.created += 1
+            # Sesi yang sudah kedaluwarsa dibuang dari sorted set agar ukurannya mengikuti sesi aktif
+            self.client.zremrangebyscore(self.live_key, "-inf", time.time() - self.ttl)
+        else:
+            self.client.expire(key, self.ttl)
+        self._touch(session_id)
+        return StoredChatMessageHistory(self, session_id)
+
+    def _load(self, session_id):
+        return _load_messages(self.client.get(self._key(session_id)))
+
+    def _append(self, session_id, messages):
+        key = self._key(session_id)
+
+        def update(pipe):
+            history = trim_messages(_load_messages(pipe.get(key)) + messages, self.max_messages, self.max_tokens)
+            pipe.multi()
+            pipe.set(key, _dump_messages(history), ex=self.ttl)
+
+        self.client.transaction(update, key)
+        self._touch(session_id)
+
+    def _clear(self, session_id):
+        self.client.set(self._key(session_id), "[]", ex=self.ttl)
+        self._touch(session_id)
+
+    def __contains__(self, session_id):
+        return bool(self.client.exists(self._key(session_id)))
+
+    def __len__(self):
+        """Jumlah sesi yang diakses dalam `ttl` detik terakhir (O(log N), aman untuk setiap scrape metrics)."""
+        return self.client.zcount(self.live_key, time.time() - self.ttl, "+inf")
+
+    def stats(self):
+        """Jumlah sesi aktif di server dan sesi yang dibuat oleh proses ini."""
+        return {"live_sessions": len(self), "created": self.created}
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Membuat penyimpanan sesi sesuai EDA_SESSION_BACKEND ("memory", "sqlite", atau "redis")."""
+    if backend == "memory":
+        return SessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"EDA_SESSION_BACKEND tidak dikenal: {backend}")
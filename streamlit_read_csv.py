@@ -1,89 +1,146 @@
 import os
+import time
 import pandas as pd
 import streamlit as st
-import io
 import numpy as np
+from itertools import chain
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from API_GEMINI import GOOGLE_API_KEY
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import google.generativeai as genai
 from langchain.vectorstores import FAISS
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.chains.question_answering import load_qa_chain
 from langchain_core.documents import Document
-from uuid import uuid4
 from langchain_community.docstore.in_memory import InMemoryDocstore
 import faiss
+from vector_index import (load_source_map, save_source_map, replace_source_documents, build_index, INDEX_TYPE,
+                          current_index_path, new_index_version, publish_index_version, index_type_of, can_train)
+from hybrid_retriever import save_lexical_index
+from ingest_pipeline import IngestPipeline, load_checkpoint, clear_checkpoint, find_resumable_version, upload_fingerprint
+from streamlit_resources import get_embeddings, get_vector_store
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
-def load_csv_files_with_metadata(csv_files):
-    """Load CSV files, add metadata, and return documents with metadata."""
-    all_documents = []
-    
+# Number of CSV rows read into memory at a time
+CSV_CHUNKSIZE = 50000
+
+def _column_or_default(df, column, default):
+    """Return a column as strings, using default where the column is missing or empty."""
+    if column not in df.columns:
+        return pd.Series(default, index=df.index)
+    values = df[column]
+    return values.astype(str).where(values.notna() & (values.astype(str) != ""), default)
+
+def build_csv_contents(df, file_name):
+    """Build the document text for every row of a CSV chunk with column-wise string operations."""
+    vervar = _column_or_default(df, 'vervar', "Wilayah tidak tersedia")
+    datacontent = _column_or_default(df, 'datacontent', "Data tidak tersedia")
+    tahun = _column_or_default(df, 'tahun', "Tahun tidak tersedia")
+
+    prefix = file_name + ", " + tahun + ", "
+    suffix = vervar + ", " + datacontent + "."
+    if 'turvar' not in df.columns:
+        return prefix + suffix
+
+    # Rows with a turvar use "{turvar} untuk {vervar}"
+    turvar = _column_or_default(df, 'turvar', "")
+    return prefix + turvar.where(turvar == "", turvar + " untuk ") + suffix
+
+def load_csv_files_with_metadata(csv_files, chunksize=CSV_CHUNKSIZE):
+    """Load CSV files in chunks and yield documents with metadata.
+
+    A file that fails to parse raises instead of being skipped: the rows it did yield would
+    otherwise make the rest of that source look stale and be removed from the index.
+    """
     for file in csv_files:
+        # Extract the file name without extension
+        file_name = os.path.basename(file.name).split('.')[0]
+
         try:
-            # Read the CSV data from the UploadedFile object
-            file_content = file.read()  # This returns the content of the file as bytes
-            
-            # Convert the file content to a pandas DataFrame
-            df = pd.read_csv(io.StringIO(file_content.decode('utf-8')))
-            
-            # Extract the file name without extension
-            file_name = os.path.basename(file.name).split('.')[0]
-            
-            # Iterate over each row in the dataframe and create Document objects with metadata
-            for index, row in df.iterrows():
-                metadata = {
-                    "source": file_name,
-                }
-
-                # Ensure 'turvar' is properly handled
-                turvar = row['turvar'] if 'turvar' in df.columns and pd.notna(row['turvar']) and row['turvar'] != "" else None
-
-                # Handle 'vervar', 'datacontent', and 'tahun'
-                vervar = row['vervar'] if 'vervar' in df.columns and pd.notna(row['vervar']) else "Wilayah tidak tersedia"
-                datacontent = row['datacontent'] if 'datacontent' in df.columns and pd.notna(row['datacontent']) else "Data tidak tersedia"
-                tahun = row['tahun'] if 'tahun' in df.columns and pd.notna(row['tahun']) else "Tahun tidak tersedia"
-
-                # Determine the content based on the presence of 'turvar'
-                if turvar:
-                    content = f"{file_name}, {tahun}, {turvar} untuk {vervar}, {datacontent}."
-                else:
-                    content = f"{file_name}, {tahun}, {vervar}, {datacontent}."
+            # Read straight from the upload buffer, one chunk of rows at a time
+            file.seek(0)
+            # Every column is read as text: with inferred dtypes a chunk containing an empty cell
+            # turns 2020 into "2020.0", which changes the document text and its ID. Empty cells
+            # stay "" (not NaN) and fall back to the defaults in build_csv_contents.
+            for chunk in pd.read_csv(file, chunksize=chunksize, encoding='utf-8', dtype=str, keep_default_na=False):
+                # Year, region and breakdown are kept as metadata for filtered retrieval
+                contents = build_csv_contents(chunk, file_name).tolist()
+                tahun = _column_or_default(chunk, 'tahun', "").tolist()
+                vervar = _column_or_default(chunk, 'vervar', "").tolist()
+                turvar = _column_or_default(chunk, 'turvar', "").tolist()
+                for content, year, region, breakdown in zip(contents, tahun, vervar, turvar):
+                    metadata = {"source": file_name, "tahun": year, "vervar": region, "turvar": breakdown}
+                    yield Document(page_content=content, metadata=metadata)
 
-                # Create a Document object with content and metadata
-                document = Document(page_content=content, metadata=metadata)
-                
-                # Add document to the list
-                all_documents.append(document)
-        
         except Exception as e:
-            st.error(f"Error loading {file.name}: {e}")
-    
-    return all_documents
+            # Abort the upload; nothing is published and the previous index version stays live
+            raise ValueError(f"Error loading {file.name}: {e}") from e
+
+def create_or_update_vector_store(documents, vector_store_path="faiss_index", batch_size=1000, progress=None, fingerprint=None):
+    """Create or update a vector store with the given documents (a list or any iterable).
 
-def create_or_update_vector_store(documents, vector_store_path="faiss_index", batch_size=1000):
-    """Create or update a vector store with the given documents in batches."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
+    Batches are embedded concurrently and written in order by IngestPipeline. The result is
+    written to a new index version under vector_store_path and published atomically once
+    complete, so a running model server never reads a half-written index. An interrupted
+    upload resumes from its last checkpoint when the same files are uploaded again, i.e. when
+    `fingerprint` (see upload_fingerprint) matches the one stored in that checkpoint.
+    """
+    embeddings = get_embeddings()
     
     try:
-        if os.path.exists(vector_store_path):
-            vector_store = FAISS.load_local(vector_store_path, embeddings, allow_dangerous_deserialization=True)
-            st.info("Existing vector store loaded.")
+        version_path = find_resumable_version(vector_store_path, fingerprint)
+        checkpoint = load_checkpoint(version_path) if version_path else None
+        base_path = version_path if checkpoint else current_index_path(vector_store_path)
+        if os.path.exists(os.path.join(base_path, "index.faiss")):
+            vector_store = FAISS.load_local(base_path, embeddings, allow_dangerous_deserialization=True)
+            # A resumed IVF upload may still be collecting its training sample in a flat index
+            pending_index_type = checkpoint.get("pending_index_type") if checkpoint else None
+            # An earlier upload too small to train the IVF index (e.g. PQ needs 256 vectors) left it flat
+            if (not checkpoint and INDEX_TYPE in ("ivf_flat", "ivf_pq") and index_type_of(vector_store.index) == "flat"
+                    and not can_train(INDEX_TYPE, vector_store.index.ntotal)):
+                pending_index_type = INDEX_TYPE
+            if checkpoint:
+                st.info(f"Resuming interrupted upload: {checkpoint['added']} documents already indexed.")
+            else:
+                st.info("Existing vector store loaded.")
         else:
-            index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
+            # IVF indexes need training: vectors are collected in a flat index first and
+            # converted once TRAIN_SAMPLE_SIZE vectors (or all of them, if enough to train) are available
+            dim = len(embeddings.embed_query("hello world"))
+            index = build_index(INDEX_TYPE, dim) if INDEX_TYPE in ("flat", "hnsw") else faiss.IndexFlatL2(dim)
             vector_store = FAISS(embedding_function=embeddings, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
-            st.info("New vector store created.")
-        
-        for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i + batch_size]
-            uuids = [str(uuid4()) for _ in range(len(batch_docs))]
-            vector_store.add_documents(documents=batch_docs, ids=uuids)
+            pending_index_type = INDEX_TYPE if INDEX_TYPE in ("ivf_flat", "ivf_pq") else None
+            st.info(f"New vector store created ({INDEX_TYPE}).")
         
-        vector_store.save_local(vector_store_path)
-        st.success("Vector store updated successfully.")
+        # The source map is copied into the new version first so a resumed upload still has it
+        source_map = load_source_map(base_path)
+        if version_path is None:
+            version_path = new_index_version(vector_store_path)
+            save_source_map(version_path, source_map)
+
+        if progress is None:
+            status = st.empty()
+            progress = lambda stats: status.text(
+                f"{stats['rows']:,} rows read, {stats['added']:,} embedded, {stats['rows_per_second']:,.0f} rows/s")
+
+        # Deterministic IDs: documents that are already indexed are skipped before embedding
+        pipeline = IngestPipeline(vector_store, embeddings, version_path, pending_index_type=pending_index_type,
+                                  batch_size=batch_size, progress=progress, fingerprint=fingerprint)
+        vector_store = pipeline.run(documents)
+
+        # Re-ingested sources replace their stale vectors
+        removed = replace_source_documents(vector_store, source_map, pipeline.seen_ids)
+
+        vector_store.save_local(version_path)
+        save_source_map(version_path, source_map)
+        # BM25 postings are built once here instead of in every model server worker
+        save_lexical_index(vector_store, version_path)
+        clear_checkpoint(version_path)
+        version = publish_index_version(vector_store_path, version_path)
+        stats = pipeline.stats()
+        st.success(f"Vector store updated successfully (version {version}): {stats['added']} added, "
+                   f"{stats['skipped']} already indexed, {removed} stale removed ({stats['rows_per_second']:,.0f} rows/s).")
         
     except Exception as e:
         st.error(f"Error creating or updating vector store: {e}")
@@ -91,8 +148,9 @@ def create_or_update_vector_store(documents, vector_store_path="faiss_index", ba
     
     return vector_store
 
+@st.cache_resource
 def get_conversational_chain():
-    """Create and return a QA chain."""
+    """Create and return a QA chain, built once per process and shared across sessions."""
     prompt_template = """
     Anda adalah EDA (Electronic Data Assistance) pada aplikasi WhatsApp yang membantu pengguna berkonsultasi dengan pertanyaan statistik dan permintaan data khususnya dari BPS Provinsi Sumatera Utara. Sebagai kaki tangan BPS Provinsi Sumatera Utara, Anda tidak boleh mendiskreditkan BPS Provinsi Sumatera Utara. Kepala BPS Provinsi Sumatera Utara adalah Asim Saputra, SST, M.Ec.Dev. Kantor BPS Provinsi Sumatera Utara berlokasi di Jalan Asrama No. 179, Dwikora, Medan Helvetia, Medan, Sumatera Utara 20123.
 
@@ -120,17 +178,22 @@ def get_conversational_chain():
     return chain
 
 def handle_user_input(user_question):
-    """Handle user input and get response."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
-    
+    """Handle user input and get response using the shared, cached index and chain."""
     try:
-        new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
+        # Reloaded only when faiss_index changes on disk; otherwise the cached object is reused
+        new_db, load_seconds = get_vector_store("faiss_index")
+
+        start = time.perf_counter()
         docs = new_db.similarity_search(user_question)
+        retrieval_seconds = time.perf_counter() - start
         
         chain = get_conversational_chain()
+        start = time.perf_counter()
         response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+        answer_seconds = time.perf_counter() - start
         
         st.write("Reply:", response["output_text"])
+        st.caption(f"Index load {load_seconds:.2f}s · retrieval {retrieval_seconds:.2f}s · answer {answer_seconds:.2f}s")
         
     except Exception as e:
         st.error(f"Error processing user input: {e}")
@@ -161,8 +224,10 @@ def main():
             with st.spinner("Processing: "):
                 if st.session_state.csv_files:
                     documents = load_csv_files_with_metadata(st.session_state.csv_files)
-                    if documents:
-                        create_or_update_vector_store(documents)
+                    first_document = next(documents, None)
+                    if first_document:
+                        create_or_update_vector_store(chain([first_document], documents),
+                                                      fingerprint=upload_fingerprint(st.session_state.csv_files))
                         
                         # Display file info
                         st.write(f"Number of files uploaded: {len(st.session_state.csv_files)}")
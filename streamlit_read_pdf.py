@@ -1,117 +1,106 @@
 import os
+import time
 import streamlit as st
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from API_GEMINI import GOOGLE_API_KEY
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import google.generativeai as genai
-from langchain.vectorstores import FAISS
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.chains.question_answering import load_qa_chain
 import PyPDF2
-from uuid import uuid4
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from langchain_core.documents import Document
+from streamlit_read_csv import create_or_update_vector_store
+from ingest_pipeline import upload_fingerprint
+from streamlit_resources import get_vector_store
 
 # Konfigurasi API Google Generative AI dengan API key yang telah disediakan
 genai.configure(api_key=GOOGLE_API_KEY)
 
-def load_pdf_files(pdf_files):
-    """Memuat dan mengekstrak teks dari file PDF menggunakan PyPDF2.
-    
+# Jumlah proses yang mengurai file PDF bersamaan
+PDF_WORKERS = int(os.environ.get("EDA_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Ukuran chunk per halaman (karakter); chunk kecil lebih mudah masuk anggaran token konteks
+PDF_CHUNK_SIZE = 2000
+PDF_CHUNK_OVERLAP = 200
+
+def extract_pages(data):
+    """Mengekstrak teks setiap halaman dari isi file PDF (dijalankan di process pool).
+
     Args:
-        pdf_files (list): Daftar file PDF yang diunggah pengguna.
-        
+        data (bytes): Isi file PDF.
+
     Returns:
-        str: Gabungan teks dari semua file PDF yang valid.
+        list: Pasangan (nomor halaman mulai dari 1, teks halaman) untuk halaman yang berisi teks.
     """
-    all_text = []
-    for file in pdf_files:
-        try:
-            # Membaca file PDF menggunakan PyPDF2
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            # Mengekstrak teks dari setiap halaman dalam PDF
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
-                
-            # Menambahkan teks yang berhasil diambil ke dalam list
-            if text.strip():
-                all_text.append(text)
-            else:
-                st.warning(f"File {file.name} kosong atau tidak mengandung teks yang dapat dibaca.")
-                
-        except Exception as e:
-            st.warning(f"Gagal membaca file PDF {file.name}: {e}")
-    
-    if all_text:
-        return "\n".join(all_text)
-    else:
-        st.error("Tidak ada file PDF yang valid diunggah.")
-        return ""
-
-def preprocess_text(text):
-    """Memproses teks yang diekstrak dari PDF untuk digunakan dalam LangChain.
-    
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages = []
+    for page_number, page in enumerate(pdf_reader.pages, start=1):
+        text = page.extract_text() or ""
+        if text.strip():
+            pages.append((page_number, text))
+    return pages
+
+def page_documents(file_name, pages, text_splitter):
+    """Memecah setiap halaman menjadi chunk Document dengan metadata file dan halaman.
+
     Args:
-        text (str): Teks yang diekstrak dari file PDF.
-        
-    Returns:
-        list: Daftar potongan teks setelah dipecah menjadi chunk.
+        file_name (str): Nama file PDF.
+        pages (list): Hasil extract_pages.
+        text_splitter (RecursiveCharacterTextSplitter): Pemecah teks.
+
+    Yields:
+        Document: Chunk teks dengan metadata source, file, page, dan chunk.
     """
-    if not text:
-        return []
-    
-    # Memecah teks menjadi chunk dengan ukuran maksimal 10.000 karakter dan overlap 1.000 karakter
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000, length_function=len)
-    return text_splitter.split_text(text)
+    source = os.path.splitext(os.path.basename(file_name))[0]
+    for page_number, text in pages:
+        for chunk_number, chunk in enumerate(text_splitter.split_text(text)):
+            yield Document(page_content=chunk, metadata={"source": source, "file": file_name, "page": page_number, "chunk": chunk_number})
+
+def load_pdf_documents(pdf_files, workers=PDF_WORKERS, chunk_size=PDF_CHUNK_SIZE, chunk_overlap=PDF_CHUNK_OVERLAP):
+    """Mengekstrak file PDF secara paralel di process pool dan menghasilkan chunk per halaman.
+
+    Beberapa file diurai bersamaan, tetapi hanya sejumlah terbatas yang menunggu sehingga
+    memori tidak menampung seluruh unggahan sekaligus. Dokumen dihasilkan sebagai stream
+    sesuai urutan file.
 
-def create_or_update_vector_store(text_chunks, vector_store_path="faiss_index"):
-    """Membuat atau memperbarui vektor store dengan potongan teks yang diberikan.
-    
     Args:
-        text_chunks (list): Daftar potongan teks untuk dimasukkan ke vektor store.
-        vector_store_path (str): Jalur penyimpanan vektor store (default: "faiss_index").
-        
-    Returns:
-        FAISS: Objek vektor store yang diperbarui.
+        pdf_files (list): Daftar file PDF yang diunggah pengguna.
+        workers (int): Jumlah proses pengurai PDF.
+        chunk_size (int): Ukuran maksimal chunk dalam karakter.
+        chunk_overlap (int): Overlap antar-chunk dalam karakter.
+
+    Yields:
+        Document: Chunk teks dengan metadata file dan halaman.
     """
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
-    
-    try:
-        # Check if the vector store already exists
-        if os.path.exists(vector_store_path):
-            # Load the existing vector store
-            vector_store = FAISS.load_local(vector_store_path, embeddings, allow_dangerous_deserialization=True)
-            st.info("Existing vector store loaded.")
-        else:
-            # Create a new vector store
-            index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
-            vector_store = FAISS(
-                embedding_function=embeddings, 
-                index=index,
-                docstore=InMemoryDocstore(),
-                index_to_docstore_id={},)
-            st.info("New vector store created.")
-        
-        # Generate unique IDs for the documents
-        uuids = [str(uuid4()) for _ in range(len(documents))]
-        
-        # Add new documents to the vector store
-        vector_store.add_documents(documents=documents, ids=uuids)
-        
-        # Save the updated vector store
-        vector_store.save_local(vector_store_path)
-        st.success("Vektor store berhasil diperbarui.")
-        
-    except Exception as e:
-        st.error(f"Terjadi kesalahan saat membuat atau memperbarui vektor store: {e}")
-        return None
-    
-    return vector_store
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    pending = deque()
 
+    def finish(file_name, future):
+        try:
+            pages = future.result()
+        except Exception as e:
+            st.warning(f"Gagal membaca file PDF {file_name}: {e}")
+            return
+        if not pages:
+            st.warning(f"File {file_name} kosong atau tidak mengandung teks yang dapat dibaca.")
+        yield from page_documents(file_name, pages, text_splitter)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file in pdf_files:
+            file.seek(0)
+            pending.append((file.name, executor.submit(extract_pages, file.read())))
+            if len(pending) >= 2 * workers:
+                yield from finish(*pending.popleft())
+        while pending:
+            yield from finish(*pending.popleft())
+
+@st.cache_resource
 def get_conversational_chain():
-    """Membuat dan mengembalikan rantai QA untuk menjawab pertanyaan pengguna.
+    """Membuat dan mengembalikan rantai QA untuk menjawab pertanyaan pengguna (sekali per proses).
     
     Returns:
         LLMChain: Objek rantai QA untuk penjawaban pertanyaan.
@@ -143,21 +132,24 @@ def handle_user_input(user_question):
     Args:
         user_question (str): Pertanyaan yang diajukan oleh pengguna.
     """
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY)
-    
     try:
-        # Memuat vektor store yang ada
-        new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
+        # Memakai vektor store bersama; dimuat ulang hanya jika faiss_index berubah di disk
+        new_db, load_seconds = get_vector_store("faiss_index")
         # Mencari dokumen yang relevan berdasarkan pertanyaan pengguna
+        start = time.perf_counter()
         docs = new_db.similarity_search(user_question)
+        retrieval_seconds = time.perf_counter() - start
         
-        # Mendapatkan rantai QA
+        # Mendapatkan rantai QA (dibuat sekali per proses)
         chain = get_conversational_chain()
         # Mendapatkan respons dari rantai QA
+        start = time.perf_counter()
         response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+        answer_seconds = time.perf_counter() - start
         
-        # Menampilkan respons di aplikasi Streamlit
+        # Menampilkan respons dan rincian waktu di aplikasi Streamlit
         st.write("Reply:", response["output_text"])
+        st.caption(f"Muat indeks {load_seconds:.2f} dtk · retrieval {retrieval_seconds:.2f} dtk · jawaban {answer_seconds:.2f} dtk")
         
     except Exception as e:
         st.error(f"Terjadi kesalahan saat memproses input pengguna: {e}")
@@ -189,12 +181,13 @@ def main():
         if st.button("Submit & Process"):
             with st.spinner("Memproses: "):
                 if st.session_state.pdf_files:
-                    # Memuat, memproses, dan menyimpan teks dari file PDF
-                    pdf_text = load_pdf_files(st.session_state.pdf_files)
-                    text_chunks = preprocess_text(pdf_text)
+                    # Mengekstrak halaman secara paralel lalu mengalirkan chunk ke update vektor store bertahap
+                    documents = load_pdf_documents(st.session_state.pdf_files)
+                    first_document = next(documents, None)
                     
-                    if text_chunks:
-                        create_or_update_vector_store(text_chunks)
+                    if first_document:
+                        create_or_update_vector_store(chain([first_document], documents),
+                                                      fingerprint=upload_fingerprint(st.session_state.pdf_files))
                         
                         # Menampilkan informasi file
                         st.write(f"Jumlah file yang diunggah: {len(st.session_state.pdf_files)}")
@@ -203,6 +196,8 @@ def main():
                             st.write(f"- {file.name}")
                         
                         st.success("Proses Selesai")
+                    else:
+                        st.error("Tidak ada file PDF yang valid diunggah.")
                 else:
                     st.error("Harap unggah file PDF.")
                 
@@ -0,0 +1,33 @@
+import time
+import streamlit as st
+from API_GEMINI import GOOGLE_API_KEY
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from embedding_cache import CachedEmbeddings
+from vector_index import load_vector_store, current_index_path, current_index_version, is_immutable_version, INDEX_MMAP
+
+
+@st.cache_resource
+def get_embeddings():
+    """Klien embedding bersama untuk semua sesi dan rerun Streamlit dalam satu proses."""
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=GOOGLE_API_KEY))
+
+
+@st.cache_resource(max_entries=2)
+def _load_vector_store(vector_store_path, version):
+    """Memuat satu versi indeks sekali; version juga menjadi bagian kunci cache.
+
+    Versi yang sudah diterbitkan dipetakan ke memori (tidak pernah ditulis ulang); folder lama dibaca penuh.
+    """
+    mmap = INDEX_MMAP and is_immutable_version(version)
+    return load_vector_store(vector_store_path, get_embeddings(), mmap=mmap)
+
+
+def get_vector_store(index_root="faiss_index"):
+    """Mengembalikan vektor store bersama dan lama pemuatannya dalam detik.
+
+    Indeks dimuat ulang hanya jika penunjuk versi aktif berubah (mis. setelah "Submit & Process"
+    menerbitkan versi baru); selain itu objek yang sudah dimuat dipakai ulang (mendekati 0 detik).
+    """
+    start = time.perf_counter()
+    vector_store = _load_vector_store(current_index_path(index_root), current_index_version(index_root))
+    return vector_store, time.perf_counter() - start
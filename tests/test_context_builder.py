@@ -0,0 +1,38 @@
+from langchain_core.documents import Document
+from context_builder import ContextBuilder
+
+SOURCE = "Jumlah Desa Kelurahan Menurut Kecamatan dan Klasifikasi Desa di Kabupaten Deli Serdang Provinsi Sumatera Utara Berdasarkan Status Pemerintahan"
+
+
+def row(year, value="20"):
+    return Document(page_content=f"{SOURCE}, {year}, Kecamatan Tanjung Morawa, {value}.", metadata={"source": SOURCE})
+
+
+def test_rows_of_the_same_table_are_kept():
+    docs = [row(2023), row(2022), row(2021)]
+    used_ids, context, _ = ContextBuilder().build(["a", "b", "c"], docs)
+    assert used_ids == ["a", "b", "c"]
+    assert len(context) == 1
+    for year in ("2021", "2022", "2023"):
+        assert f"{year} | Kecamatan Tanjung Morawa | 20" in context[0].page_content
+
+
+def test_identical_rows_are_deduplicated():
+    used_ids, _, _ = ContextBuilder().build(["a", "b"], [row(2023), row(2023)])
+    assert used_ids == ["a"]
+
+
+def test_near_duplicate_text_chunks_are_dropped():
+    text = "Pedoman EDA menjelaskan cara bertanya data statistik kepada asisten melalui WhatsApp dan Telegram."
+    docs = [Document(page_content=text, metadata={"source": "pedoman", "page": 1}),
+            Document(page_content=text + ".", metadata={"source": "pedoman", "page": 2})]
+    used_ids, _, _ = ContextBuilder().build(["a", "b"], docs)
+    assert used_ids == ["a"]
+
+
+def test_missing_docstore_entries_are_skipped():
+    docs = [row(2023), "ID b not found.", row(2022)]
+    used_ids, context, _ = ContextBuilder().build(["a", "b", "c"], docs)
+    assert used_ids == ["a", "c"]
+    assert len(context) == 1
+    assert ContextBuilder().build(["b"], ["ID b not found."]) == ([], [], 0)
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from data_lookup import DataLookup
+
+
+def make_lookup():
+    rows = []
+    for year, value in (("2022", "2450000"), ("2023", "2500000")):
+        rows.append({"var_id": "1", "variable": "Jumlah Penduduk", "unit": "Jiwa", "vervar": "Kota Medan",
+                     "turvar": "Tidak Ada", "tahun": year, "turtahun": "Tahun", "value": value})
+        for turvar, share in (("Laki-laki", "1240000"), ("Perempuan", "1260000")):
+            rows.append({"var_id": "2", "variable": "Penduduk Menurut Jenis Kelamin", "unit": "Jiwa",
+                         "vervar": "Kota Medan", "turvar": turvar, "tahun": year, "turtahun": "Tahun", "value": share})
+    table = pd.DataFrame(rows)
+    for column in ("var_id", "variable", "unit", "vervar", "turvar", "tahun", "turtahun"):
+        table[column] = table[column].astype("category")
+    return DataLookup(table)
+
+
+@pytest.mark.parametrize("question", [
+    "persentase penduduk miskin kota medan 2023",
+    "kepadatan penduduk kota medan tahun 2023",
+    "jumlah penduduk miskin kota medan 2023",
+])
+def test_other_variables_fall_through_to_rag(question):
+    assert make_lookup().answer(question) is None
+
+
+def test_exact_variable_is_answered():
+    answer = make_lookup().answer("Berapa jumlah penduduk Kota Medan tahun 2023?")
+    assert answer.startswith("Jumlah Penduduk untuk Kota Medan")
+    assert "2.500.000 Jiwa" in answer
+
+
+def test_turvar_words_are_not_extra_tokens():
+    answer = make_lookup().answer("penduduk menurut jenis kelamin laki-laki medan 2022")
+    assert "(Laki-laki): 1.240.000 Jiwa" in answer
+    assert "Perempuan" not in answer
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bench_fakes import FakeEmbeddings
+from embedding_cache import CachedEmbeddings
+
+
+def make_cache(tmp_path, max_entries=4):
+    return CachedEmbeddings(FakeEmbeddings(dim=8, latency=0), cache_dir=str(tmp_path), max_entries=max_entries)
+
+
+def test_hits_return_the_stored_vectors(tmp_path):
+    cache = make_cache(tmp_path)
+    first = cache.embed_documents(["a", "b"])
+    assert cache.embed_documents(["b", "a"]) == [first[1], first[0]]
+    assert cache.stats()["hits"] == 2
+    assert cache.embeddings.calls == 1
+
+
+def test_slot_overwritten_by_failed_store_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path, max_entries=1)
+    expected = cache.embed_documents(["a"])
+
+    # The victim slot is overwritten, then the second (malformed) vector fails and the transaction rolls back
+    with pytest.raises(ValueError):
+        cache._store([("doc:other", [9.0] * 8), ("doc:bad", [1.0] * 3)])
+
+    assert cache.embed_documents(["a"]) == expected
+    assert cache.stats()["misses"] == 2
+    assert cache.embeddings.calls == 2
+
+
+def test_capacity_is_stored_and_shared(tmp_path):
+    cache = make_cache(tmp_path, max_entries=4)
+    vectors = cache.embed_documents(["a", "b", "c", "d"])
+
+    grown = make_cache(tmp_path, max_entries=8)
+    assert grown.embed_documents(["a", "b", "c", "d"]) == vectors
+    grown.embed_documents(["e", "f", "g", "h"])
+    assert grown.stats()["entries"] == 8
+
+    # The first instance picks up the new capacity instead of writing past its old mapping
+    cache.embed_documents(["i"])
+    assert cache.max_entries == 8 and cache.stats()["entries"] == 8
+
+    shrunk = make_cache(tmp_path, max_entries=2)
+    assert shrunk.stats()["entries"] <= 2
+    shrunk.embed_documents(["x", "y", "z"])
+    assert shrunk.stats()["entries"] == 2
+    assert np.allclose(shrunk.embed_documents(["z"])[0], FakeEmbeddings(dim=8)._vector("z"))
@@ -0,0 +1,47 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from bench_fakes import FakeEmbeddings
+from hybrid_retriever import HybridRetriever, save_lexical_index
+
+SOURCE = "Jumlah Penduduk Menurut Kabupaten/Kota"
+REGIONS = ["Kota Medan", "Kabupaten Deli Serdang", "Kabupaten Karo", "Kota Binjai"]
+
+
+def make_vector_store():
+    embeddings = FakeEmbeddings(dim=16, latency=0)
+    documents = [
+        Document(page_content=f"{SOURCE}, {year}, {region}, {1000 + i}.",
+                 metadata={"source": SOURCE, "tahun": str(year), "vervar": region})
+        for i, (region, year) in enumerate((region, year) for region in REGIONS for year in (2021, 2022, 2023))
+    ]
+    documents.append(Document(page_content="Profil singkat BPS Provinsi Sumatera Utara.", metadata={"source": "profil.pdf", "page": 1}))
+    return FAISS.from_documents(documents, embeddings), embeddings
+
+
+def test_prebuilt_lexical_index_matches_startup_build(tmp_path):
+    vector_store, embeddings = make_vector_store()
+    save_lexical_index(vector_store, str(tmp_path))
+
+    built = HybridRetriever(vector_store)
+    loaded = HybridRetriever(vector_store, str(tmp_path))
+    assert not built.prebuilt and loaded.prebuilt
+    assert isinstance(loaded._positions, np.memmap)
+
+    question = "Berapa jumlah penduduk Kabupaten Karo tahun 2022?"
+    query = embeddings.embed_query(question)
+    assert loaded.infer_filters(question) == built.infer_filters(question) == {
+        "tahun": {"2022"}, "vervar": {"Kabupaten Karo"}}
+    assert loaded.search(question, query, 3)[0] == built.search(question, query, 3)[0]
+    assert loaded.search("profil BPS", query, 2)[0] == built.search("profil BPS", query, 2)[0]
+
+
+def test_stale_lexical_index_is_rebuilt(tmp_path):
+    vector_store, _ = make_vector_store()
+    save_lexical_index(vector_store, str(tmp_path))
+    vector_store.add_documents([Document(page_content="Dokumen baru.", metadata={"source": "baru.pdf", "page": 1})])
+
+    retriever = HybridRetriever(vector_store, str(tmp_path))
+    assert not retriever.prebuilt
+    assert retriever.stats()["documents"] == vector_store.index.ntotal
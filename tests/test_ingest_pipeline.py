@@ -0,0 +1,61 @@
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from bench_fakes import FakeEmbeddings
+from ingest_pipeline import IngestPipeline, find_resumable_version, upload_fingerprint
+from vector_index import index_type_of, new_index_version
+
+
+def empty_store(embeddings):
+    return FAISS(embedding_function=embeddings, index=faiss.IndexFlatL2(embeddings.dim),
+                 docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+
+def documents(start, stop):
+    return [Document(page_content=f"baris {i}", metadata={"source": "tabel"}) for i in range(start, stop)]
+
+
+def test_ivf_pq_training_waits_for_enough_vectors(tmp_path):
+    embeddings = FakeEmbeddings(dim=48, latency=0)
+    vector_store = FAISS(embedding_function=embeddings, index=faiss.IndexFlatL2(48),
+                         docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+    # 100 vectors cannot train a 256-entry PQ codebook: the index stays flat instead of crashing
+    pipeline = IngestPipeline(vector_store, embeddings, str(tmp_path), pending_index_type="ivf_pq", batch_size=50, rate=1000)
+    vector_store = pipeline.run(documents(0, 100))
+    assert index_type_of(vector_store.index) == "flat" and vector_store.index.ntotal == 100
+
+    pipeline = IngestPipeline(vector_store, embeddings, str(tmp_path), pending_index_type="ivf_pq", batch_size=50, rate=1000)
+    vector_store = pipeline.run(documents(0, 300))
+    assert index_type_of(vector_store.index) == "ivf_pq" and vector_store.index.ntotal == 300
+    assert vector_store.similarity_search("baris 7", k=1)
+
+
+def test_interrupted_upload_resumes_only_for_the_same_files(tmp_path):
+    root = str(tmp_path / "faiss_index")
+    embeddings = FakeEmbeddings(dim=8, latency=0)
+    files = [tmp_path / "a.csv", tmp_path / "b.csv"]
+    for file in files:
+        file.write_text(file.name)
+    fingerprint = upload_fingerprint([str(file) for file in files])
+    version_path = new_index_version(root)
+    pipeline = IngestPipeline(empty_store(embeddings), embeddings, version_path, rate=1000, fingerprint=fingerprint)
+    pipeline.run(documents(0, 10))
+    pipeline.checkpoint()
+
+    assert find_resumable_version(root, fingerprint) == version_path
+    files[1].write_text("b.csv with more rows")
+    assert find_resumable_version(root, upload_fingerprint([str(file) for file in files])) is None
+    assert find_resumable_version(root) is None
+
+
+def test_checkpoints_are_spaced_geometrically(tmp_path):
+    embeddings = FakeEmbeddings(dim=8, latency=0)
+    pipeline = IngestPipeline(empty_store(embeddings), embeddings, str(tmp_path), batch_size=10, rate=1000,
+                              checkpoint_every=1, checkpoint_growth=2.0)
+    pipeline.run(documents(0, 1000))
+
+    # After 10, 20, 40, 80, 160, 320 and 640 documents instead of after each of the 100 batches
+    assert pipeline.checkpoints == 7
@@ -0,0 +1,23 @@
+import json
+import os
+
+from bench_fakes import StubBPSServer
+from scrap import scrape, save_checkpoint
+
+
+def test_resumed_incremental_run_keeps_changes_from_before_interruption(tmp_path):
+    folder = tmp_path / "JSON"
+    checkpoint = tmp_path / "checkpoint.json"
+    changed = tmp_path / "changed.json"
+    # Run sebelumnya terhenti setelah varID 1 dan 2 selesai; varID 1 tercatat berubah
+    save_checkpoint(str(checkpoint), {1, 2}, {1})
+
+    with StubBPSServer(regions=2, years=1) as server:
+        summary = scrape(range(1, 5), url_template=server.url_template, folder=str(folder), workers=2,
+                         rate=100, checkpoint_path=str(checkpoint), incremental=True,
+                         manifest_path=str(tmp_path / "manifest.json"), changed_path=str(changed))
+
+    assert summary["failed"] == []
+    with open(changed, encoding="utf-8") as f:
+        assert json.load(f)["changed"] == [1, 3, 4]
+    assert not os.path.exists(checkpoint)
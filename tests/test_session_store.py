@@ -0,0 +1,80 @@
+import session_store
+from session_store import RedisSessionStore
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for RedisSessionStore, with a controllable clock; SCAN is not supported."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}  # key -> (value, expires_at)
+        self.zsets = {}
+
+    def _live(self, key):
+        entry = self.values.get(key)
+        return entry is not None and entry[1] > self.clock[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._live(key):
+            return None
+        self.values[key] = (value, self.clock[0] + ex)
+        return True
+
+    def expire(self, key, seconds):
+        if self._live(key):
+            self.values[key] = (self.values[key][0], self.clock[0] + seconds)
+
+    def exists(self, key):
+        return int(self._live(key))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcount(self, key, low, high):
+        return sum(1 for score in self.zsets.get(key, {}).values() if float(low) <= score <= float(high))
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [member for member, score in zset.items() if float(low) <= score <= float(high)]:
+            del zset[member]
+
+
+def test_live_sessions_counted_from_sorted_set(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: clock[0])
+    client = FakeRedis(clock)
+    store = RedisSessionStore(client=client, ttl=60)
+
+    store.get("6281")
+    store.get("6282")
+    clock[0] += 30
+    store.get("6281")
+    assert len(store) == 2
+
+    # 6282 expires; creating a new session also trims it from the sorted set
+    clock[0] += 45
+    assert len(store) == 1
+    store.get("6283")
+    assert set(client.zsets[store.live_key]) == {"6281", "6283"}
+    assert store.stats() == {"live_sessions": 2, "created": 3}
+
+
+def test_async_history_runs_store_io_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    from langchain_core.messages import AIMessage, HumanMessage
+    from session_store import SqliteSessionStore
+
+    store = SqliteSessionStore(path=str(tmp_path / "sessions.sqlite"))
+    threads = []
+    load = store._load
+    monkeypatch.setattr(store, "_load", lambda session_id: threads.append(threading.get_ident()) or load(session_id))
+
+    async def exchange():
+        history = store.get("6281")
+        await history.aadd_messages([HumanMessage("Halo"), AIMessage("Halo juga")])
+        return await history.aget_messages(), threading.get_ident()
+
+    messages, loop_thread = asyncio.run(exchange())
+    assert [message.content for message in messages] == ["Halo", "Halo juga"]
+    assert threads and loop_thread not in threads
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+import bench_fakes
+
+bench_fakes.install()
+
+from streamlit_read_csv import load_csv_files_with_metadata  # noqa: E402
+
+
+class Upload(io.BytesIO):
+    name = "penduduk.csv"
+
+
+def test_chunks_keep_years_and_values_as_written():
+    # The empty cells land in the second chunk only: inferred dtypes would read it as float
+    csv = ("vervar,turvar,tahun,datacontent\n"
+           "Kota Medan,Laki-laki,2020,1200\n"
+           "Kota Medan,Perempuan,2020,1300\n"
+           "Kota Binjai,,2021,\n"
+           "Kabupaten Karo,Jumlah,,0150\n")
+    documents = list(load_csv_files_with_metadata([Upload(csv.encode("utf-8"))], chunksize=2))
+
+    assert [doc.page_content for doc in documents] == [
+        "penduduk, 2020, Laki-laki untuk Kota Medan, 1200.",
+        "penduduk, 2020, Perempuan untuk Kota Medan, 1300.",
+        "penduduk, 2021, Kota Binjai, Data tidak tersedia.",
+        "penduduk, Tahun tidak tersedia, Jumlah untuk Kabupaten Karo, 0150.",
+    ]
+    assert documents[2].metadata == {"source": "penduduk", "tahun": "2021", "vervar": "Kota Binjai", "turvar": ""}
+
+
+def test_parse_error_aborts_instead_of_truncating_the_source():
+    # An invalid byte far into the file: the first chunks are read before decoding fails
+    csv = b"vervar,tahun,datacontent\n" + b"Kota Medan,2020,1200\n" * 30000 + b"Kabupaten \xff Karo,2020,150\n"
+    documents = load_csv_files_with_metadata([Upload(csv)], chunksize=1000)
+
+    read = []
+    with pytest.raises(ValueError, match="penduduk.csv"):
+        for doc in documents:
+            read.append(doc)
+    assert read
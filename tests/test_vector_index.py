@@ -0,0 +1,65 @@
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from bench_fakes import FakeEmbeddings
+from vector_index import build_index, compact_vector_store, document_id, replace_source_documents
+
+
+def documents(source, count):
+    return [Document(page_content=f"{source} baris {i}", metadata={"source": source}) for i in range(count)]
+
+
+def add(vector_store, docs):
+    vector_store.add_documents(docs, ids=[document_id(doc) for doc in docs])
+
+
+def test_reingesting_a_shrunken_source_on_ivf_keeps_ids_aligned():
+    embeddings = FakeEmbeddings(dim=16, latency=0)
+    original = documents("tabel_a", 600) + documents("tabel_b", 200)
+    sample = np.asarray(embeddings.embed_documents([doc.page_content for doc in original]), dtype=np.float32)
+    vector_store = FAISS(embedding_function=embeddings, index=build_index("ivf_flat", 16, sample),
+                         docstore=InMemoryDocstore(), index_to_docstore_id={})
+    add(vector_store, original)
+    source_map = {source: [document_id(doc) for doc in original if doc.metadata["source"] == source]
+                  for source in ("tabel_a", "tabel_b")}
+
+    # tabel_a is uploaded again with only its first 100 rows
+    shrunk = documents("tabel_a", 100)
+    removed = replace_source_documents(vector_store, source_map, {"tabel_a": {document_id(doc) for doc in shrunk}})
+
+    assert removed == 500
+    assert vector_store.index.ntotal == len(vector_store.index_to_docstore_id) == 300
+    vector_store.index.nprobe = vector_store.index.nlist
+    _, ids = vector_store.index.search(sample[:50], 10)
+    assert set(ids[ids >= 0].tolist()) <= set(vector_store.index_to_docstore_id)
+    results = vector_store.similarity_search("tabel_b baris 7", k=5)
+    assert all(doc.metadata["source"] in ("tabel_a", "tabel_b") for doc in results)
+    assert compact_vector_store(vector_store).index.ntotal == 300
+
+
+def test_compact_export_is_published_and_served_with_mmap(tmp_path, monkeypatch):
+    import index_manager
+    from vector_index import SqliteDocstore, current_index_version, export_compact_store, new_index_version, publish_index_version
+
+    embeddings = FakeEmbeddings(dim=16, latency=0)
+    root = str(tmp_path / "faiss_index")
+    vector_store = FAISS(embedding_function=embeddings, index=build_index("flat", 16),
+                         docstore=InMemoryDocstore(), index_to_docstore_id={})
+    add(vector_store, documents("tabel_a", 300))
+    version_path = new_index_version(root)
+    vector_store.save_local(version_path)
+    publish_index_version(root, version_path)
+
+    version = export_compact_store(root, quantize="sq8")
+    assert current_index_version(root) == version
+
+    loads = []
+    load = index_manager.load_vector_store
+    monkeypatch.setattr(index_manager, "load_vector_store", lambda path, embeddings, mmap: loads.append(mmap) or load(path, embeddings, mmap))
+    manager = index_manager.IndexManager(root, embeddings)
+    served = manager.current.vector_store
+    assert loads == [True]
+    assert isinstance(served.docstore, SqliteDocstore)
+    assert served.similarity_search("tabel_a baris 3", k=1)[0].metadata["source"] == "tabel_a"
@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import sqlite3
+import shutil
+import threading
+from datetime import datetime
+from collections.abc import Mapping
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+# Peta sumber (nama file/tabel) -> daftar ID dokumen, disimpan di samping index.faiss
+SOURCE_MAP_FILE = "source_ids.json"
+
+# Jenis indeks FAISS untuk vektor store baru: flat, ivf_flat, ivf_pq, atau hnsw
+INDEX_TYPE = os.environ.get("EDA_INDEX_TYPE", "flat")
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+IVF_NLIST = int(os.environ.get("EDA_IVF_NLIST", "1024"))  # jumlah cluster IVF maksimal
+PQ_M = int(os.environ.get("EDA_PQ_M", "48"))  # jumlah sub-kuantizer PQ, harus membagi dimensi
+PQ_NBITS = 8
+HNSW_M = int(os.environ.get("EDA_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = 200
+TRAIN_SAMPLE_SIZE = int(os.environ.get("EDA_TRAIN_SAMPLE_SIZE", "50000"))  # vektor untuk training IVF
+# Jumlah vektor minimal untuk training: codebook PQ 8 bit membutuhkan 2^8 titik per sub-kuantizer
+MIN_TRAIN_VECTORS = {"ivf_flat": 1, "ivf_pq": 2 ** PQ_NBITS}
+# Parameter pencarian: cluster yang diperiksa (IVF) dan lebar antrean kandidat (HNSW)
+NPROBE = int(os.environ.get("EDA_NPROBE", "16"))
+EF_SEARCH = int(os.environ.get("EDA_EF_SEARCH", "64"))
+
+# Format docstore ringkas di disk (menggantikan index.pkl) dan mode pemuatan indeks.
+# mmap hanya aman untuk index.faiss yang tidak pernah ditulis ulang di tempat: save_local dan
+# checkpoint yang menimpa file yang sedang dipetakan dapat membuat proses pembaca kena SIGBUS.
+# Karena itu mmap hanya dipakai untuk versi yang sudah diterbitkan (lihat is_immutable_version).
+DOCSTORE_FILE = "docstore.sqlite"
+INDEX_MMAP = os.environ.get("EDA_INDEX_MMAP", "1") == "1"
+
+# Folder indeks berversi: faiss_index/versions/<versi>/ dan penunjuk atomik faiss_index/CURRENT
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+KEEP_INDEX_VERSIONS = int(os.environ.get("EDA_KEEP_INDEX_VERSIONS", "3"))  # versi lama yang disimpan
+
+
+def document_id(document):
+    """ID dokumen deterministik dari sumber dan isinya.
+
+    Dokumen yang sama dari sumber yang sama selalu mendapat ID yang sama, sehingga unggahan
+    ulang tidak menggandakan vektor di indeks.
+    """
+    source = str(document.metadata.get("source", ""))
+    return hashlib.sha1(f"{source}\x00{document.page_content}".encode("utf-8")).hexdigest()
+
+
+def load_source_map(vector_store_path="faiss_index"):
+    """Membaca peta sumber -> ID dokumen; kosong jika belum ada."""
+    path = os.path.join(vector_store_path, SOURCE_MAP_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_source_map(vector_store_path, source_map):
+    """Menyimpan peta sumber -> ID dokumen secara atomik."""
+    path = os.path.join(vector_store_path, SOURCE_MAP_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(source_map, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def can_train(index_type, count):
+    """True jika `count` vektor cukup untuk membangun indeks index_type (selalu True untuk flat/hnsw)."""
+    return count >= MIN_TRAIN_VECTORS.get(index_type, 0)
+
+
+def build_index(index_type, dim, sample_vectors=None):
+    """Membuat indeks FAISS sesuai jenisnya dan melatihnya dengan sampel vektor bila diperlukan.
+
+    Args:
+        index_type (str): flat, ivf_flat, ivf_pq, atau hnsw.
+        dim (int): Dimensi vektor.
+        sample_vectors (numpy.ndarray): Sampel untuk training IVF; jumlah cluster disesuaikan
+            dengan ukuran sampel (sekitar 39 vektor per cluster, batas minimal FAISS).
+
+    Returns:
+        faiss.Index: Indeks kosong yang siap diisi.
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = EF_SEARCH
+        return index
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Jenis indeks tidak dikenal: {index_type}")
+    if not can_train(index_type, 0 if sample_vectors is None else len(sample_vectors)):
+        raise ValueError(f"Indeks {index_type} membutuhkan minimal {MIN_TRAIN_VECTORS[index_type]} vektor untuk training")
+
+    sample = np.ascontiguousarray(sample_vectors[:TRAIN_SAMPLE_SIZE], dtype=np.float32)
+    nlist = max(1, min(IVF_NLIST, len(sample) // 39))
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS)
+    index.train(sample)
+    index.nprobe = NPROBE
+    return index
+
+
+def index_type_of(index):
+    """Mengembalikan jenis indeks (flat, ivf_flat, ivf_pq, atau hnsw) dari objek indeks FAISS."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def set_search_params(index, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """Mengatur parameter pencarian indeks ANN: nprobe untuk IVF, efSearch untuk HNSW."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def reconstruct_all(index):
+    """Mengambil seluruh vektor dari indeks (untuk IVF, direct map dibuat terlebih dahulu)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def remove_documents(vector_store, ids):
+    """Menghapus dokumen (vektor dan isi docstore) berdasarkan ID; ID yang tidak ada diabaikan.
+
+    Hanya indeks flat (IndexFlatCodes) yang dihapus langsung: FAISS memadatkan posisinya
+    sama seperti langchain menomori ulang index_to_docstore_id. IVF menyimpan ID lamanya
+    (posisi tidak lagi cocok dengan peta) dan HNSW tidak mendukung penghapusan, sehingga
+    keduanya dibangun ulang tanpa dokumen tersebut.
+
+    Returns:
+        int: Jumlah dokumen yang dihapus.
+    """
+    indexed = set(vector_store.index_to_docstore_id.values())
+    ids = [doc_id for doc_id in ids if doc_id in indexed]
+    if not ids:
+        return 0
+
+    if isinstance(vector_store.index, faiss.IndexFlatCodes):
+        vector_store.delete(ids)
+    else:
+        rebuilt = compact_vector_store(vector_store, exclude_ids=set(ids))
+        vector_store.index = rebuilt.index
+        vector_store.docstore = rebuilt.docstore
+        vector_store.index_to_docstore_id = rebuilt.index_to_docstore_id
+    return len(ids)
+
+
+def replace_source_documents(vector_store, source_map, seen_ids):
+    """Mengganti isi sumber yang diunggah ulang: dokumen lama yang tidak muncul lagi dihapus.
+
+    Args:
+        vector_store (FAISS): Vektor store yang sedang diperbarui.
+        source_map (dict): Peta sumber -> daftar ID; diperbarui di tempat.
+        seen_ids (dict): Sumber -> set ID dokumen yang ada pada unggahan ini.
+
+    Returns:
+        int: Jumlah dokumen usang yang dihapus.
+    """
+    stale = []
+    for source, ids in seen_ids.items():
+        stale.extend(set(source_map.get(source, [])) - ids)
+        source_map[source] = sorted(ids)
+    return remove_documents(vector_store, stale)
+
+
+def compact_vector_store(vector_store, source_map=None, index_type=None, exclude_ids=()):
+    """Membangun ulang indeks hanya dari entri yang masih hidup.
+
+    Vektor disalin ke indeks baru dengan urutan rapat, dokumen di docstore yang tidak lagi
+    dirujuk indeks dibuang, dan ID yang sudah tidak ada dihapus dari source_map.
+
+    Args:
+        vector_store (FAISS): Vektor store sumber.
+        source_map (dict): Peta sumber -> ID yang ikut dirapikan, jika diberikan.
+        index_type (str): Jenis indeks hasil; default sama dengan indeks sumber.
+        exclude_ids (iterable): ID dokumen yang ikut dibuang.
+
+    Returns:
+        FAISS: Vektor store baru hasil kompaksi.
+    """
+    exclude_ids = set(exclude_ids)
+    positions = sorted(i for i, doc_id in vector_store.index_to_docstore_id.items() if doc_id not in exclude_ids)
+    vectors = np.ascontiguousarray(reconstruct_all(vector_store.index)[positions]) if positions else None
+
+    index_type = index_type or index_type_of(vector_store.index)
+    if not can_train(index_type, len(positions)):
+        index_type = "flat"  # terlalu sedikit vektor untuk training IVF/PQ
+    index = build_index(index_type, vector_store.index.d, vectors)
+    if vectors is not None:
+        index.add(vectors)
+
+    doc_ids = [vector_store.index_to_docstore_id[i] for i in positions]
+    docstore = InMemoryDocstore({doc_id: vector_store.docstore.search(doc_id) for doc_id in doc_ids})
+    compacted = FAISS(
+        embedding_function=vector_store.embedding_function,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(doc_ids)),
+    )
+
+    if source_map is not None:
+        live = set(doc_ids)
+        for source in list(source_map):
+            source_map[source] = [doc_id for doc_id in source_map[source] if doc_id in live]
+            if not source_map[source]:
+                del source_map[source]
+    return compacted
+
+
+def resident_memory_mb():
+    """Memori resident (RSS) proses saat ini dalam MiB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _SqliteReader:
+    """Koneksi SQLite baca-saja yang dibuka ulang per proses (aman setelah fork) dan dikunci antar-thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+                self._pid = os.getpid()
+            return self._conn.execute(sql, params).fetchall()
+
+
+class SqliteDocstore:
+    """Docstore baca-saja di SQLite; dokumen diambil per ID hanya saat dibutuhkan.
+
+    Hanya menyediakan search: vektor store dengan docstore ini tidak dapat ditambah atau
+    dihapus isinya (tidak ada add/delete). Untuk mengubahnya, muat ulang sumbernya dengan
+    FAISS.load_local (index.pkl) lalu terbitkan ulang dengan export_compact_store.
+    """
+
+    def __init__(self, path):
+        self._reader = _SqliteReader(path)
+
+    def search(self, search):
+        rows = self._reader.query("SELECT page_content, metadata FROM docs WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        page_content, metadata = rows[0]
+        return Document(id=search, page_content=page_content, metadata=json.loads(metadata))
+
+
+class SqliteIndexMapping(Mapping):
+    """Pemetaan posisi vektor FAISS -> ID dokumen yang dibaca dari SQLite sesuai kebutuhan."""
+
+    def __init__(self, path):
+        self._reader = _SqliteReader(path)
+
+    def __getitem__(self, position):
+        rows = self._reader.query("SELECT doc_id FROM positions WHERE pos = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self):
+        return iter(row[0] for row in self._reader.query("SELECT pos FROM positions ORDER BY pos"))
+
+    def __len__(self):
+        return self._reader.query("SELECT COUNT(*) FROM positions")[0][0]
+
+
+def quantize_index(index, quantize):
+    """Menyalin vektor indeks ke indeks terkuantisasi: "sq8" (8 bit per dimensi) atau "pq" (product quantization)."""
+    vectors = np.ascontiguousarray(reconstruct_all(index), dtype=np.float32)
+    if quantize == "sq8":
+        quantized = faiss.IndexScalarQuantizer(index.d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif quantize == "pq":
+        quantized = faiss.IndexPQ(index.d, PQ_M, PQ_NBITS)
+    else:
+        raise ValueError(f"Kuantisasi tidak dikenal: {quantize}")
+    quantized.train(vectors[:TRAIN_SAMPLE_SIZE])
+    quantized.add(vectors)
+    return quantized
+
+
+def export_compact_store(vector_store_path="faiss_index", quantize=None):
+    """Menerbitkan versi ringkas dari indeks aktif: index.faiss (opsional terkuantisasi) dan docstore.sqlite.
+
+    Hasilnya ditulis ke folder versi baru lalu diaktifkan dengan publish_index_version, sehingga
+    tidak pernah ditulis ulang dan dapat dilayani dengan mmap + docstore.sqlite oleh IndexManager.
+    index.pkl ikut disalin agar ingestion dan kompaksi berikutnya tetap dapat memuat versi ini
+    dengan FAISS.load_local (versi hasil ingestion tersebut kembali ke format pickle).
+
+    Args:
+        vector_store_path (str): Folder faiss_index berversi.
+        quantize (str): None, "sq8", atau "pq".
+
+    Returns:
+        str: Nama versi yang diterbitkan.
+    """
+    from hybrid_retriever import save_lexical_index  # impor lambat: hybrid_retriever memuat data_lookup (pandas)
+    source_path = current_index_path(vector_store_path)
+    vector_store = FAISS.load_local(source_path, None, allow_dangerous_deserialization=True)
+    output_path = new_index_version(vector_store_path)
+
+    index = quantize_index(vector_store.index, quantize) if quantize else vector_store.index
+    faiss.write_index(index, os.path.join(output_path, "index.faiss"))
+    shutil.copy(os.path.join(source_path, "index.pkl"), os.path.join(output_path, "index.pkl"))
+
+    docstore_path = os.path.join(output_path, DOCSTORE_FILE)
+    conn = sqlite3.connect(docstore_path)
+    conn.execute("CREATE TABLE docs (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+    conn.execute("CREATE TABLE positions (pos INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)")
+    positions = sorted(vector_store.index_to_docstore_id.items())
+    for start in range(0, len(positions), 10000):
+        chunk = positions[start:start + 10000]
+        conn.executemany("INSERT INTO positions (pos, doc_id) VALUES (?, ?)", chunk)
+        docs = [(doc_id, vector_store.docstore.search(doc_id)) for _, doc_id in chunk]
+        conn.executemany(
+            "INSERT OR REPLACE INTO docs (id, page_content, metadata) VALUES (?, ?, ?)",
+            [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)) for doc_id, doc in docs],
+        )
+    conn.commit()
+    conn.close()
+
+    save_source_map(output_path, load_source_map(source_path))
+    save_lexical_index(vector_store, output_path)
+    version = publish_index_version(vector_store_path, output_path)
+    print(f"Indeks ringkas diterbitkan sebagai versi {version} ({index_type_of(index) if not quantize else quantize}, "
+          f"{index.ntotal} vektor)")
+    return version
+
+
+def load_vector_store(vector_store_path, embeddings, mmap=False):
+    """Memuat vektor store untuk melayani query.
+
+    Dengan mmap=True, vektor di index.faiss dipetakan ke memori (dibagi antar-proses lewat page cache)
+    alih-alih dibaca seluruhnya; jangan dipakai untuk folder yang index.faiss-nya masih bisa ditimpa.
+    Jika folder berisi docstore.sqlite, dokumen dibaca per ID saat dibutuhkan lewat SqliteDocstore
+    yang baca-saja, sehingga vektor store hasilnya hanya untuk query (add_documents/delete gagal);
+    jika tidak, index.pkl dimuat seperti FAISS.load_local.
+    """
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) if mmap else 0
+    index = faiss.read_index(os.path.join(vector_store_path, "index.faiss"), flags)
+
+    docstore_path = os.path.join(vector_store_path, DOCSTORE_FILE)
+    if os.path.exists(docstore_path):
+        docstore = SqliteDocstore(docstore_path)
+        index_to_docstore_id = SqliteIndexMapping(docstore_path)
+    else:
+        with open(os.path.join(vector_store_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+    return FAISS(embedding_function=embeddings, index=index, docstore=docstore, index_to_docstore_id=index_to_docstore_id)
+
+
+def current_index_version(index_root="faiss_index"):
+    """Nama versi yang ditunjuk CURRENT.
+
+    Untuk folder lama tanpa CURRENT (index.faiss langsung di index_root), versinya diturunkan
+    dari waktu modifikasi index.faiss. None jika belum ada indeks sama sekali.
+    """
+    try:
+        with open(os.path.join(index_root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    try:
+        return f"legacy-{os.stat(os.path.join(index_root, 'index.faiss')).st_mtime_ns}"
+    except FileNotFoundError:
+        return None
+
+
+def index_version_path(index_root, version):
+    """Folder sebuah versi indeks; index_root sendiri untuk versi folder lama."""
+    if version is None or version.startswith("legacy-"):
+        return index_root
+    return os.path.join(index_root, VERSIONS_DIR, version)
+
+
+def is_immutable_version(version):
+    """True untuk versi di versions/: setelah diterbitkan, isinya tidak pernah ditulis ulang.
+
+    Folder lama tanpa CURRENT (versi "legacy-...") masih bisa ditimpa save_local di tempat.
+    """
+    return version is not None and not version.startswith("legacy-")
+
+
+def current_index_path(index_root="faiss_index"):
+    """Folder indeks versi aktif; index_root sendiri untuk folder lama tanpa CURRENT."""
+    return index_version_path(index_root, current_index_version(index_root))
+
+
+def new_index_version(index_root="faiss_index"):
+    """Membuat folder versi baru (belum aktif) untuk ditulis ingestion; nama versi terurut waktu."""
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f") + f"-{os.getpid()}"
+    path = os.path.join(index_root, VERSIONS_DIR, version)
+    os.makedirs(path)
+    return path
+
+
+def publish_index_version(index_root, version_path):
+    """Mengaktifkan versi yang sudah selesai ditulis dengan mengganti CURRENT secara atomik.
+
+    Pembaca tidak pernah melihat indeks setengah jadi: folder versi ditulis lengkap lebih dulu,
+    lalu CURRENT diganti dengan os.replace. Versi lama di luar KEEP_INDEX_VERSIONS dihapus.
+    """
+    version = os.path.basename(os.path.normpath(version_path))
+    tmp_path = os.path.join(index_root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(index_root, CURRENT_FILE))
+    prune_index_versions(index_root)
+    return version
+
+
+def prune_index_versions(index_root="faiss_index", keep=KEEP_INDEX_VERSIONS):
+    """Menghapus versi lama selain versi aktif dan `keep` versi sebelumnya.
+
+    Versi yang lebih baru dari versi aktif (ingestion yang sedang berjalan) tidak disentuh.
+    Proses yang masih memetakan versi lama tetap aman karena file yang dihapus baru dibebaskan
+    setelah pemetaannya ditutup.
+    """
+    current = current_index_version(index_root)
+    versions_path = os.path.join(index_root, VERSIONS_DIR)
+    if current is None or not os.path.isdir(versions_path):
+        return
+    older = sorted(name for name in os.listdir(versions_path) if name < current)
+    for name in older[:max(0, len(older) - keep)]:
+        shutil.rmtree(os.path.join(versions_path, name), ignore_errors=True)
+
+
+def compact(vector_store_path="faiss_index", index_type=None):
+    """Perintah kompaksi/konversi: memuat indeks versi aktif, membangunnya ulang, lalu menerbitkannya sebagai versi baru."""
+    from hybrid_retriever import save_lexical_index  # impor lambat: hybrid_retriever memuat data_lookup (pandas)
+    source_path = current_index_path(vector_store_path)
+    vector_store = FAISS.load_local(source_path, None, allow_dangerous_deserialization=True)
+    before = vector_store.index.ntotal
+    source_map = load_source_map(source_path)
+    compacted = compact_vector_store(vector_store, source_map, index_type=index_type)
+    version_path = new_index_version(vector_store_path)
+    compacted.save_local(version_path)
+    save_source_map(version_path, source_map)
+    save_lexical_index(compacted, version_path)
+    version = publish_index_version(vector_store_path, version_path)
+    print(f"Kompaksi {vector_store_path} selesai, versi {version} ({index_type_of(compacted.index)}): "
+          f"{before} -> {compacted.index.ntotal} vektor, {len(compacted.docstore._dict)} dokumen")
+
+
+USAGE = """Penggunaan:
+    python vector_index.py compact [faiss_index]
+    python vector_index.py convert <flat|ivf_flat|ivf_pq|hnsw> [faiss_index]
+    python vector_index.py export [faiss_index] [sq8|pq]"""
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "compact":
+        compact(sys.argv[2] if len(sys.argv) > 2 else "faiss_index")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "convert" and sys.argv[2] in INDEX_TYPES:
+        compact(sys.argv[3] if len(sys.argv) > 3 else "faiss_index", index_type=sys.argv[2])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "export":
+        arguments = sys.argv[2:]
+        quantize = arguments.pop() if arguments and arguments[-1] in ("sq8", "pq") else None
+        export_compact_store(arguments[0] if arguments else "faiss_index", quantize=quantize)
+    else:
+        print(USAGE)
+        sys.exit(1)